@@ -9,24 +9,59 @@ from api.agents.handlers.conversation_helper import ConversationHelper
 
 import logging
 import json
-from typing import Any
-from langsmith import Client
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+from api.agents.handlers.prompt_registry import prompt_registry
+from api.agents.handlers.turn_prefetch import TurnPrefetch
+from langchain_core.runnables import RunnableConfig
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
 
+@dataclass
+class GraphDependencies:
+  """Per-session objects the graph nodes use, passed in the run config"""
+  ai_model: Any
+  topic_manager: Any
+  log_manager: Any
+  conversation_helper: Any
+
+
+def graph_config(dependencies: GraphDependencies, **configurable) -> dict:
+  """Run config for the shared graph; extra keys go to configurable"""
+  return {"configurable": {"dependencies": dependencies, **configurable}}
+
+
 class ConversationGraphManager:
+  """
+    Builds the conversation StateGraph. The compiled graph holds no session
+    state, so one instance per process (get_conversation_graph) serves
+    every chat; nodes read their dependencies from the run config.
+    """
 
-  def __init__(self, ai_model, topic_manager, log_manager,
-               conversation_helper):
-    self.ai_model = ai_model
+  def __init__(self):
     self.graph = self._create_conversation_graph()
-    self.topic_manager = topic_manager
-    self.log_manager = log_manager
-    self.conversation_helper = conversation_helper
 
-    self.client = Client()
+  @staticmethod
+  def _deps(config: Optional[RunnableConfig]) -> GraphDependencies:
+    return ((config or {}).get("configurable") or {})["dependencies"]
+
+  @staticmethod
+  def _prefetch(config: Optional[RunnableConfig]) -> TurnPrefetch:
+    configurable = (config or {}).get("configurable") or {}
+    prefetch = configurable.get("prefetch")
+    if prefetch is None:
+      prefetch = configurable["prefetch"] = TurnPrefetch()
+    return prefetch
+
+  @staticmethod
+  def _without_token_sink(
+      config: Optional[RunnableConfig]) -> Optional[RunnableConfig]:
+    configurable = dict((config or {}).get("configurable") or {})
+    configurable.pop("token_sink", None)
+    return {**(config or {}), "configurable": configurable}
 
   def _create_conversation_graph(self) -> Any:
     workflow = StateGraph(ConversationState)
@@ -68,7 +103,9 @@ class ConversationGraphManager:
     return state.potential_topic != ""
 
   async def _topic_exploration_router(
-      self, state: ConversationState) -> ConversationState:
+      self,
+      state: ConversationState,
+      config: Optional[RunnableConfig] = None) -> ConversationState:
 
 
     state.response_type = "topic"
@@ -76,9 +113,9 @@ class ConversationGraphManager:
     topic_confirmation = state.topic_confirmation
 
     if topic_confirmation == 1:
-      state = await self._save_topic(state)
+      state = await self._save_topic(state, config)
     elif topic_confirmation == 0:
-      state = await self._leave_topic(state)
+      state = await self._leave_topic(state, config)
     elif topic_confirmation == 2:
       state.prompt_query = state.current_message
 
@@ -92,13 +129,16 @@ class ConversationGraphManager:
       state.response = "Sorry, I didn't understand that. Can you please rephrase?"
     return state
 
-  async def _discuss_topic(self,
-                           state: ConversationState) -> ConversationState:
+  async def _discuss_topic(
+      self,
+      state: ConversationState,
+      config: Optional[RunnableConfig] = None) -> ConversationState:
+    deps = self._deps(config)
 
     print("discussing")
     # Generate question based on current context
 
-    prompt = self.client.pull_prompt("topic_discuss")
+    prompt = await prompt_registry.aget("topic_discuss")
 
     print("prompt_query_discuss, should be saved if saved query",
           state.prompt_query)
@@ -109,7 +149,7 @@ class ConversationGraphManager:
         "query": state.current_message
     })
 
-    response = await self.conversation_helper.run_until_json(
+    response = await deps.conversation_helper.run_until_json(
         prompt=prompt, response_type=TopicPotentialJSON)
 
     #json topic, question
@@ -135,26 +175,36 @@ class ConversationGraphManager:
 
     return state
 
-  async def _leave_topic(self, state: ConversationState) -> ConversationState:
+  async def _leave_topic(
+      self,
+      state: ConversationState,
+      config: Optional[RunnableConfig] = None) -> ConversationState:
     state.prompt_asked_questions = ""
 
-    # Process message with restored query and history
-    state = await self._process_message(state)
+    # Process message with restored query and history. Only plain message
+    # turns stream tokens, so the reply of a topic exploration turn is sent
+    # whole, with the response type the turn ends with
+    state = await self._process_message(state,
+                                        self._without_token_sink(config))
     return state
 
-  async def _save_topic(self, state: ConversationState) -> ConversationState:
+  async def _save_topic(
+      self,
+      state: ConversationState,
+      config: Optional[RunnableConfig] = None) -> ConversationState:
     """Validate if we hav
     e enough information about the topic"""
+    deps = self._deps(config)
     # Analyze collected responses
 
 
-    prompt = self.client.pull_prompt("create_topic_json")
+    prompt = await prompt_registry.aget("create_topic_json")
 
     prompt = prompt.invoke({
         "topic": state.potential_topic,
     })
 
-    response = await self.conversation_helper.run_until_json(prompt, TopicJSON)
+    response = await deps.conversation_helper.run_until_json(prompt, TopicJSON)
 
     topic_name = response.get('name', '')
     topic_text = response.get('text', '')
@@ -163,7 +213,7 @@ class ConversationGraphManager:
     if not topic_name or topic_name == "NA" or not topic_text:
       logging.warning(f"Missing expected fields in response: {response}")
       # Return to previous state or use default values
-      return await self._leave_topic(state)  # Exit topic exploration
+      return await self._leave_topic(state, config)  # Exit topic exploration
 
     #create embed first, how is confidence created at the beginning of chat session
 
@@ -177,29 +227,38 @@ class ConversationGraphManager:
     )
 
     # Create and store embedding in one step
-    new_topic = await self.topic_manager.store_topic(topic=potential_topic,
+    new_topic = await deps.topic_manager.store_topic(topic=potential_topic,
                                                      state=state)
 
     state.current_topics.append(new_topic)
 
-    state = await self._leave_topic(state)
+    state = await self._leave_topic(state, config)
 
     return state
 
-  async def _handle_start(self, state: ConversationState) -> ConversationState:
+  async def _handle_start(
+      self,
+      state: ConversationState,
+      config: Optional[RunnableConfig] = None) -> ConversationState:
     """Start a new conversation"""
+    deps = self._deps(config)
 
     if state.potential_topic == "":
 
       state.split_messages(window_size=2000)
 
+      # Retrieval only depends on the query, so topics and logs are fetched
+      # while the classifier below is still waiting for the model
+      prefetch = self._prefetch(config)
+      prefetch.start(state, deps.topic_manager, deps.log_manager)
+
       same_topic = 0
 
       if len(state.current_topics) > 0:
 
         state.prepare_topics_to_prompt()
 
-        prompt = self.client.pull_prompt("change_of_topics")
+        prompt = await prompt_registry.aget("change_of_topics")
 
         change_of_topics_response = prompt.invoke({
             "conversation_history":
@@ -210,7 +269,7 @@ class ConversationGraphManager:
             state.prompt_topics
         })
 
-        response_obj = self.ai_model.invoke(change_of_topics_response)
+        response_obj = await deps.ai_model.ainvoke(change_of_topics_response)
 
         response = response_obj.content
 
@@ -222,18 +281,16 @@ class ConversationGraphManager:
 
         # Save query before potentially entering topic exploration
         # This will save the recent human messages up to 1000 chars
-        print("🔧 DEBUG: About to create embedding...")
-        await state.update_embedding()
-        print(f"🔧 DEBUG: Embedding created! Length: {len(state.embedding) if state.embedding else 'None'}")
-        print(f"🔧 DEBUG: Embedding type: {type(state.embedding)}")
+        state.embedding = await prefetch.embedding()
 
         state.saved_query = state.prompt_query  # Save this for topic exploration
 
-        print("🔧 DEBUG: About to call check_topics...")
-        state = await self.topic_manager.check_topics(state)
-        print("🔧 DEBUG: Returned from check_topics")
+        state = await deps.topic_manager.check_topics(
+            state, matched_topics=await prefetch.topics())
 
         print(f"potential_topic after check_topics: '{state.potential_topic}'")
+      else:
+        prefetch.discard_topics()
 
     else:
       # Already in topic exploration, don't update saved_query
@@ -248,22 +305,29 @@ class ConversationGraphManager:
     print("should explore", should_explore)
     return should_explore
 
-  async def _process_message(self, state: ConversationState):
+  async def _process_message(self,
+                             state: ConversationState,
+                             config: Optional[RunnableConfig] = None):
+    deps = self._deps(config)
     # here update
     state.response_type = "message"
 
-    if not state.embedding:
-      await state.update_embedding()
+    # Reuses the embedding and log retrieval started in _handle_start if
+    # the query is the same
+    prefetch = self._prefetch(config)
+    prefetch.start(state, log_manager=deps.log_manager)
+    state.embedding = await prefetch.embedding()
+
+    state = await deps.log_manager.check_logs(state,
+                                              matched_logs=await prefetch.logs())
 
-    state = await self.log_manager.check_logs(state)
-    
     state.embedding = None
 
     state.prepare_prompt_process_message()
 
     state.saved_query = ""
 
-    prompt = self.client.pull_prompt("chat_mr_week")
+    prompt = await prompt_registry.aget("chat_mr_week")
 
     end_sentence = ""
     if state.topic_confirmation == 0:
@@ -283,9 +347,22 @@ class ConversationGraphManager:
 
     state.potential_topic = ""
 
-    response_obj = self.ai_model.invoke(prompt)
+    # Forward tokens as they are generated when the caller passed a sink
+    token_sink = ((config or {}).get("configurable") or {}).get("token_sink")
+
+    if token_sink is not None:
+      chunks = []
+      async for chunk in deps.ai_model.astream(prompt):
+        if chunk.content:
+          chunks.append(chunk.content)
+          await token_sink(chunk.content)
+      if end_sentence:
+        await token_sink(end_sentence)
+      response = "".join(chunks)
+    else:
+      response_obj = await deps.ai_model.ainvoke(prompt)
 
-    response = response_obj.content
+      response = response_obj.content
 
     response = response + end_sentence
 
@@ -311,3 +388,17 @@ class ConversationGraphManager:
 
     state.add_response(state.response)
     return state
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_conversation_graph():
+  """Compiled conversation graph, built once per process"""
+  global _graph
+  if _graph is None:
+    with _graph_lock:
+      if _graph is None:
+        _graph = ConversationGraphManager().graph
+  return _graph
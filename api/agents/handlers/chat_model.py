@@ -0,0 +1,163 @@
+import importlib.util
+import logging
+import threading
+
+import httpx
+from django.conf import settings
+from langchain.chat_models import init_chat_model
+
+logger = logging.getLogger(__name__)
+
+CHAT_MODEL_NAME = "xai:grok-3-mini-fast"
+
+# Config for the short intro / ending messages
+TIME_MESSAGE_CONFIG = {
+    "configurable": {
+        "foo_temperature": 0.6,
+        "foo_reasoning_effort": "low"
+    }
+}
+
+
+def _http_options():
+  """Keep-alive pool shared by all requests, HTTP/2 when h2 is installed"""
+  http2 = getattr(settings, 'CHAT_MODEL_HTTP2', True) and bool(
+      importlib.util.find_spec("h2"))
+  return {
+      "http2": http2,
+      "limits": httpx.Limits(
+          max_connections=getattr(settings, 'CHAT_MODEL_MAX_CONNECTIONS', 100),
+          max_keepalive_connections=getattr(settings,
+                                            'CHAT_MODEL_MAX_KEEPALIVE', 20),
+          keepalive_expiry=getattr(settings, 'CHAT_MODEL_KEEPALIVE_EXPIRY',
+                                   120)),
+      "timeout": httpx.Timeout(getattr(settings, 'CHAT_MODEL_TIMEOUT', 60),
+                               connect=10),
+  }
+
+
+# Prefix of the per-call model settings in the run config, e.g.
+# {"configurable": {"foo_temperature": 0.6}}
+CONFIG_PREFIX = "foo_"
+
+
+class SharedChatModel:
+  """
+    Chat model whose temperature and reasoning effort can be set per call
+    through foo_* keys of the run config, like
+    init_chat_model(configurable_fields="any", config_prefix="foo").
+
+    The configurable model built a new provider model for every call; this
+    one keeps one per distinct set of settings, all on the same HTTP
+    clients. It offers the subset of the chat model interface the agents
+    use: invoke, ainvoke, astream and with_structured_output.
+    """
+
+  def __init__(self, model: str = CHAT_MODEL_NAME, **defaults):
+    self.model = model
+    self.defaults = defaults
+    options = _http_options()
+    self.http2 = options["http2"]
+    self._http_client = httpx.Client(**options)
+    self._http_async_client = httpx.AsyncClient(**options)
+    self._models = {}
+    self._lock = threading.Lock()
+
+  def _params(self, config) -> dict:
+    params = dict(self.defaults)
+    for key, value in ((config or {}).get("configurable") or {}).items():
+      if key.startswith(CONFIG_PREFIX):
+        params[key[len(CONFIG_PREFIX):]] = value
+    return params
+
+  def model_for(self, config=None):
+    """Provider model for the settings in config, built once per settings"""
+    params = self._params(config)
+    key = tuple(sorted(params.items()))
+    model = self._models.get(key)
+    if model is None:
+      with self._lock:
+        model = self._models.get(key)
+        if model is None:
+          model = init_chat_model(model=self.model,
+                                  http_client=self._http_client,
+                                  http_async_client=self._http_async_client,
+                                  **params)
+          self._models[key] = model
+    return model
+
+  def invoke(self, input, config=None, **kwargs):
+    return self.model_for(config).invoke(input, config=config, **kwargs)
+
+  async def ainvoke(self, input, config=None, **kwargs):
+    return await self.model_for(config).ainvoke(input, config=config, **kwargs)
+
+  def astream(self, input, config=None, **kwargs):
+    return self.model_for(config).astream(input, config=config, **kwargs)
+
+  def with_structured_output(self, schema, **kwargs):
+    return _SharedStructuredOutput(self, schema, kwargs)
+
+
+class _SharedStructuredOutput:
+  """with_structured_output of the provider model picked for each call"""
+
+  def __init__(self, chat_model: SharedChatModel, schema, kwargs):
+    self.chat_model = chat_model
+    self.schema = schema
+    self.method = kwargs.pop("method", "function_calling")
+    self.kwargs = kwargs
+
+  def _runnable(self, config):
+    return structured_model(self.chat_model.model_for(config), self.schema,
+                            self.method, **self.kwargs)
+
+  def invoke(self, input, config=None, **kwargs):
+    return self._runnable(config).invoke(input, config=config, **kwargs)
+
+  async def ainvoke(self, input, config=None, **kwargs):
+    return await self._runnable(config).ainvoke(input, config=config, **kwargs)
+
+
+def create_chat_model() -> SharedChatModel:
+  """
+    New chat model used by the conversation agents. Prefer
+    get_chat_model(), which shares one instance (and its connections) per
+    process.
+    """
+  return SharedChatModel(temperature=0.7, reasoning_effort="high")
+
+
+_chat_model = None
+_chat_model_lock = threading.Lock()
+
+# (id(model), schema, method, kwargs) -> (model, structured runnable)
+_structured_models = {}
+
+
+def get_chat_model() -> SharedChatModel:
+  """Process-wide chat model; per-call settings go through the run config"""
+  global _chat_model
+  if _chat_model is None:
+    with _chat_model_lock:
+      if _chat_model is None:
+        _chat_model = create_chat_model()
+        logger.info(
+            f"Initialized shared chat model (http2={_chat_model.http2})")
+  return _chat_model
+
+
+def structured_model(ai_model,
+                     schema,
+                     method: str = "function_calling",
+                     **kwargs):
+  """Memoized ai_model.with_structured_output(schema, method=method)"""
+  key = (id(ai_model), schema, method, tuple(sorted(kwargs.items())))
+  entry = _structured_models.get(key)
+  if entry is None or entry[0] is not ai_model:
+    with _chat_model_lock:
+      entry = (ai_model,
+               ai_model.with_structured_output(schema, method=method,
+                                               **kwargs))
+      _structured_models[key] = entry
+  return entry[1]
@@ -1,6 +1,14 @@
 from typing import Any, Type, TypeVar, Dict, Optional, Union
+from collections import OrderedDict, deque
+import asyncio
+import copy
+import hashlib
 import json
 import logging
+import time
+from django.conf import settings
+from pydantic import BaseModel
+from api.agents.handlers.chat_model import structured_model
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -8,6 +16,49 @@ logging.basicConfig(level=logging.INFO)
 # Type variable for response schema types
 T = TypeVar('T')
 
+# Latencies of recent successful calls, per response schema
+LATENCY_SAMPLES = 50
+MIN_LATENCY_SAMPLES = 5
+_latencies: Dict[str, deque] = {}
+
+# Results of deterministic (temperature 0) calls, least recently used first
+_result_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _schema_name(response_type) -> str:
+  return f"{response_type.__module__}.{response_type.__qualname__}"
+
+
+def _prompt_text(prompt) -> str:
+  if hasattr(prompt, 'to_string'):
+    return prompt.to_string()
+  return str(prompt)
+
+
+def _cache_key(prompt, response_type, reasoning_effort: str) -> str:
+  payload = "\x00".join(
+      (_schema_name(response_type), reasoning_effort, _prompt_text(prompt)))
+  return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _record_latency(response_type, seconds: float):
+  samples = _latencies.setdefault(_schema_name(response_type),
+                                  deque(maxlen=LATENCY_SAMPLES))
+  samples.append(seconds)
+
+
+def hedge_delay(response_type) -> float:
+  """p90 latency of the schema's recent calls, or the configured default"""
+  samples = _latencies.get(_schema_name(response_type))
+  if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+    return getattr(settings, 'STRUCTURED_OUTPUT_HEDGE_AFTER', 10.0)
+  ordered = sorted(samples)
+  return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+
+def clear_result_cache():
+  _result_cache.clear()
+
 
 class ConversationHelper:
   """Helper class to handle common AI conversation tasks like JSON extraction"""
@@ -21,91 +72,161 @@ class ConversationHelper:
         """
     self.ai_model = ai_model
 
+  @staticmethod
+  def _explicit_prompt(prompt, response_type: Type[T]) -> str:
+    """Prompt used for retries, spelling out the expected fields"""
+    field_descriptions = []
+    for field_name, field_type in response_type.__annotations__.items():
+      field_descriptions.append(
+          f"'{field_name}': {getattr(field_type, '__name__', field_type)}")
+
+    return f"""Please respond with a JSON object containing exactly these fields: {{{', '.join(field_descriptions)}}}.
+
+              Original request: {_prompt_text(prompt)}
+
+              Return only valid JSON, no additional text."""
+
+  @staticmethod
+  def _validate(structured_response, response_type: Type[T]) -> Dict[str, Any]:
+    """Response as a dict; raises if it does not match the schema"""
+    if isinstance(structured_response, BaseModel):
+      data = structured_response.model_dump()
+    elif isinstance(structured_response, dict):
+      data = structured_response
+    else:
+      raise ValueError(
+          f"Unexpected structured output: {type(structured_response)}")
+
+    if isinstance(response_type, type) and issubclass(response_type,
+                                                      BaseModel):
+      data = response_type.model_validate(data).model_dump()
+    return data
+
+  async def _attempt(self, prompt, response_type: Type[T], method: str,
+                     config: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.monotonic()
+    model = structured_model(self.ai_model, response_type, method=method)
+    structured_response = await model.ainvoke(prompt, config=config)
+    result = self._validate(structured_response, response_type)
+    _record_latency(response_type, time.monotonic() - started)
+    return result
+
   async def run_until_json(self,
                            prompt: str,
                            response_type: Type[T],
                            max_attempts: int = 3,
                            temperature: float = 0.0,
-                           reasoning_effort: str = "low") -> Dict[str, Any]:
+                           reasoning_effort: str = "low",
+                           deadline: Optional[float] = None,
+                           hedge: Optional[bool] = None) -> Dict[str, Any]:
     """
       Run the model with the given prompt and extract valid JSON from the response.
       Uses LangChain's with_structured_output() method for reliable structured output.
-      Makes multiple attempts if needed.
+
+      Up to max_attempts function-calling attempts are made, then a JSON-mode
+      fallback; the first result that validates against response_type wins
+      and the other attempts are cancelled. A failed attempt starts the next
+      one right away. With hedge, the next attempt is also started when the
+      current one runs longer than the p90 latency of recent calls, so a slow
+      answer costs at most about one extra latency instead of a full retry.
+
+      deadline bounds the whole call in seconds; when it passes, the
+      default values are returned. Deterministic calls (temperature 0) are
+      cached by prompt and schema.
       """
-    for attempt in range(max_attempts):
-      try:
-        # Configure model parameters
-        config = {
-            "configurable": {
-                "foo_temperature": temperature,
-                "foo_reasoning_effort": reasoning_effort
-            }
+    if deadline is None:
+      deadline = getattr(settings, 'STRUCTURED_OUTPUT_DEADLINE', 60.0)
+    if hedge is None:
+      hedge = getattr(settings, 'STRUCTURED_OUTPUT_HEDGE', True)
+
+    cache_key = None
+    if temperature == 0:
+      cache_key = _cache_key(prompt, response_type, reasoning_effort)
+      cached = _result_cache.get(cache_key)
+      if cached is not None:
+        _result_cache.move_to_end(cache_key)
+        return copy.deepcopy(cached)
+
+    # Configure model parameters
+    config = {
+        "configurable": {
+            "foo_temperature": temperature,
+            "foo_reasoning_effort": reasoning_effort
         }
+    }
+
+    # Function calling first, retries with a more explicit prompt, then
+    # JSON mode as fallback
+    explicit_prompt = self._explicit_prompt(prompt, response_type)
+    attempts = [(prompt, "function_calling")]
+    attempts += [(explicit_prompt, "function_calling")
+                 ] * (max_attempts - 1)
+    attempts.append((explicit_prompt, "json_mode"))
+
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + deadline
+    pending = set()
+    next_attempt = 0
+    result = None
+
+    def launch():
+      nonlocal next_attempt
+      attempt_prompt, method = attempts[next_attempt]
+      next_attempt += 1
+      pending.add(
+          asyncio.ensure_future(
+              self._attempt(attempt_prompt, response_type, method, config)))
 
-        # Use LangChain's structured output method
-        # This handles both tool calling and JSON mode automatically
-        model_with_structure = self.ai_model.with_structured_output(
-            response_type,
-            method=
-            "function_calling"  # or "json_mode" depending on your preference
-        )
-
-        # Invoke the model with structured output
-        structured_response = await model_with_structure.ainvoke(
-            prompt, config=config)
-
-        # Convert Pydantic object to dictionary if needed
-        if hasattr(structured_response, 'dict'):
-          return structured_response.dict()
-        elif hasattr(structured_response, 'model_dump'):
-          return structured_response.model_dump()
-        elif isinstance(structured_response, dict):
-          return structured_response
-        else:
-          # Convert to dict using the response_type's field annotations
-          return {
-              field: getattr(structured_response, field, "")
-              for field in response_type.__annotations__.keys()
-          }
-
-      except Exception as e:
-        logging.warning(
-            f"Structured output attempt {attempt+1} failed: {str(e)}")
-
-      # If structured output fails, try with a more explicit prompt
-      if attempt < max_attempts - 1:
-        # Make the requirements more explicit for next attempt
-        field_descriptions = []
-        for field_name, field_type in response_type.__annotations__.items():
-          field_descriptions.append(f"'{field_name}': {field_type.__name__}")
-
-        prompt = f"""Please respond with a JSON object containing exactly these fields: {{{', '.join(field_descriptions)}}}.
-              
-              Original request: {prompt}
-              
-              Return only valid JSON, no additional text."""
-
-    # Try with JSON mode as fallback
     try:
-      model_with_json = self.ai_model.with_structured_output(
-          response_type, method="json_mode")
-      structured_response = await model_with_json.ainvoke(prompt,
-                                                          config=config)
-
-      if hasattr(structured_response, 'dict'):
-        return structured_response.dict()
-      elif hasattr(structured_response, 'model_dump'):
-        return structured_response.model_dump()
-      elif isinstance(structured_response, dict):
-        return structured_response
-
-    except Exception as json_error:
-      logging.warning(f"JSON mode fallback failed: {str(json_error)}")
-      pass
+      launch()
+      while pending and result is None:
+        remaining = expires - loop.time()
+        if remaining <= 0:
+          logging.warning(
+              f"Structured output deadline of {deadline}s reached for "
+              f"{response_type.__name__}")
+          break
+
+        timeout = remaining
+        if hedge and next_attempt < len(attempts):
+          timeout = min(timeout, hedge_delay(response_type))
+
+        done, pending = await asyncio.wait(pending,
+                                           timeout=timeout,
+                                           return_when=asyncio.FIRST_COMPLETED)
+
+        # Read every finished attempt, also after a winner, so no exception
+        # is left unretrieved
+        for task in done:
+          try:
+            task_result = task.result()
+          except Exception as e:
+            logging.warning(f"Structured output attempt failed: {str(e)}")
+            continue
+          if result is None:
+            result = task_result
+
+        if result is None and next_attempt < len(attempts):
+          # Either an attempt failed or the hedge delay passed
+          if done or hedge:
+            launch()
+    finally:
+      for task in pending:
+        if not task.done():
+          task.cancel()
+        elif not task.cancelled():
+          task.exception()
+
+    if result is not None:
+      if cache_key is not None:
+        _result_cache[cache_key] = copy.deepcopy(result)
+        while len(_result_cache) > getattr(settings,
+                                           'STRUCTURED_OUTPUT_CACHE_SIZE', 256):
+          _result_cache.popitem(last=False)
+      return result
 
     # If all attempts fail, return default values
     logging.error(
-        f"Failed to get valid structured output after {max_attempts} attempts"
+        f"Failed to get valid structured output after {next_attempt} attempts"
     )
     return {field: "" for field in response_type.__annotations__.keys()}
-
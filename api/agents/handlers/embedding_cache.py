@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+  """Collapse whitespace so trivially different strings share a cache entry"""
+  return " ".join(text.split())
+
+
+def model_name_of(embedding_model) -> str:
+  """Best effort name of an embedding model, used as part of the cache key"""
+  return str(
+      getattr(embedding_model, 'model_name', None)
+      or getattr(embedding_model, 'model', None)
+      or embedding_model.__class__.__name__)
+
+
+async def _run_compute(compute: Callable, executor, *args):
+  """Await async embedding calls directly, run blocking ones in the executor"""
+  if asyncio.iscoroutinefunction(compute):
+    return await compute(*args)
+  return await asyncio.get_event_loop().run_in_executor(
+      executor, lambda: compute(*args))
+
+
+class EmbeddingCache:
+  """
+    Content-addressed cache for text embeddings.
+
+    Entries are keyed by a SHA-256 of the model name and the normalized
+    text. Lookups go to a bounded in-memory LRU first and then, if enabled,
+    to the EmbeddingCacheEntry table shared by all processes.
+    """
+
+  def __init__(self, max_size: int = 2048, persistent: bool = False):
+    self.max_size = max_size
+    self.persistent = persistent
+    self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+    self._lock = threading.Lock()
+
+    self.hits = 0
+    self.persistent_hits = 0
+    self.misses = 0
+
+  @staticmethod
+  def make_key(model_name: str, text: str) -> str:
+    payload = f"{model_name}\x00{normalize_text(text)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+  # In-memory tier
+
+  def _memory_get(self, key: str) -> Optional[List[float]]:
+    with self._lock:
+      embedding = self._entries.get(key)
+      if embedding is not None:
+        self._entries.move_to_end(key)
+        self.hits += 1
+      return embedding
+
+  def _memory_set(self, key: str, embedding: List[float]) -> None:
+    with self._lock:
+      self._entries[key] = embedding
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_size:
+        self._entries.popitem(last=False)
+
+  # Persistent tier
+
+  def _persistent_get(self, key: str) -> Optional[List[float]]:
+    from app.models import EmbeddingCacheEntry
+
+    vector = EmbeddingCacheEntry.objects.filter(key=key).values_list(
+        'vector', flat=True).first()
+    if vector is None:
+      return None
+
+    embedding = array('f')
+    embedding.frombytes(bytes(vector))
+    with self._lock:
+      self.persistent_hits += 1
+    return embedding.tolist()
+
+  def _persistent_set(self, key: str, model_name: str,
+                      embedding: List[float]) -> None:
+    from app.models import EmbeddingCacheEntry
+
+    try:
+      EmbeddingCacheEntry.objects.get_or_create(
+          key=key,
+          defaults={
+              'model': model_name,
+              'vector': array('f', embedding).tobytes()
+          })
+    except Exception as e:
+      # A lost race on the unique key is harmless, anything else is logged
+      logger.warning(f"Could not persist embedding: {str(e)}")
+
+  def _persistent_get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+    from app.models import EmbeddingCacheEntry
+
+    found = {}
+    for key, vector in EmbeddingCacheEntry.objects.filter(
+        key__in=keys).values_list('key', 'vector'):
+      embedding = array('f')
+      embedding.frombytes(bytes(vector))
+      found[key] = embedding.tolist()
+
+    with self._lock:
+      self.persistent_hits += len(found)
+    return found
+
+  def _persistent_set_many(self, model_name: str, entries) -> None:
+    from app.models import EmbeddingCacheEntry
+
+    try:
+      EmbeddingCacheEntry.objects.bulk_create([
+          EmbeddingCacheEntry(key=key,
+                              model=model_name,
+                              vector=array('f', embedding).tobytes())
+          for key, embedding in entries
+      ],
+                                              ignore_conflicts=True)
+    except Exception as e:
+      logger.warning(f"Could not persist embeddings: {str(e)}")
+
+  # Public interface
+
+  def get_or_compute(self, model_name: str, text: str,
+                     compute: Callable[[], List[float]]) -> List[float]:
+    """Synchronous lookup; must not be called from the event loop"""
+    key = self.make_key(model_name, text)
+
+    embedding = self._memory_get(key)
+    if embedding is not None:
+      return embedding
+
+    if self.persistent:
+      embedding = self._persistent_get(key)
+      if embedding is not None:
+        self._memory_set(key, embedding)
+        return embedding
+
+    with self._lock:
+      self.misses += 1
+    embedding = compute()
+    if embedding:
+      self._memory_set(key, embedding)
+      if self.persistent:
+        self._persistent_set(key, model_name, embedding)
+    return embedding
+
+  async def aget_or_compute(self,
+                            model_name: str,
+                            text: str,
+                            compute: Callable[[], List[float]],
+                            executor=None) -> List[float]:
+    """
+      Async lookup. Memory hits return without leaving the event loop, the
+      persistent tier goes through the ORM thread. compute may be a
+      coroutine function (awaited on the loop) or a blocking callable (run
+      in the given executor).
+      """
+    key = self.make_key(model_name, text)
+
+    embedding = self._memory_get(key)
+    if embedding is not None:
+      return embedding
+
+    if self.persistent:
+      embedding = await sync_to_async(self._persistent_get)(key)
+      if embedding is not None:
+        self._memory_set(key, embedding)
+        return embedding
+
+    with self._lock:
+      self.misses += 1
+    embedding = await _run_compute(compute, executor)
+    if embedding:
+      self._memory_set(key, embedding)
+      if self.persistent:
+        await sync_to_async(self._persistent_set)(key, model_name, embedding)
+    return embedding
+
+  async def aget_or_compute_many(
+      self,
+      model_name: str,
+      texts: List[str],
+      compute_many: Callable[[List[str]], List[List[float]]],
+      executor=None) -> List[List[float]]:
+    """
+      Batched variant of aget_or_compute. All texts missing from the cache
+      are embedded with a single compute_many call; results keep the order
+      of texts.
+      """
+    keys = [self.make_key(model_name, text) for text in texts]
+    results: List[Optional[List[float]]] = [
+        self._memory_get(key) for key in keys
+    ]
+
+    if self.persistent:
+      missing = [i for i, embedding in enumerate(results) if embedding is None]
+      if missing:
+        found = await sync_to_async(self._persistent_get_many)(
+            [keys[i] for i in missing])
+        for i in missing:
+          embedding = found.get(keys[i])
+          if embedding is not None:
+            results[i] = embedding
+            self._memory_set(keys[i], embedding)
+
+    # Embed each distinct missing text only once
+    pending: Dict[str, List[int]] = {}
+    for i, embedding in enumerate(results):
+      if embedding is None:
+        pending.setdefault(keys[i], []).append(i)
+
+    if pending:
+      with self._lock:
+        self.misses += len(pending)
+      pending_texts = [texts[indices[0]] for indices in pending.values()]
+      embeddings = await _run_compute(compute_many, executor, pending_texts)
+
+      new_entries = []
+      for (key, indices), embedding in zip(pending.items(), embeddings):
+        for i in indices:
+          results[i] = embedding
+        if embedding:
+          self._memory_set(key, embedding)
+          new_entries.append((key, embedding))
+
+      if self.persistent and new_entries:
+        await sync_to_async(self._persistent_set_many)(model_name,
+                                                       new_entries)
+
+    return results
+
+  def stats(self) -> Dict[str, Any]:
+    with self._lock:
+      lookups = self.hits + self.persistent_hits + self.misses
+      return {
+          "size": len(self._entries),
+          "max_size": self.max_size,
+          "persistent": self.persistent,
+          "hits": self.hits,
+          "persistent_hits": self.persistent_hits,
+          "misses": self.misses,
+          "hit_rate": ((self.hits + self.persistent_hits) /
+                       lookups) if lookups else 0.0,
+      }
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+
+embedding_cache = EmbeddingCache(
+    max_size=getattr(settings, 'EMBEDDING_CACHE_SIZE', 2048),
+    persistent=getattr(settings, 'EMBEDDING_CACHE_PERSISTENT', False))
@@ -0,0 +1,283 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import (FilterOperator,
+                                                  MetadataFilters,
+                                                  VectorStoreQuery,
+                                                  VectorStoreQueryResult)
+
+logger = logging.getLogger(__name__)
+
+
+def _equality_filters(filters: Optional[MetadataFilters]) -> Dict[str, str]:
+  """key -> value of MetadataFilters, which may only use EQ"""
+  values = {}
+  for metadata_filter in (filters.filters if filters else []):
+    if metadata_filter.operator != FilterOperator.EQ:
+      raise ValueError(
+          f"LocalVectorStore only supports EQ filters, got {metadata_filter.operator}"
+      )
+    values[metadata_filter.key] = str(metadata_filter.value)
+  return values
+
+
+class _UserSegment:
+  """Vectors, texts and metadata of one user in one namespace"""
+
+  def __init__(self, ids=None, texts=None, metadata=None, matrix=None):
+    self.ids: List[str] = ids or []
+    self.texts: List[str] = texts or []
+    self.metadata: List[Dict[str, Any]] = metadata or []
+    self.matrix: Optional[np.ndarray] = matrix
+    self.norms: Optional[np.ndarray] = None
+    self._update_norms()
+
+  def _update_norms(self):
+    if self.matrix is not None and len(self.matrix):
+      self.norms = np.linalg.norm(self.matrix, axis=1)
+    else:
+      self.norms = None
+
+  def __len__(self):
+    return len(self.ids)
+
+  def append(self, ids, texts, metadata, vectors: np.ndarray):
+    self.ids = self.ids + ids
+    self.texts = self.texts + texts
+    self.metadata = self.metadata + metadata
+    self.matrix = vectors if self.matrix is None or not len(
+        self.matrix) else np.vstack([self.matrix, vectors])
+    self._update_norms()
+
+  def keep(self, mask: np.ndarray):
+    index = np.flatnonzero(mask)
+    self.ids = [self.ids[i] for i in index]
+    self.texts = [self.texts[i] for i in index]
+    self.metadata = [self.metadata[i] for i in index]
+    self.matrix = np.asarray(self.matrix)[index]
+    self._update_norms()
+
+
+class LocalVectorStore:
+  """
+    In-process vector index used instead of Pinecone when
+    settings.VECTOR_BACKEND == 'local'.
+
+    Every user has a small float32 matrix per namespace that is persisted
+    as <directory>/<namespace>/<user_id>.npy (memory-mapped on load) with a
+    JSON sidecar for ids, texts and metadata. It implements the subset of
+    the vector store interface PineconeManager uses: query, add /
+    insert_nodes, delete and delete_nodes. Queries must be scoped by a
+    user_id filter.
+
+    Several processes (web instances, the session end worker) may share the
+    directory: a segment is reloaded whenever its files were replaced, and
+    writes reload and save it under an exclusive lock on <user_id>.lock.
+    """
+
+  stores_text = True
+
+  def __init__(self, namespace: str, directory: str):
+    self.namespace = namespace
+    self.directory = os.path.join(str(directory), namespace)
+    self._segments: Dict[str, _UserSegment] = {}
+    # (inode, mtime, size) of the JSON sidecar each segment was loaded from
+    self._versions: Dict[str, Any] = {}
+    self._lock = threading.RLock()
+    os.makedirs(self.directory, exist_ok=True)
+
+  # Persistence
+
+  def _paths(self, user_id: str):
+    base = os.path.join(self.directory, user_id)
+    return base + ".npy", base + ".json"
+
+  def _version(self, user_id: str):
+    try:
+      stat = os.stat(self._paths(user_id)[1])
+    except FileNotFoundError:
+      return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+  @contextmanager
+  def _locked(self, user_id: str):
+    """Exclusive access to the files of a user across threads and processes"""
+    with self._lock:
+      with open(os.path.join(self.directory, user_id + ".lock"), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+          yield
+        finally:
+          fcntl.flock(f, fcntl.LOCK_UN)
+
+  def _load(self, user_id: str) -> _UserSegment:
+    matrix_path, meta_path = self._paths(user_id)
+    if not os.path.exists(meta_path):
+      return _UserSegment()
+
+    with open(meta_path, encoding='utf-8') as f:
+      data = json.load(f)
+    matrix = np.load(matrix_path, mmap_mode='r') if data["ids"] else None
+    return _UserSegment(ids=data["ids"],
+                        texts=data["texts"],
+                        metadata=data["metadata"],
+                        matrix=matrix)
+
+  def _save(self, user_id: str, segment: _UserSegment):
+    matrix_path, meta_path = self._paths(user_id)
+    matrix = segment.matrix if segment.matrix is not None else np.zeros(
+        (0, 0), dtype=np.float32)
+
+    # Write to temporary files and swap them in atomically
+    with open(matrix_path + ".tmp", 'wb') as f:
+      np.save(f, np.asarray(matrix, dtype=np.float32))
+    with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+      json.dump(
+          {
+              "ids": segment.ids,
+              "texts": segment.texts,
+              "metadata": segment.metadata
+          }, f)
+    os.replace(matrix_path + ".tmp", matrix_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    self._versions[user_id] = self._version(user_id)
+
+  def _segment(self, user_id) -> _UserSegment:
+    """Cached segment of the user, reloaded if another process saved it"""
+    user_id = str(user_id)
+    with self._lock:
+      version = self._version(user_id)
+      segment = self._segments.get(user_id)
+      if segment is None or self._versions.get(user_id) != version:
+        segment = self._load(user_id)
+        self._segments[user_id] = segment
+        self._versions[user_id] = version
+      return segment
+
+  def _all_user_ids(self) -> List[str]:
+    user_ids = {
+        name[:-len(".json")]
+        for name in os.listdir(self.directory) if name.endswith(".json")
+    }
+    return sorted(user_ids | set(self._segments))
+
+  # Vector store interface
+
+  def add(self, nodes: List[TextNode], **kwargs) -> List[str]:
+    by_user: Dict[str, List[TextNode]] = {}
+    for node in nodes:
+      user_id = node.metadata.get("user_id")
+      if user_id is None:
+        raise ValueError("LocalVectorStore nodes need a user_id in metadata")
+      by_user.setdefault(str(user_id), []).append(node)
+
+    for user_id, user_nodes in by_user.items():
+      with self._locked(user_id):
+        segment = self._segment(user_id)
+        segment.append(
+            ids=[node.node_id for node in user_nodes],
+            texts=[node.get_content() for node in user_nodes],
+            metadata=[dict(node.metadata) for node in user_nodes],
+            vectors=np.asarray([node.embedding for node in user_nodes],
+                               dtype=np.float32))
+        self._save(user_id, segment)
+
+    return [node.node_id for node in nodes]
+
+  def insert_nodes(self, nodes: List[TextNode], **kwargs) -> None:
+    """Same entry point as VectorStoreIndex.insert_nodes"""
+    self.add(nodes)
+
+  def delete(self,
+             ref_doc_id: Optional[str] = None,
+             filters: Optional[Dict[str, Any]] = None,
+             **kwargs) -> None:
+    """Delete nodes by id and/or by equality on metadata values"""
+    filters = {key: str(value) for key, value in (filters or {}).items()}
+    if ref_doc_id is None and not filters:
+      return
+
+    user_id = filters.get("user_id")
+    user_ids = [user_id] if user_id else self._all_user_ids()
+
+    for uid in user_ids:
+      with self._locked(uid):
+        segment = self._segment(uid)
+        if not len(segment):
+          continue
+
+        matches = np.ones(len(segment), dtype=bool)
+        if ref_doc_id is not None:
+          matches &= np.array([node_id == ref_doc_id for node_id in segment.ids])
+        for key, value in filters.items():
+          matches &= np.array(
+              [str(meta.get(key)) == value for meta in segment.metadata])
+
+        if matches.any():
+          segment.keep(~matches)
+          self._save(uid, segment)
+
+  def delete_nodes(self,
+                   node_ids: Optional[List[str]] = None,
+                   filters: Optional[MetadataFilters] = None,
+                   **kwargs) -> None:
+    """Same signature as PineconeVectorStore.delete_nodes"""
+    if filters is not None:
+      self.delete(filters=_equality_filters(filters))
+    for node_id in node_ids or []:
+      self.delete(ref_doc_id=node_id)
+
+  def query(self, query: VectorStoreQuery, **kwargs) -> VectorStoreQueryResult:
+    filters = _equality_filters(query.filters)
+
+    user_id = filters.get("user_id")
+    if user_id is None:
+      raise ValueError("LocalVectorStore queries must filter by user_id")
+
+    with self._lock:
+      segment = self._segment(user_id)
+      if not len(segment):
+        return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+      ids, texts, metadata = segment.ids, segment.texts, segment.metadata
+      matrix, norms = segment.matrix, segment.norms
+
+    mask = np.ones(len(ids), dtype=bool)
+    for key, value in filters.items():
+      if key != "user_id":
+        mask &= np.array([str(meta.get(key)) == value for meta in metadata])
+
+    # Cosine similarity against every vector of the user
+    query_vector = np.asarray(query.query_embedding, dtype=np.float32)
+    query_norm = np.linalg.norm(query_vector)
+    denominator = norms * query_norm
+    similarities = np.divide(matrix @ query_vector,
+                             denominator,
+                             out=np.zeros(len(ids), dtype=np.float32),
+                             where=denominator > 0)
+    similarities[~mask] = -np.inf
+
+    candidates = np.flatnonzero(mask)
+    top_k = min(query.similarity_top_k or len(candidates), len(candidates))
+    if top_k == 0:
+      return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+    top = np.argpartition(-similarities, top_k - 1)[:top_k]
+    top = top[np.argsort(-similarities[top])]
+
+    nodes = [
+        TextNode(id_=ids[i],
+                 text=texts[i],
+                 metadata=dict(metadata[i]),
+                 embedding=np.asarray(matrix[i]).tolist()) for i in top
+    ]
+    return VectorStoreQueryResult(nodes=nodes,
+                                  similarities=similarities[top].tolist(),
+                                  ids=[ids[i] for i in top])
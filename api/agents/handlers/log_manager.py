@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from api.agents.handlers.pinecone_manager import PineconeManager
 from channels.db import database_sync_to_async
 from app.models import SessionLog, Topic, Log
@@ -10,29 +10,33 @@ class LogManager:
   def __init__(self, pinecone_manager: PineconeManager):
       self.pinecone_manager = pinecone_manager
 
-  async def check_logs(self, state: ConversationState) -> ConversationState:
-      print("🔍 LOG_MANAGER: Starting check_logs")
+  async def find_logs(self, embedding: List[float]) -> List[LogState]:
+      """Retrieve the logs similar to a query embedding, without side effects"""
+      if not embedding:
+          print("🔍 LOG_MANAGER: No embedding available, skipping log search")
+          return []
+
+      # Use the same parameters as topics for consistency
+      matched_logs = await self.pinecone_manager.retrieve_logs(
+          embedding=embedding,
+          base_threshold=0.4,      # Must be semantically relevant
+          final_threshold=0.5,     # Must pass final quality check
+          max_results=3)           # Maximum 3 logs (same as topics)
+      print(f"🔍 LOG_MANAGER: retrieve_logs returned {len(matched_logs)} logs")
+      return matched_logs
+
+  async def check_logs(
+      self,
+      state: ConversationState,
+      matched_logs: Optional[List[LogState]] = None) -> ConversationState:
+      """
+      Set the logs of the current turn. matched_logs can be passed in if
+      the retrieval already ran (see TurnPrefetch), otherwise it runs here.
+      """
       state.current_logs = []
-      matched_logs = []
-
-      print(f"🔍 LOG_MANAGER: state.embedding exists: {state.embedding is not None}")
-      print(f"🔍 LOG_MANAGER: embedding length: {len(state.embedding) if state.embedding else 'None'}")
-      print(f"🔍 LOG_MANAGER: user_id: {self.pinecone_manager.user_id}")
-
-      if state.embedding:
-          print("🔍 LOG_MANAGER: Searching for logs with time-boosted scoring")
 
-
-          # Use the same parameters as topics for consistency
-          new_logs = await self.pinecone_manager.retrieve_logs(
-              embedding=state.embedding,
-              base_threshold=0.4,      # Must be semantically relevant
-              final_threshold=0.5,     # Must pass final quality check
-              max_results=3)           # Maximum 3 logs (same as topics)
-          matched_logs = new_logs
-          print(f"🔍 LOG_MANAGER: retrieve_logs returned {len(matched_logs)} logs")
-      else:
-          print("🔍 LOG_MANAGER: No embedding available, skipping log search")
+      if matched_logs is None:
+          matched_logs = await self.find_logs(state.embedding)
 
       state.current_logs = matched_logs
       print(f"🔍 LOG_MANAGER: Final matched logs: {len(matched_logs)}")
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from api.agents.handlers.chat_model import TIME_MESSAGE_CONFIG, get_chat_model
+from api.agents.handlers.prompt_registry import prompt_registry
+from app.models import Chat_Session, Message
+
+logger = logging.getLogger(__name__)
+
+
+def previous_summary_for(user) -> str:
+  """Summary of the user's last completed session"""
+  last_chat_session = Chat_Session.objects.filter(
+      user=user, time_left=0).only('summary').order_by('-id').first()
+  if last_chat_session and last_chat_session.summary:
+    return last_chat_session.summary
+  return ""
+
+
+def opening_context(chat_session: Chat_Session,
+                    username: str,
+                    previous_summary: Optional[str] = None) -> Dict[str, Any]:
+  """Everything the opening prompt of a session is built from"""
+  if previous_summary is None:
+    previous_summary = previous_summary_for(chat_session.user_id)
+  return {
+      "username": username,
+      "first": bool(chat_session.first),
+      "previous_summary": previous_summary,
+  }
+
+
+def opening_context_hash(context: Dict[str, Any]) -> str:
+  payload = json.dumps(context, sort_keys=True, default=str)
+  return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _opening_prompt(template, context: Dict[str, Any]):
+  if context["first"]:
+    return template.invoke({"username": context["username"]})
+  return template.invoke({
+      "username": context["username"],
+      "summary": context["previous_summary"]
+  })
+
+
+def _prompt_name(context: Dict[str, Any]) -> str:
+  return "first_session_intro" if context["first"] else "other_session_intro"
+
+
+async def agenerate_opening(ai_model, context: Dict[str, Any]) -> str:
+  template = await prompt_registry.aget(_prompt_name(context))
+  response = await ai_model.ainvoke(_opening_prompt(template, context),
+                                    config=TIME_MESSAGE_CONFIG)
+  return response.content
+
+
+def generate_opening(ai_model, context: Dict[str, Any]) -> str:
+  template = prompt_registry.get(_prompt_name(context))
+  response = ai_model.invoke(_opening_prompt(template, context),
+                             config=TIME_MESSAGE_CONFIG)
+  return response.content
+
+
+def precompute_openings(days_ahead: int = 1,
+                        ai_model=None,
+                        force: bool = False) -> Dict[str, int]:
+  """
+    Generate and store the opening message of every upcoming session that
+    has not started yet. Sessions whose stored opening was generated from
+    the same context are skipped; a changed context (e.g. the summary of a
+    session that ended in between) regenerates it.
+    """
+  today = timezone.now().date()
+  chat_sessions = Chat_Session.objects.filter(
+      date__gte=today,
+      date__lte=today + timedelta(days=days_ahead),
+      time_left__gt=0).filter(~Exists(
+          Message.objects.filter(chat_session=OuterRef('pk')))).select_related(
+              'user').order_by('date', 'id')
+
+  counts = {"generated": 0, "unchanged": 0, "failed": 0}
+  for chat_session in chat_sessions:
+    context = opening_context(chat_session, chat_session.user.username)
+    context_hash = opening_context_hash(context)
+
+    if (not force and chat_session.opening_context_hash == context_hash
+        and chat_session.opening_message):
+      counts["unchanged"] += 1
+      continue
+
+    try:
+      ai_model = ai_model or get_chat_model()
+      message = generate_opening(ai_model, context)
+    except Exception as e:
+      logger.warning(
+          f"Could not generate opening for session {chat_session.id}: {str(e)}")
+      counts["failed"] += 1
+      continue
+
+    chat_session.opening_message = message
+    chat_session.opening_context_hash = context_hash
+    chat_session.save(
+        update_fields=['opening_message', 'opening_context_hash'])
+    counts["generated"] += 1
+
+  return counts
@@ -1,20 +1,22 @@
 from typing import List, Optional
+from dataclasses import replace
+from functools import partial
 from datetime import datetime
 from django.conf import settings
 import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from api.agents.handlers.embedding_cache import embedding_cache
+from api.agents.handlers.pinecone_pool import pinecone_pool, EMBEDDING_MODEL_NAME
+from api.agents.handlers.reranking import TimeBoostCurve, rerank
 from api.agents.models.conversation_models import TopicState, LogState
 import re
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer, WordNetLemmatizer
 from app.models import Topic
+from asgiref.sync import sync_to_async
 
 # LlamaIndex imports
-from llama_index.core import StorageContext, VectorStoreIndex
 from llama_index.core.schema import NodeWithScore, TextNode
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core.retrievers import BaseRetriever
 from llama_index.core import Settings
 # Create a VectorStoreQuery object
@@ -30,40 +32,27 @@ class PineconeManager:
     self._validate_settings()
     self.user_id = user_id
 
-    self.embedding_model = OpenAIEmbedding(model="text-embedding-3-small",
-                                           api_key=settings.OPENAI_API_KEY)
-    Settings.embed_model = self.embedding_model
+    # Clients, indexes and executor are shared by every session in the
+    # process; only the user_id filter on each query is per manager
+    pool = pinecone_pool.acquire(self)
 
-    # Initialize Pinecone vector stores with separate namespaces
-    self.topic_store = PineconeVectorStore(
-        index_name=settings.PINECONE_INDEX_NAME,
-        environment=settings.PINECONE_ENVIRONMENT,
-        namespace="topics",
-        api_key=settings.PINECONE_API_KEY)
+    self.embedding_model = pool.embedding_model
+    self.topic_store = pool.topic_store
+    self.log_store = pool.log_store
+    self.topic_index = pool.topic_index
+    self.log_index = pool.log_index
+    self.executor = pool.executor
 
-    self.log_store = PineconeVectorStore(
-        index_name=settings.PINECONE_INDEX_NAME,
-        environment=settings.PINECONE_ENVIRONMENT,
-        namespace="logs",
-        api_key=settings.PINECONE_API_KEY)
+    self.time_boost_curve = TimeBoostCurve.from_settings()
 
-    # Create indexes
-    self.topic_storage_context = StorageContext.from_defaults(
-        vector_store=self.topic_store)
-    self.log_storage_context = StorageContext.from_defaults(
-        vector_store=self.log_store)
-
-    self.topic_index = VectorStoreIndex.from_vector_store(
-        vector_store=self.topic_store,
-        storage_context=self.topic_storage_context)
-
-    self.log_index = VectorStoreIndex.from_vector_store(
-        vector_store=self.log_store, storage_context=self.log_storage_context)
-
-    # Create executor for async operations
-    self.executor = ThreadPoolExecutor(max_workers=3)
+  @staticmethod
+  def pool_stats() -> dict:
+    """Return statistics of the process-wide vector store pool"""
+    return pinecone_pool.stats()
 
   def _validate_settings(self):
+    if getattr(settings, 'VECTOR_BACKEND', 'pinecone') == 'local':
+      return
     required = ['PINECONE_INDEX_NAME']
     missing = [key for key in required if not hasattr(settings, key)]
     if missing:
@@ -71,20 +60,34 @@ class PineconeManager:
 
   async def get_text_embedding(self, text: str) -> List[float]:
     """Get embedding for text using the configured embedding model"""
-    return await asyncio.get_event_loop().run_in_executor(
-        self.executor, lambda: self.embedding_model.get_text_embedding(text))
+    return await embedding_cache.aget_or_compute(
+        EMBEDDING_MODEL_NAME, text,
+        partial(self.embedding_model.aget_text_embedding, text))
+
+  async def get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+    """Get embeddings for several texts with at most one embedding request"""
+    return await embedding_cache.aget_or_compute_many(
+        EMBEDDING_MODEL_NAME, texts,
+        self.embedding_model.aget_text_embedding_batch)
 
   class TimeDecayRetriever(BaseRetriever):
     """Custom retriever that applies time-boost to relevance scores"""
 
-    def __init__(self, vector_store, user_id, calculate_time_boost_fn,
-                 adjust_score_fn, parent_manager):
+    def __init__(self,
+                 vector_store,
+                 user_id,
+                 calculate_time_boost_fn,
+                 adjust_score_fn,
+                 parent_manager,
+                 time_boost_curve: Optional[TimeBoostCurve] = None):
       self.vector_store = vector_store
       self.user_id = user_id
       self.embedding_model = Settings.embed_model
       self.calculate_time_boost = calculate_time_boost_fn
       self.adjust_score = adjust_score_fn
       self.parent_manager = parent_manager
+      self.time_boost_curve = time_boost_curve or getattr(
+          parent_manager, 'time_boost_curve', None) or TimeBoostCurve()
 
     def _retrieve(
         self,
@@ -95,14 +98,11 @@ class PineconeManager:
         max_results=3):  # Final result limit
 
       # Build filters - only user_id for now
-      filter_list = [
+      filters = MetadataFilters(filters=[
           MetadataFilter(key="user_id",
                          operator=FilterOperator.EQ,
                          value=str(self.user_id))
-      ]
-
-      # Create metadata filters
-      filters = MetadataFilters(filters=filter_list)
+      ])
 
       # Create query - get more candidates initially
       vector_store_query = VectorStoreQuery(query_embedding=query_embedding,
@@ -111,112 +111,34 @@ class PineconeManager:
 
       # Execute query
       query_result = self.vector_store.query(vector_store_query)
+      nodes = list(getattr(query_result, 'nodes', None) or [])
+
+      similarities = getattr(query_result, 'similarities', None)
+      if similarities is None:
+        # Fallback: use scores from the nodes themselves or a default
+        similarities = [getattr(node, 'score', None) or 0.0 for node in nodes]
+      nodes = nodes[:len(similarities)]
+
+      if not nodes:
+        return []
+
+      # Threshold, time boost and top-k selection in one pass
+      indices, scores = rerank(
+          similarities=similarities[:len(nodes)],
+          dates=[node.metadata.get("date_updated") for node in nodes],
+          base_threshold=base_similarity_threshold,
+          final_threshold=final_score_threshold,
+          max_results=max_results,
+          curve=self.time_boost_curve)
+
       print(
-          f"🔧 RETRIEVER: Found {len(query_result.nodes)} raw results from vector store"
-      )
-      print(
-          f"🔧 RETRIEVER: Vector store namespace: {getattr(self.vector_store, 'namespace', 'unknown')}"
+          f"🔧 RETRIEVER: {len(indices)} of {len(nodes)} results from {getattr(self.vector_store, 'namespace', 'unknown')} passed re-ranking"
       )
-      print(f"🔧 RETRIEVER: Query filters: user_id={self.user_id}")
-
-      # Debug: Check what attributes are available on query_result
-      print(f"🔧 DEBUG: query_result type: {type(query_result)}")
-      print(f"🔧 DEBUG: query_result attributes: {dir(query_result)}")
-      if hasattr(query_result, 'similarities'):
-        print(
-            f"🔧 DEBUG: query_result.similarities: {query_result.similarities}")
-      if hasattr(query_result, 'scores'):
-        print(f"🔧 DEBUG: query_result.scores: {query_result.scores}")
-
-      # Convert TextNode results to NodeWithScore using scores from query_result
-      node_with_scores = []
-      if hasattr(query_result, 'nodes') and hasattr(query_result,
-                                                    'similarities'):
-        # If we have both nodes and similarities, create NodeWithScore objects
-        print("🔧 DEBUG: Using nodes and similarities")
-        for i, node in enumerate(query_result.nodes):
-          if i < len(query_result.similarities):
-            score = query_result.similarities[i]
-            node_with_score = NodeWithScore(node=node, score=score)
-            node_with_scores.append(node_with_score)
-            print(f"🔧 DEBUG: Created NodeWithScore with score {score}")
-      elif hasattr(query_result, 'nodes'):
-        # Fallback: try to get scores from the nodes themselves or use a default
-        print("🔧 DEBUG: Using fallback method")
-        for node in query_result.nodes:
-          if hasattr(node, 'score'):
-            node_with_score = NodeWithScore(node=node, score=node.score)
-          else:
-            # Create with a default score if none available
-            node_with_score = NodeWithScore(node=node, score=0.0)
-          node_with_scores.append(node_with_score)
-
-      print(f"Created {len(node_with_scores)} NodeWithScore objects")
-
-      # Stage 1: Filter by base similarity (semantic relevance)
-      semantically_relevant = []
-      for node_with_score in node_with_scores:
-        score = node_with_score.score
-        if score >= base_similarity_threshold:
-          semantically_relevant.append(node_with_score)
-          print(f"Passed semantic filter: score={score:.3f}")
-        else:
-          print(f"Filtered out semantically: score={score:.3f}")
-
-      print(f"After semantic filtering: {len(semantically_relevant)} results")
-
-      # Stage 2: Apply time boost to semantically relevant topics
-      time_boosted_results = []
-      for node_with_score in semantically_relevant:
-        try:
-          node = node_with_score.node
-          base_score = node_with_score.score
-          metadata = node.metadata
 
-          # Handle timestamp format (both numeric and ISO string)
-          date_updated_value = metadata.get("date_updated")
-
-          if date_updated_value:
-            try:
-              if isinstance(date_updated_value, (int, float)):
-                date = datetime.fromtimestamp(date_updated_value)
-              else:
-                date = datetime.fromisoformat(str(date_updated_value))
-            except (ValueError, TypeError):
-              date = datetime.now()
-              logger.warning(f"Could not parse date: {date_updated_value}")
-          else:
-            date = datetime.now()
-
-          # Apply time boost
-          boosted_score = self.adjust_score(base_score, date)
-
-          # Create new NodeWithScore with boosted score
-          boosted_node_with_score = NodeWithScore(node=node,
-                                                  score=boosted_score)
-          time_boosted_results.append(boosted_node_with_score)
-
-        except Exception as e:
-          logger.warning(f"Error processing result: {str(e)}")
-          continue
-
-      # Sort by boosted score (highest first)
-      time_boosted_results.sort(key=lambda x: x.score, reverse=True)
-
-      # Stage 3: Apply final threshold and limit results
-      final_results = []
-      for node_with_score in time_boosted_results:
-        if node_with_score.score >= final_score_threshold and len(
-            final_results) < max_results:
-          final_results.append(node_with_score)
-          print(f"Final result: score={node_with_score.score:.3f}")
-        elif node_with_score.score < final_score_threshold:
-          print(
-              f"Filtered out by final threshold: score={node_with_score.score:.3f}"
-          )
-
-      print(f"Final results: {len(final_results)} topics")
-      return final_results
+      return [
+          NodeWithScore(node=nodes[i], score=float(score))
+          for i, score in zip(indices, scores)
+      ]
 
     async def retrieve(self, query, **kwargs):
       """Handle both string queries and embeddings"""
@@ -237,6 +159,43 @@ class PineconeManager:
                             final_score_threshold=final_threshold,
                             max_results=max_results)
 
+  @staticmethod
+  def _parse_date(date_updated_value) -> datetime:
+    """Parse the date_updated metadata (numeric timestamp or ISO string)"""
+    if date_updated_value:
+      try:
+        if isinstance(date_updated_value, (int, float)):
+          return datetime.fromtimestamp(date_updated_value)
+        return datetime.fromisoformat(str(date_updated_value))
+      except (ValueError, TypeError):
+        pass
+    return datetime.now()
+
+  @staticmethod
+  def _topic_ids_of(results) -> List[int]:
+    topic_ids = []
+    for node_with_score in results:
+      try:
+        topic_ids.append(int(node_with_score.node.metadata.get('topic_id')))
+      except (ValueError, TypeError):
+        continue
+    return topic_ids
+
+  async def _fetch_topics(self, topic_ids: List[int], *fields) -> dict:
+    """
+    Load all topics referenced by retrieval hits with a single query.
+    Only the requested columns are loaded, so unused encrypted fields are
+    never decrypted.
+    """
+    if not topic_ids:
+      return {}
+
+    @sync_to_async
+    def get_topics():
+      return Topic.objects.only('id', *fields).in_bulk(set(topic_ids))
+
+    return await get_topics()
+
   async def retrieve_topics(
       self,
       embedding: List[float],
@@ -261,62 +220,36 @@ class PineconeManager:
                                       final_score_threshold=final_threshold,
                                       max_results=max_results))
 
-      # Convert results to TopicState objects
+      # Hydrate all hits with one query instead of one per node
+      topics_by_id = await self._fetch_topics(self._topic_ids_of(results),
+                                              'name', 'description')
+
+      # Convert results to TopicState objects, keeping retrieval order
       topics = []
       for node_with_score in results:
         try:
-          node = node_with_score.node
-          metadata = node.metadata
-
-          topic_id = metadata.get('topic_id')
-          if topic_id is None:
-            continue
-
-          try:
-            topic_id = int(topic_id)
-
-            # Use sync_to_async for Django ORM call
-            from asgiref.sync import sync_to_async
+          metadata = node_with_score.node.metadata
+          topic_id = int(metadata.get('topic_id'))
+        except (ValueError, TypeError):
+          logger.warning(
+              f"Invalid topic_id in metadata: {metadata.get('topic_id')}")
+          continue
 
-            @sync_to_async
-            def get_topic():
-              return Topic.objects.get(id=topic_id)
+        topic = topics_by_id.get(topic_id)
+        if topic is None:
+          logger.warning(f"Invalid topic_id or topic not found: {topic_id}")
+          continue
 
-            topic = await get_topic()
-          except (ValueError, TypeError, Topic.DoesNotExist) as e:
-            logger.warning(f"Invalid topic_id or topic not found: {topic_id}")
-            continue
+        topic_state = TopicState(
+            topic_id=topic_id,
+            topic_name=topic.name,
+            text=topic.description,
+            confidence=node_with_score.score,  # This is the boosted score
+            embedding=[],
+            date_updated=self._parse_date(metadata.get("date_updated")))
 
-          # Parse date for TopicState
-          date_updated_value = metadata.get("date_updated")
-          if date_updated_value:
-            try:
-              if isinstance(date_updated_value, (int, float)):
-                date_updated = datetime.fromtimestamp(date_updated_value)
-              else:
-                date_updated = datetime.fromisoformat(str(date_updated_value))
-            except (ValueError, TypeError):
-              date_updated = datetime.now()
-          else:
-            date_updated = datetime.now()
-
-          # Create TopicState
-          topic_state = TopicState(
-              topic_id=topic_id,
-              topic_name=topic.name,
-              text=topic.description,
-              confidence=node_with_score.score,  # This is the boosted score
-              embedding=[],
-              date_updated=date_updated)
-
-          topics.append(topic_state)
-          print(
-              f"Added topic: {topic.name} (score: {node_with_score.score:.3f})"
-          )
-
-        except Exception as e:
-          logger.warning(f"Error processing topic: {str(e)}")
-          continue
+        topics.append(topic_state)
+        print(f"Added topic: {topic.name} (score: {node_with_score.score:.3f})")
 
       print(f"Returning {len(topics)} topics")
       return topics
@@ -334,10 +267,6 @@ class PineconeManager:
     Retrieve logs similar to the query with time-boost applied to scores.
     """
     print(f"🔍 PINECONE: Starting retrieve_logs for user_id={self.user_id}")
-    print(f"🔍 PINECONE: Embedding length: {len(embedding)}")
-    print(
-        f"🔍 PINECONE: Thresholds - base: {base_threshold}, final: {final_threshold}"
-    )
 
     try:
       # Create retriever with time BOOST functions (not decay)
@@ -348,8 +277,6 @@ class PineconeManager:
           adjust_score_fn=self.adjust_score_with_time_boost,
           parent_manager=self)
 
-      print("🔍 PINECONE: Created TimeDecayRetriever for logs namespace")
-
       # Use the new 3-stage retrieval system
       results = await asyncio.get_event_loop().run_in_executor(
           self.executor,
@@ -360,92 +287,43 @@ class PineconeManager:
 
       print(f"🔍 PINECONE: Raw retrieval returned {len(results)} results")
 
-      # Convert results to LogState objects
+      # Only topic names are needed for logs; load them in one query
+      topics_by_id = await self._fetch_topics(self._topic_ids_of(results),
+                                              'name')
+
+      # Convert results to LogState objects, keeping retrieval order
       logs = []
-      for i, node_with_score in enumerate(results):
-        print(f"🔍 PINECONE: Processing result {i+1}")
+      for node_with_score in results:
         try:
-          print(f"🔍 PINECONE: Step 1 - Getting node from result")
           node = node_with_score.node
-          print(f"🔍 PINECONE: Step 2 - Getting metadata from node")
           metadata = node.metadata
-          print(f"🔍 PINECONE: Node metadata: {metadata}")
-
-          print(
-              f"🔍 PINECONE: Step 3 - Extracting topic_id and chat_session_id")
           topic_id = metadata.get('topic_id')
           chat_session_id = metadata.get('chat_session_id')
-          print(
-              f"🔍 PINECONE: Extracted topic_id={topic_id}, chat_session_id={chat_session_id}"
-          )
-
-          print(f"🔍 PINECONE: Step 4 - Importing sync_to_async")
-          from asgiref.sync import sync_to_async
-
-          print(f"🔍 PINECONE: Step 5 - Defining get_topic_and_logs function")
-
-          @sync_to_async
-          def get_topic_and_logs():
-            try:
-              print(f"🔍 PINECONE: Step 5a - Getting topic from database")
-              topic = Topic.objects.get(id=topic_id)
-              print(f"🔍 PINECONE: Step 5b - Getting topic name")
-              topic_name = topic.name  # Access attribute while in sync context
-              print(
-                  f"🔍 PINECONE: Found topic '{topic_name}' for session {chat_session_id}"
-              )
-              return topic, topic_name
-            except (Topic.DoesNotExist, AttributeError) as e:
-              print(f"🔍 PINECONE: Error getting topic: {e}")
-              return None, None
 
-          print(
-              f"🔍 PINECONE: Step 6 - Calling get_topic_and_logs async function"
-          )
-          topic, topic_name = await get_topic_and_logs()
-          print(
-              f"🔍 PINECONE: Step 7 - get_topic_and_logs completed successfully"
-          )
+          try:
+            topic = topics_by_id.get(int(topic_id))
+          except (ValueError, TypeError):
+            topic = None
 
-          print(f"🔍 PINECONE: Step 8 - Checking if topic exists")
           if not topic:
             print(f"🔍 PINECONE: No topic found for topic_id={topic_id}")
             continue
 
-          print(f"🔍 PINECONE: Step 10 - Parsing date")
-          # Parse date
-          date_updated_value = metadata.get('date_updated')
-          if date_updated_value:
-            try:
-              if isinstance(date_updated_value, (int, float)):
-                date = datetime.fromtimestamp(date_updated_value)
-              else:
-                date = datetime.fromisoformat(str(date_updated_value))
-            except (ValueError, TypeError):
-              date = datetime.now()
-          else:
-            date = datetime.now()
-
-          print(f"🔍 PINECONE: Step 11 - Creating LogState")
-          # Create LogState for each log in the session (or just use the text from the node)
           # Since the node text contains the prepared text, we'll use that
           log_state = LogState(
               topic_id=topic_id,
-              topic_name=topic_name,
+              topic_name=topic.name,
               text=node.text,  # Use the text from the vector store node
-              date=date,
+              date=self._parse_date(metadata.get('date_updated')),
               chat_session_id=chat_session_id,
               confidence=node_with_score.score)  # Add confidence
 
-          print(f"🔍 PINECONE: Step 12 - Appending LogState to logs list")
           logs.append(log_state)
           print(
-              f"🔍 PINECONE: Created LogState for topic '{topic_name}' with confidence {node_with_score.score:.3f}"
+              f"🔍 PINECONE: Created LogState for topic '{topic.name}' with confidence {node_with_score.score:.3f}"
           )
-          print(f"🔍 PINECONE: Step 13 - Successfully processed result {i+1}")
 
         except Exception as e:
-          print(f"🔍 PINECONE: Error processing log result {i+1}: {str(e)}")
           logger.warning(f"Error processing log: {str(e)}")
           continue
 
@@ -508,26 +386,17 @@ class PineconeManager:
 
   def calculate_time_boost(self,
                            date_updated: datetime,
-                           max_boost=0.5) -> float:
+                           max_boost=None) -> float:
     """
-    Calculate time boost - newer items get higher boost
-    max_boost: maximum boost factor (0.5 = 50% score increase)
+    Calculate time boost - newer items get higher boost, following the
+    configured TimeBoostCurve
+    max_boost: optional override of the curve's maximum boost factor
     """
-    now = datetime.now()
-    days_elapsed = (now - date_updated).days
-
-    # Recent items (< 7 days) get full boost
-    if days_elapsed < 7:
-      return max_boost
-    # Items within 30 days get declining boost
-    elif days_elapsed < 30:
-      return max_boost * (1 - (days_elapsed - 7) / 23)  # Linear decline
-    # Items within 90 days get small boost
-    elif days_elapsed < 90:
-      return max_boost * 0.1  # Small boost
-    # Older items get no boost
-    else:
-      return 0.0
+    curve = self.time_boost_curve
+    if max_boost is not None:
+      curve = replace(curve, max_boost=max_boost)
+    days_elapsed = (datetime.now() - date_updated).days
+    return float(curve.boost(days_elapsed))
 
   def adjust_score_with_time_boost(self, base_score: float,
                                    last_updated: datetime) -> float:
@@ -652,6 +521,130 @@ class PineconeManager:
       logger.error(f"Error updating topic vector: {str(e)}")
       return False
 
+  @staticmethod
+  def _metadata_filters(**values) -> MetadataFilters:
+    """Filters matching vectors whose metadata equals all the given values"""
+    return MetadataFilters(filters=[
+        MetadataFilter(key=key, value=value, operator=FilterOperator.EQ)
+        for key, value in values.items()
+    ])
+
+  async def upsert_topics_bulk(self, topics: List[TopicState]) -> bool:
+    """
+    Replace the vectors of several topics at once.
+
+    All topic texts are embedded in one request and the new nodes are
+    written with a single vector store insert.
+
+    Args:
+        topics: The topics with their updated names and descriptions
+
+    Returns:
+        bool: True if update successful, False otherwise
+    """
+    if not topics:
+      return True
+
+    try:
+      prepared_texts = [
+          self.prepare_text_for_embedding(topic.topic_name + " " + topic.text)
+          for topic in topics
+      ]
+      embeddings = await self.get_text_embeddings(prepared_texts)
+
+      date_updated = datetime.now().timestamp()
+      nodes = [
+          TextNode(text=prepared_text,
+                   metadata={
+                       "topic_id": str(topic.topic_id),
+                       "user_id": str(self.user_id),
+                       "date_updated": date_updated
+                   },
+                   embedding=embedding) for topic, prepared_text, embedding in
+          zip(topics, prepared_texts, embeddings)
+      ]
+
+      def replace_nodes():
+        # A topic whose old vector could not be deleted keeps it, so
+        # retrieval does not return the topic twice
+        replaced = []
+        for node in nodes:
+          try:
+            self.topic_store.delete_nodes(
+                filters=self._metadata_filters(
+                    topic_id=node.metadata["topic_id"],
+                    user_id=node.metadata["user_id"]))
+            replaced.append(node)
+          except Exception as e:
+            logger.error(f"Could not delete vector of topic "
+                         f"{node.metadata['topic_id']}: {str(e)}")
+        if replaced:
+          self.topic_index.insert_nodes(replaced)
+        return replaced
+
+      replaced = await asyncio.get_event_loop().run_in_executor(
+          self.executor, replace_nodes)
+
+      print(f"Successfully upserted {len(replaced)} of {len(nodes)} topics")
+      return len(replaced) == len(nodes)
+
+    except Exception as e:
+      logger.error(f"Error bulk upserting topics: {str(e)}")
+      return False
+
+  async def upsert_logs_bulk(self, logs: List[LogState]) -> bool:
+    """
+    Insert several log entries into the vector store with one embedding
+    request and one vector store insert.
+    """
+    if not logs:
+      return True
+
+    try:
+      prepared_texts = [
+          self.prepare_text_for_embedding(log.topic_name + " " + log.text)
+          for log in logs
+      ]
+      embeddings = await self.get_text_embeddings(prepared_texts)
+
+      date_updated = datetime.now().timestamp()
+      nodes = [
+          TextNode(text=prepared_text,
+                   metadata={
+                       "user_id": str(self.user_id),
+                       "topic_id": str(log.topic_id),
+                       "chat_session_id": str(log.chat_session_id),
+                       "date_updated": date_updated
+                   },
+                   embedding=embedding)
+          for log, prepared_text, embedding in zip(logs, prepared_texts,
+                                                   embeddings)
+      ]
+
+      await asyncio.get_event_loop().run_in_executor(
+          self.executor, lambda: self.log_index.insert_nodes(nodes))
+
+      print(f"Successfully upserted {len(nodes)} logs")
+      return True
+
+    except Exception as e:
+      logger.error(f"Error bulk upserting logs: {str(e)}")
+      return False
+
+  async def delete_session_logs(self, chat_session_id: int) -> bool:
+    """Remove the log vectors written for a chat session"""
+    try:
+      await asyncio.get_event_loop().run_in_executor(
+          self.executor, lambda: self.log_store.delete_nodes(
+              filters=self._metadata_filters(
+                  chat_session_id=str(chat_session_id),
+                  user_id=str(self.user_id))))
+      return True
+
+    except Exception as e:
+      logger.error(f"Error deleting session log vectors: {str(e)}")
+      return False
+
   def prepare_text_for_embedding(self,
                                  text,
                                  remove_stopwords=False,
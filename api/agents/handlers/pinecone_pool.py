@@ -0,0 +1,129 @@
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from django.conf import settings
+
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core import Settings
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.vector_stores.pinecone import PineconeVectorStore
+
+from api.agents.handlers.local_vector_store import LocalVectorStore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+
+
+class PineconePool:
+  """
+    Process-wide holder of the heavyweight vector store objects.
+
+    Every PineconeManager used to build its own embedding model, two
+    Pinecone clients, two indexes and a private thread pool on each chat
+    connect. The pool builds them once per process and hands the same
+    objects to every manager; user scoping is done only through the
+    metadata filters of each query.
+
+    settings.VECTOR_BACKEND selects Pinecone ('pinecone', default) or the
+    in-process LocalVectorStore ('local').
+    """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._initialized = False
+    self._managers = weakref.WeakSet()
+    self.backend = getattr(settings, 'VECTOR_BACKEND', 'pinecone')
+
+    self.embedding_model = None
+    self.topic_store = None
+    self.log_store = None
+    self.topic_index = None
+    self.log_index = None
+    self.executor = None
+
+  def _initialize(self):
+    self.embedding_model = OpenAIEmbedding(model=EMBEDDING_MODEL_NAME,
+                                           api_key=settings.OPENAI_API_KEY)
+    Settings.embed_model = self.embedding_model
+
+    if self.backend == "local":
+      self._initialize_local()
+    else:
+      self._initialize_pinecone()
+
+    # One bounded executor shared by every session in this process
+    self.executor = ThreadPoolExecutor(
+        max_workers=getattr(settings, 'PINECONE_EXECUTOR_WORKERS', 8),
+        thread_name_prefix="pinecone")
+
+    logger.info("Initialized shared Pinecone pool")
+
+  def _initialize_pinecone(self):
+    # Initialize Pinecone vector stores with separate namespaces
+    self.topic_store = PineconeVectorStore(
+        index_name=settings.PINECONE_INDEX_NAME,
+        environment=settings.PINECONE_ENVIRONMENT,
+        namespace="topics",
+        api_key=settings.PINECONE_API_KEY)
+
+    self.log_store = PineconeVectorStore(
+        index_name=settings.PINECONE_INDEX_NAME,
+        environment=settings.PINECONE_ENVIRONMENT,
+        namespace="logs",
+        api_key=settings.PINECONE_API_KEY)
+
+    self.topic_index = VectorStoreIndex.from_vector_store(
+        vector_store=self.topic_store,
+        storage_context=StorageContext.from_defaults(
+            vector_store=self.topic_store))
+
+    self.log_index = VectorStoreIndex.from_vector_store(
+        vector_store=self.log_store,
+        storage_context=StorageContext.from_defaults(
+            vector_store=self.log_store))
+
+  def _initialize_local(self):
+    # The local store exposes insert_nodes itself, so it doubles as index
+    directory = getattr(settings, 'LOCAL_VECTOR_STORE_DIR', 'vector_index')
+    self.topic_store = LocalVectorStore(namespace="topics",
+                                        directory=directory)
+    self.log_store = LocalVectorStore(namespace="logs", directory=directory)
+    self.topic_index = self.topic_store
+    self.log_index = self.log_store
+
+  def acquire(self, manager) -> "PineconePool":
+    """Initialize the shared objects on first use and track the manager"""
+    if not self._initialized:
+      with self._lock:
+        if not self._initialized:
+          self._initialize()
+          self._initialized = True
+
+    self._managers.add(manager)
+    return self
+
+  def stats(self) -> Dict[str, Any]:
+    """Per-process statistics of the shared pool"""
+    queue_depth = 0
+    max_workers = 0
+    threads = 0
+    if self.executor is not None:
+      queue_depth = self.executor._work_queue.qsize()
+      max_workers = self.executor._max_workers
+      threads = len(self.executor._threads)
+
+    return {
+        "initialized": self._initialized,
+        "backend": self.backend,
+        "active_clients": len(self._managers),
+        "executor_max_workers": max_workers,
+        "executor_threads": threads,
+        "executor_queue_depth": queue_depth,
+    }
+
+
+pinecone_pool = PineconePool()
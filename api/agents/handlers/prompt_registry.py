@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Every LangSmith hub prompt the conversation agents use
+PROMPT_NAMES = (
+    "first_session_intro",
+    "other_session_intro",
+    "end_of_session",
+    "ending_soon",
+    "process_topics_and_character",
+    "process_logs",
+    "topic_discuss",
+    "create_topic_json",
+    "change_of_topics",
+    "chat_mr_week",
+)
+
+
+@dataclass
+class _PromptEntry:
+  template: Any
+  commit_hash: Optional[str]
+  fetched_at: float
+
+
+class PromptRegistry:
+  """
+    Process-wide cache of LangSmith hub prompts.
+
+    get()/aget() return the cached ChatPromptTemplate right away. Entries
+    older than ttl seconds are revalidated in a background thread: the
+    latest commit hash is compared with the cached one and the template is
+    only pulled again if it changed. Prompts pinned in
+    settings.PROMPT_VERSIONS ({name: commit_hash}) are immutable and never
+    revalidated.
+
+    If snapshot_path is set, pulled templates are also written there and
+    used on cold start, so a new process (or one without network access)
+    does not have to wait for the hub.
+    """
+
+  def __init__(self,
+               ttl: float = 300,
+               snapshot_path: Optional[str] = None,
+               versions: Optional[Dict[str, str]] = None):
+    self.ttl = ttl
+    self.snapshot_path = snapshot_path
+    self.versions = dict(versions or {})
+
+    self._entries: Dict[str, _PromptEntry] = {}
+    self._lock = threading.Lock()
+    self._refreshing = set()
+    self._snapshot_loaded = False
+    self._client = None
+    self._executor = ThreadPoolExecutor(max_workers=2,
+                                        thread_name_prefix="prompts")
+
+  @property
+  def client(self):
+    if self._client is None:
+      from langsmith import Client
+      self._client = Client()
+    return self._client
+
+  def _identifier(self, name: str) -> str:
+    version = self.versions.get(name)
+    return f"{name}:{version}" if version else name
+
+  # Snapshot
+
+  def _load_snapshot(self):
+    with self._lock:
+      if self._snapshot_loaded:
+        return
+      self._snapshot_loaded = True
+
+    if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+      return
+
+    try:
+      from langchain_core.load.load import load
+
+      with open(self.snapshot_path, encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+      with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        entries = {
+            name: _PromptEntry(template=load(data["template"]),
+                               commit_hash=data.get("commit_hash"),
+                               fetched_at=0)
+            for name, data in snapshot.items()
+        }
+    except Exception as e:
+      logger.warning(f"Could not load prompt snapshot: {str(e)}")
+      return
+
+    with self._lock:
+      for name, entry in entries.items():
+        # A snapshot of another pinned version is of no use
+        pinned = self.versions.get(name)
+        if pinned and entry.commit_hash != pinned:
+          continue
+        self._entries.setdefault(name, entry)
+
+  def save_snapshot(self, path: Optional[str] = None) -> Optional[str]:
+    """Write all cached templates to the snapshot file"""
+    path = path or self.snapshot_path
+    if not path:
+      return None
+
+    from langchain_core.load import dumpd
+
+    with self._lock:
+      snapshot = {
+          name: {
+              "commit_hash": entry.commit_hash,
+              "template": dumpd(entry.template)
+          }
+          for name, entry in self._entries.items()
+      }
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+      json.dump(snapshot, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+    return path
+
+  # Fetching
+
+  def _pull(self, name: str) -> _PromptEntry:
+    """Pull a prompt from the hub, skipping the download if unchanged"""
+    identifier = self._identifier(name)
+    cached = self._entries.get(name)
+
+    if cached is not None and cached.commit_hash and name not in self.versions:
+      commit = self.client.pull_prompt_commit(identifier)
+      if commit.commit_hash == cached.commit_hash:
+        cached.fetched_at = time.monotonic()
+        return cached
+      identifier = f"{name}:{commit.commit_hash}"
+
+    template = self.client.pull_prompt(identifier)
+    commit_hash = (getattr(template, 'metadata', None)
+                   or {}).get("lc_hub_commit_hash") or self.versions.get(name)
+
+    entry = _PromptEntry(template=template,
+                         commit_hash=commit_hash,
+                         fetched_at=time.monotonic())
+    with self._lock:
+      self._entries[name] = entry
+
+    if self.snapshot_path:
+      try:
+        self.save_snapshot()
+      except Exception as e:
+        logger.warning(f"Could not write prompt snapshot: {str(e)}")
+    return entry
+
+  def _revalidate(self, name: str):
+    try:
+      self._pull(name)
+    except Exception as e:
+      # Keep serving the cached template while the hub is unreachable
+      logger.warning(f"Could not revalidate prompt {name}: {str(e)}")
+    finally:
+      with self._lock:
+        self._refreshing.discard(name)
+
+  def _schedule_revalidation(self, name: str, entry: _PromptEntry):
+    if name in self.versions and entry.commit_hash:
+      return
+    if time.monotonic() - entry.fetched_at < self.ttl:
+      return
+
+    with self._lock:
+      if name in self._refreshing:
+        return
+      self._refreshing.add(name)
+    self._executor.submit(self._revalidate, name)
+
+  def _cached(self, name: str) -> Optional[_PromptEntry]:
+    if not self._snapshot_loaded:
+      self._load_snapshot()
+    entry = self._entries.get(name)
+    if entry is not None:
+      self._schedule_revalidation(name, entry)
+    return entry
+
+  # Public interface
+
+  def get(self, name: str):
+    """Template for name; blocks on the hub only if nothing is cached"""
+    entry = self._cached(name)
+    if entry is None:
+      entry = self._pull(name)
+    return entry.template
+
+  async def aget(self, name: str):
+    """Async get(); a cold pull runs in the registry's thread pool"""
+    entry = self._cached(name)
+    if entry is None:
+      entry = await asyncio.get_event_loop().run_in_executor(
+          self._executor, self._pull, name)
+    return entry.template
+
+  def refresh(self, names: Iterable[str] = PROMPT_NAMES) -> Dict[str, str]:
+    """Pull the given prompts now; returns their commit hashes"""
+    if not self._snapshot_loaded:
+      self._load_snapshot()
+    return {name: self._pull(name).commit_hash for name in names}
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+
+prompt_registry = PromptRegistry(
+    ttl=getattr(settings, 'PROMPT_CACHE_TTL', 300),
+    snapshot_path=getattr(settings, 'PROMPT_SNAPSHOT_PATH', None),
+    versions=getattr(settings, 'PROMPT_VERSIONS', {}))
@@ -0,0 +1,144 @@
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+SECONDS_PER_DAY = 86400.0
+
+# Below this many candidates a plain loop beats the NumPy call overhead
+# (see scripts/bench_rerank.py); retrieval normally asks for top_k=10
+VECTORIZE_MIN_CANDIDATES = 500
+
+
+@dataclass(frozen=True)
+class TimeBoostCurve:
+  """
+    Piecewise time boost applied on top of the similarity score.
+
+    Items newer than full_boost_days get max_boost, the boost then declines
+    linearly until decline_until_days, stays at max_boost * tail_factor
+    until tail_until_days and is zero afterwards.
+    """
+  max_boost: float = 0.5
+  full_boost_days: int = 7
+  decline_until_days: int = 30
+  tail_until_days: int = 90
+  tail_factor: float = 0.1
+
+  @classmethod
+  def from_settings(cls) -> "TimeBoostCurve":
+    return cls(**getattr(settings, 'RETRIEVAL_TIME_BOOST', {}))
+
+  def boost_days(self, days_elapsed: float) -> float:
+    """Boost factor for one whole number of days since the last update"""
+    if days_elapsed < self.full_boost_days:
+      return self.max_boost
+    if days_elapsed < self.decline_until_days:
+      decline_span = max(self.decline_until_days - self.full_boost_days, 1)
+      return self.max_boost * (1 - (days_elapsed - self.full_boost_days) /
+                               decline_span)
+    if days_elapsed < self.tail_until_days:
+      return self.max_boost * self.tail_factor
+    return 0.0
+
+  def boost(self, days_elapsed: np.ndarray) -> np.ndarray:
+    """Boost factor for an array of whole days since the last update"""
+    days_elapsed = np.asarray(days_elapsed, dtype=np.float64)
+    decline_span = max(self.decline_until_days - self.full_boost_days, 1)
+    declining = self.max_boost * (1 - (days_elapsed - self.full_boost_days) /
+                                  decline_span)
+    return np.select([
+        days_elapsed < self.full_boost_days,
+        days_elapsed < self.decline_until_days,
+        days_elapsed < self.tail_until_days
+    ], [self.max_boost, declining, self.max_boost * self.tail_factor],
+                     default=0.0)
+
+
+def _to_timestamp(value, now: float) -> float:
+  if isinstance(value, (int, float)):
+    return float(value)
+  if value:
+    try:
+      return datetime.fromisoformat(str(value)).timestamp()
+    except (ValueError, TypeError):
+      pass
+  return now
+
+
+def timestamps_from_metadata(values: Iterable,
+                             now: Optional[float] = None) -> List[float]:
+  """
+    Convert date_updated metadata values (numeric timestamps or ISO
+    strings) to POSIX timestamps. Missing or unparsable values count as
+    "now".
+    """
+  now = time.time() if now is None else now
+  return [_to_timestamp(value, now) for value in values]
+
+
+def _rerank_loop(similarities, dates, base_threshold, final_threshold,
+                 max_results, curve, now):
+  scored = []
+  for index, (similarity, date) in enumerate(zip(similarities, dates)):
+    if similarity < base_threshold:
+      continue
+    # Only the dates of candidates above the threshold are parsed
+    days_elapsed = math.floor(
+        (now - _to_timestamp(date, now)) / SECONDS_PER_DAY)
+    score = similarity * (1 + curve.boost_days(days_elapsed))
+    if score >= final_threshold:
+      scored.append((index, score))
+
+  scored.sort(key=lambda item: -item[1])
+  scored = scored[:max_results]
+  return [index for index, _ in scored], [score for _, score in scored]
+
+
+def _rerank_vectorized(similarities, dates, base_threshold, final_threshold,
+                       max_results, curve, now):
+  similarities = np.asarray(similarities, dtype=np.float64)
+  timestamps = np.asarray(timestamps_from_metadata(dates, now),
+                          dtype=np.float64)
+
+  days_elapsed = np.floor((now - timestamps) / SECONDS_PER_DAY)
+  scores = similarities * (1 + curve.boost(days_elapsed))
+
+  candidates = np.flatnonzero((similarities >= base_threshold)
+                              & (scores >= final_threshold))
+  order = np.argsort(-scores[candidates], kind='stable')[:max_results]
+  selected = candidates[order]
+  return selected.tolist(), scores[selected].tolist()
+
+
+def rerank(similarities,
+           dates,
+           base_threshold: float,
+           final_threshold: float,
+           max_results: int,
+           curve: Optional[TimeBoostCurve] = None,
+           now: Optional[float] = None) -> Tuple[List[int], List[float]]:
+  """
+    Threshold, time-boost and select results.
+
+    1. drop candidates whose similarity is below base_threshold
+    2. boost the remaining scores by the age of each item, from its
+       date_updated metadata value (see timestamps_from_metadata)
+    3. keep at most max_results with a boosted score >= final_threshold
+
+    Small candidate lists go through a plain loop, large ones through one
+    NumPy pass; both give the same result. Returns the indices of the
+    selected candidates (best first) and their boosted scores.
+    """
+  curve = curve or TimeBoostCurve()
+  now = time.time() if now is None else now
+
+  if len(similarities) < VECTORIZE_MIN_CANDIDATES:
+    return _rerank_loop(similarities, dates, base_threshold, final_threshold,
+                        max_results, curve, now)
+  return _rerank_vectorized(similarities, dates, base_threshold,
+                            final_threshold, max_results, curve, now)
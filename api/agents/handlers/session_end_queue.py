@@ -0,0 +1,160 @@
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.models import Chat_Session, Log, SessionEndTask, SessionEndWorker
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_session_end(chat_session_id: int) -> SessionEndTask:
+  """
+    Queue the end-of-session processing of a chat session.
+
+    The chat session is the idempotency key: enqueueing a session that is
+    already pending, running or done returns the existing task unchanged.
+    Only a task that ran out of attempts is queued again.
+    """
+  task, created = SessionEndTask.objects.get_or_create(
+      chat_session_id=chat_session_id,
+      defaults={
+          'max_attempts': getattr(settings, 'SESSION_END_MAX_ATTEMPTS', 3)
+      })
+  if not created and task.status == SessionEndTask.FAILED:
+    task.status = SessionEndTask.PENDING
+    task.attempts = 0
+    task.run_after = timezone.now()
+    task.save(update_fields=['status', 'attempts', 'run_after', 'date_updated'])
+  return task
+
+
+def claim_session_end_task() -> Optional[SessionEndTask]:
+  """
+    Lock the next due task and mark it running.
+
+    Rows locked by another worker are skipped. A running task whose worker
+    has not finished within SESSION_END_TASK_TIMEOUT seconds is considered
+    abandoned and can be claimed again.
+    """
+  now = timezone.now()
+  stale = now - timedelta(
+      seconds=getattr(settings, 'SESSION_END_TASK_TIMEOUT', 600))
+
+  with transaction.atomic():
+    task = (SessionEndTask.objects.select_for_update(skip_locked=True).filter(
+        Q(status=SessionEndTask.PENDING, run_after__lte=now)
+        | Q(status=SessionEndTask.RUNNING, locked_at__lt=stale)).order_by(
+            'run_after', 'id').first())
+    if task is None:
+      return None
+
+    task.status = SessionEndTask.RUNNING
+    task.attempts += 1
+    task.locked_at = now
+    task.save(update_fields=[
+        'status', 'attempts', 'locked_at', 'date_updated'
+    ])
+  return task
+
+
+def complete_session_end_task(task: SessionEndTask):
+  task.status = SessionEndTask.DONE
+  task.locked_at = None
+  task.last_error = ''
+  task.save(update_fields=['status', 'locked_at', 'last_error', 'date_updated'])
+
+
+def fail_session_end_task(task: SessionEndTask, error: str):
+  """Retry with exponential backoff until max_attempts is reached"""
+  task.locked_at = None
+  task.last_error = error[:2000]
+  if task.attempts >= task.max_attempts:
+    task.status = SessionEndTask.FAILED
+  else:
+    task.status = SessionEndTask.PENDING
+    backoff = getattr(settings, 'SESSION_END_RETRY_BACKOFF', 30)
+    task.run_after = timezone.now() + timedelta(
+        seconds=backoff * 2**(task.attempts - 1))
+  task.save(update_fields=[
+      'status', 'locked_at', 'last_error', 'run_after', 'date_updated'
+  ])
+
+
+def session_end_status(chat_session_id: int) -> Optional[SessionEndTask]:
+  return SessionEndTask.objects.filter(chat_session_id=chat_session_id).first()
+
+
+def record_worker_heartbeat(name: str):
+  SessionEndWorker.objects.update_or_create(
+      name=name, defaults={'last_seen': timezone.now()})
+
+
+def remove_worker_heartbeat(name: str):
+  SessionEndWorker.objects.filter(name=name).delete()
+
+
+def session_end_worker_alive() -> bool:
+  """
+    Whether a worker has reported within SESSION_END_WORKER_TIMEOUT seconds.
+    Without one (e.g. a worker process that was stopped or is throttled
+    after a Cloud Run instance stopped serving) queued sessions would wait
+    indefinitely, so the caller processes them inline instead.
+    """
+  since = timezone.now() - timedelta(
+      seconds=getattr(settings, 'SESSION_END_WORKER_TIMEOUT', 60))
+  return SessionEndWorker.objects.filter(last_seen__gte=since).exists()
+
+
+async def run_session_end(task: SessionEndTask):
+  """
+    Rebuild the conversation state of the task's session from the database
+    and run SessionManager.handle_state_end on it.
+    """
+  from api.agents.handlers.chat_model import get_chat_model
+  from api.agents.main.moment_manager import MomentManager
+
+  @database_sync_to_async
+  def load_chat_session():
+    chat_session = Chat_Session.objects.select_related('user').get(
+        id=task.chat_session_id)
+    if task.attempts > 1:
+      # Logs of an interrupted earlier attempt would be written twice
+      Log.objects.filter(chat_session=chat_session).delete()
+    return chat_session
+
+  chat_session = await load_chat_session()
+  moment_manager = MomentManager(chat_session.user,
+                                 chat_session,
+                                 get_chat_model(),
+                                 stream_message=None)
+  if task.attempts > 1:
+    # Logs of the failed attempt would otherwise be indexed twice
+    if not await moment_manager.pinecone_manager.delete_session_logs(
+        chat_session.id):
+      raise RuntimeError(
+          f"Could not remove log vectors of chat session {chat_session.id}")
+
+  await moment_manager.load_bootstrap()
+  moment_manager.session_manager.update_state(moment_manager.state)
+  await moment_manager.session_manager.handle_state_end()
+
+
+async def process_session_end_task(task: SessionEndTask) -> bool:
+  """Run a claimed task and record the outcome; True if it succeeded"""
+  try:
+    await run_session_end(task)
+  except Exception as e:
+    logger.error(
+        f"Session end task {task.id} (chat session {task.chat_session_id}) "
+        f"failed on attempt {task.attempts}: {str(e)}")
+    await database_sync_to_async(fail_session_end_task)(task, str(e))
+    return False
+
+  await database_sync_to_async(complete_session_end_task)(task)
+  return True
@@ -12,8 +12,12 @@ from typing import Optional
 from datetime import datetime
 import json
 from channels.db import database_sync_to_async
-from langsmith import Client
+from api.agents.handlers.prompt_registry import prompt_registry
+from api.agents.handlers.chat_model import TIME_MESSAGE_CONFIG
+from api.agents.handlers.opening_manager import agenerate_opening
 import asyncio
+from django.conf import settings
+from django.db import transaction
 
 
 class SessionManager:
@@ -30,35 +34,30 @@ class SessionManager:
     self.session_ended = False  # ADD THIS LINE
     self.ending_soon_sent = False
 
-    self.model_config_time = {
-        "configurable": {
-            "foo_temperature": 0.6,
-            "foo_reasoning_effort": "low"
-        }
-    }
-
-    self.client = Client()
+    self.model_config_time = TIME_MESSAGE_CONFIG
+    # Upper bound in seconds for each session-end extraction call
+    self.extraction_deadline = getattr(settings,
+                                       'SESSION_END_EXTRACTION_DEADLINE', 45)
+    # Concurrent per-topic log extraction calls at session end
+    self.log_concurrency = getattr(settings, 'SESSION_END_LOG_CONCURRENCY', 4)
+    self.log_report = None
 
     self.conversation_helper = conversation_helper
+    # Hub prompt names; templates come from the shared prompt registry
     self.prompts = {
-        "first_intro":
-        self.client.pull_prompt("first_session_intro"),
-        "other_intro":
-        self.client.pull_prompt("other_session_intro"),
-        "end_session":
-        self.client.pull_prompt("end_of_session"),
-        "end_soon":
-        self.client.pull_prompt("ending_soon"),
-        "process_topics_and_character":
-        self.client.pull_prompt("process_topics_and_character"),
-        "process_logs":
-        self.client.pull_prompt("process_logs"),
+        "end_session": "end_of_session",
+        "end_soon": "ending_soon",
+        "process_topics_and_character": "process_topics_and_character",
+        "process_logs": "process_logs",
     }
     self.state: Optional[ConversationState] = None
     self.summary: Optional[str] = ""
     self.topics: List[Any] = []
     self.prompt_topics: str = ""
 
+  async def get_prompt(self, key: str):
+    return await prompt_registry.aget(self.prompts[key])
+
   def update_state(self, state: ConversationState):
     """Update the current conversation state"""
     self.state = state
@@ -145,10 +144,10 @@ class SessionManager:
       return "Your session will end in 5 minutes."
 
     try:
-      prompt = self.prompts["end_soon"]
+      prompt = await self.get_prompt("end_soon")
       prompt = prompt.invoke({"username": self.state.username})
 
-      response = self.ai_model.invoke(prompt, config=self.model_config_time)
+      response = await self.ai_model.ainvoke(prompt, config=self.model_config_time)
 
       if hasattr(response, 'content'):
         response_text = response.content
@@ -163,19 +162,18 @@ class SessionManager:
       print(f"Error generating ending soon message: {e}")
       return "Your session will end in 5 minutes."
 
-  async def handle_start(self) -> str:
-    if self.chat_session.first:
-      prompt = self.prompts["first_intro"]
-      prompt = prompt.invoke({"username": self.state.username})
+  async def handle_start(self, opening_hash: Optional[str] = None) -> str:
+    # Use the opening generated ahead of time if its context is unchanged
+    if (opening_hash and self.chat_session.opening_message
+        and self.chat_session.opening_context_hash == opening_hash):
+      response_content = self.chat_session.opening_message
     else:
-      prompt = self.prompts["other_intro"]
-      prompt = prompt.invoke({
-          "username": self.state.username,
-          "summary": self.state.previous_summary
-      })
-
-    response = self.ai_model.invoke(prompt, config=self.model_config_time)
-    response_content = response.content
+      response_content = await agenerate_opening(
+          self.ai_model, {
+              "username": self.state.username,
+              "first": bool(self.chat_session.first),
+              "previous_summary": self.state.previous_summary
+          })
 
     if self.state.active_topics != "":
       response_content += "\nYou have the following active topics you discussed in the recent time: " + self.state.active_topics
@@ -225,7 +223,7 @@ class SessionManager:
 
     # Step 1: Process topics and character updates
     print("Processing topics and character updates")
-    topic_char_prompt = self.prompts["process_topics_and_character"].invoke({
+    topic_char_prompt = (await self.get_prompt("process_topics_and_character")).invoke({
         "topics":
         topics,
         "character":
@@ -235,7 +233,9 @@ class SessionManager:
     })
 
     topic_char_response = await self.conversation_helper.run_until_json(
-        topic_char_prompt, TopicAndCharacterJSON)
+        topic_char_prompt,
+        TopicAndCharacterJSON,
+        deadline=self.extraction_deadline)
     print(f"Received topic and character response: {topic_char_response}")
 
     # Extract processed topics
@@ -261,17 +261,15 @@ class SessionManager:
         topic_obj.save()
 
     async def update_topic_vectors():
-      update_tasks = []
-      for topic_data in new_topics:
-        topic_for_pinecone = TopicState(
-            topic_id=topic_data["topic_id"],
-            topic_name=topic_data["topic_name"],
-            text=topic_data["text"],
-            confidence=0.0,
-        )
-        update_tasks.append(
-            self.pinecone_manager.update_topic_vector(topic_for_pinecone))
-      await asyncio.gather(*update_tasks)
+      topics_for_pinecone = [
+          TopicState(
+              topic_id=topic_data["topic_id"],
+              topic_name=topic_data["topic_name"],
+              text=topic_data["text"],
+              confidence=0.0,
+          ) for topic_data in new_topics
+      ]
+      await self.pinecone_manager.upsert_topics_bulk(topics_for_pinecone)
       print("Updated topic vectors")
 
     # Update user character
@@ -279,68 +277,100 @@ class SessionManager:
 
     @database_sync_to_async
     def update_character():
+      # Extraction past its deadline returns empty values, keep the old one
+      if not topic_char_response["character"]:
+        return
       profile = Profile.objects.get(user_id=self.state.user_id)
       profile.character = topic_char_response["character"]
       self.chat_session.character = profile.character
-      profile.save()
+      # Only the character, so a stale copy cannot undo other profile edits
+      profile.save(update_fields=['character'])
 
     # Step 3: Process logs for each topic and build summary
-    async def process_logs_for_topics():
-      print("Processing logs for topics")
-      logs_prompt = self.prompts["process_logs"].invoke({
-          "topics":
-          self.topics,
-          "chat_history":
-          chat_history
-      })
-
-      log_response = await self.conversation_helper.run_until_json(
-          logs_prompt, LogJSON)
-      print(f"Received log response: {log_response}")
-
-      # Extract log data - now we have multiple logs
-      logs_data = log_response["logs"]  # Get the array
-
-      processed_logs = []
-
-      # Loop through each log entry
-      for log_entry in logs_data:
-        log_text = log_entry["text"]
-        topic_id = log_entry["topic_id"]
-        topic_name = log_entry["topic_name"]
-
-        print(f"Processing log for topic {topic_id}: {topic_name}")
-
-        # Create log in database
-        @database_sync_to_async
-        def create_log_in_db():
-          return Log.objects.create(user_id=self.state.user_id,
-                                    chat_session=self.chat_session,
-                                    topic_id=topic_id,
-                                    text=log_text)
-
-        # Update log in pinecone
-        async def update_log_vector():
-          log_for_pinecone = LogState(topic_id=topic_id,
-                                      text=log_text,
-                                      topic_name=topic_name,
-                                      chat_session_id=self.chat_session.id)
-          await self.pinecone_manager.upsert_log(log_for_pinecone)
-          print(f"Updated log vector for topic {topic_id}")
-
-        # Execute database and vector operations for this log
-        new_log = await create_log_in_db()
-        print(f"New log created in db for topic {topic_id}")
-        await update_log_vector()
-
-        # Store the processed log info
-        processed_logs.append({
-            "topic_id": topic_id,
-            "topic_name": topic_name,
-            "log_text": log_text
+    async def extract_topic_logs(topic, logs_template, semaphore):
+      """Log entries of one topic; raises if none could be extracted"""
+      async with semaphore:
+        logs_prompt = logs_template.invoke({
+            "topics": [topic],
+            "chat_history": chat_history
         })
+        log_response = await self.conversation_helper.run_until_json(
+            logs_prompt, LogJSON, deadline=self.extraction_deadline)
+
+      # run_until_json returns empty values when every attempt failed
+      logs_data = log_response["logs"]
+      if not logs_data:
+        raise ValueError("no log extracted")
+      return logs_data
+
+    @database_sync_to_async
+    def create_logs_in_db(logs_data):
+      """All Log rows and their SessionLog links in one transaction"""
+      with transaction.atomic():
+        new_logs = Log.objects.bulk_create([
+            Log(user_id=self.state.user_id,
+                chat_session=self.chat_session,
+                topic_id=log_entry["topic_id"],
+                text=log_entry["text"]) for log_entry in logs_data
+        ])
+        SessionLog.objects.bulk_create([
+            SessionLog(session=self.chat_session, log=log) for log in new_logs
+        ])
+      return new_logs
 
-      return processed_logs  # Return all processed logs
+    async def process_logs_for_topics():
+      """
+      Extract the logs of all topics concurrently (at most
+      log_concurrency LLM calls at once), then store them with one
+      transaction and one vector upsert. Topics whose extraction failed are
+      reported and skipped; if all of them fail the error is raised.
+      """
+      print("Processing logs for topics")
+      logs_template = await self.get_prompt("process_logs")
+      semaphore = asyncio.Semaphore(self.log_concurrency)
+
+      results = await asyncio.gather(*(extract_topic_logs(
+          topic, logs_template, semaphore) for topic in self.topics),
+                                     return_exceptions=True)
+
+      logs_data = []
+      failed_topics = []
+      for topic, result in zip(self.topics, results):
+        if isinstance(result, BaseException):
+          print(f"ERROR: Log extraction failed for topic "
+                f"{topic['topic_id']}: {result}")
+          failed_topics.append(topic['topic_id'])
+        else:
+          logs_data.extend(result)
+
+      if failed_topics and not logs_data:
+        raise RuntimeError(
+            f"Log extraction failed for all topics: {failed_topics}")
+
+      await create_logs_in_db(logs_data)
+      print(f"Created {len(logs_data)} logs in db")
+
+      # Update all log vectors in pinecone with one batched upsert
+      vectors_saved = await self.pinecone_manager.upsert_logs_bulk([
+          LogState(topic_id=log_entry["topic_id"],
+                   text=log_entry["text"],
+                   topic_name=log_entry["topic_name"],
+                   chat_session_id=self.chat_session.id)
+          for log_entry in logs_data
+      ])
+
+      self.log_report = {
+          "logs": len(logs_data),
+          "failed_topics": failed_topics,
+          "vectors_saved": vectors_saved
+      }
+      print(f"Log processing report: {self.log_report}")
+
+      return [{
+          "topic_id": log_entry["topic_id"],
+          "topic_name": log_entry["topic_name"],
+          "log_text": log_entry["text"]
+      } for log_entry in logs_data]
 
     # Step 4: Update session with comprehensive summary
     @database_sync_to_async
@@ -357,10 +387,12 @@ class SessionManager:
 
       self.summary = summary
       # Use the updated character from the AI response, not the state
-      self.chat_session.character = topic_char_response["character"]
+      if topic_char_response["character"]:
+        self.chat_session.character = topic_char_response["character"]
       self.chat_session.title = topic_char_response["title"]
       self.chat_session.summary = summary
-      self.chat_session.save()
+      self.chat_session.save(
+          update_fields=['time_left', 'title', 'summary', 'character'])
       print("Chat session saved")
 
     # Run the tasks in parallel where possible
@@ -383,10 +415,10 @@ class SessionManager:
     print("Generating end session message")
 
     try:
-      prompt = self.prompts["end_session"]
+      prompt = await self.get_prompt("end_session")
       prompt = prompt.invoke({"username": self.state.username})
 
-      response = self.ai_model.invoke(prompt, config=self.model_config_time)
+      response = await self.ai_model.ainvoke(prompt, config=self.model_config_time)
 
       if isinstance(response, dict) and 'content' in response:
         response_text = response['content']
@@ -398,7 +430,9 @@ class SessionManager:
       hash_before = "2458792345u01298347901283491234"
       response_text = hash_before + response_text
 
-      # Add summary if available
+      # Add summary if available. It is only set when handle_state_end ran
+      # inline; a queued session's summary is read from the endStatus
+      # endpoint once the worker is done (see the summary_pending frame)
       if hasattr(self, 'summary') and self.summary:
         response_text += f'\n\n{self.summary}'
 
@@ -1,5 +1,5 @@
 from api.agents.models.conversation_models import ConversationState, TopicState
-from typing import List
+from typing import List, Optional
 from app.models import Conversation_Session, SessionTopic, Topic
 from channels.db import database_sync_to_async
 from llama_index.core import Settings
@@ -46,35 +46,32 @@ class TopicManager:
 
     return topic
 
-  async def check_topics(self, state: ConversationState) -> ConversationState:
+  async def find_topics(self, embedding: List[float]) -> List[TopicState]:
+    """Retrieve the topics similar to a query embedding, without side effects"""
+    if not embedding:
+      return []
+
+    print("🎯 RETRIEVING: Querying Pinecone for similar topics...")
+    matched_topics = await self.pinecone_manager.retrieve_topics(
+        embedding=embedding,
+        base_threshold=0.3,  # Must be semantically relevant
+        final_threshold=0.5,  # Must pass final quality check
+        max_results=3)  # Maximum 3 topics
+    print(f"📦 RETRIEVED: Found {len(matched_topics)} matching topics from vector DB")
+    return matched_topics
+
+  async def check_topics(
+      self,
+      state: ConversationState,
+      matched_topics: Optional[List[TopicState]] = None) -> ConversationState:
+    """
+    Set the topics of the current turn. matched_topics can be passed in if
+    the retrieval already ran (see TurnPrefetch), otherwise it runs here.
+    """
     state.current_topics = []
-    matched_topics = []
 
-    print(f"🔧 DEBUG: state.embedding = {state.embedding}")
-    print(f"🔧 DEBUG: type(state.embedding) = {type(state.embedding)}")
-    print(f"🔧 DEBUG: embedding is None? {state.embedding is None}")
-    print(f"🔧 DEBUG: embedding is empty list? {state.embedding == []}")
-
-    if state.embedding:
-      print("🔍 TOPIC RETRIEVAL: Starting topic search process")
-      print(f"📊 EMBEDDING INFO: Vector length = {len(state.embedding)}")
-
-      # Debug what's stored first
-      # await self.pinecone_manager.debug_what_is_stored()
-
-      # Try retrieval with very low threshold
-
-      if state.embedding:
-        print(f"✅ FIRST CHECK: State embedding exists - {len(state.embedding)} dimensions")
-
-      print("🎯 RETRIEVING: Querying Pinecone for similar topics...")
-      new_topics = await self.pinecone_manager.retrieve_topics(
-          embedding=state.embedding,
-          base_threshold=0.3,  # Must be semantically relevant
-          final_threshold=0.5,  # Must pass final quality check
-          max_results=3)  # Maximum 3 topics
-      matched_topics = new_topics
-      print(f"📦 RETRIEVED: Found {len(matched_topics)} matching topics from vector DB")
+    if matched_topics is None:
+      matched_topics = await self.find_topics(state.embedding)
 
     state.current_topics = matched_topics
     print(f"🎪 FINAL RESULT: {len(matched_topics)} topics matched for current conversation")
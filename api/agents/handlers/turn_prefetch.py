@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from api.agents.models.conversation_models import ConversationState, LogState, TopicState
+
+logger = logging.getLogger(__name__)
+
+
+class TurnPrefetch:
+  """
+    Retrieval work of one conversation turn, shared by the graph nodes
+    through the run config.
+
+    The query embedding is computed once per turn. Topic and log retrieval
+    both start as soon as it is available and run concurrently, also
+    while the change_of_topics classifier is still waiting for the model.
+    Results that turn out not to be needed are discarded; retrieval has no
+    side effects, session topics are only written by check_topics.
+    """
+
+  def __init__(self):
+    self.text: Optional[str] = None
+    self._embedding_task: Optional[asyncio.Task] = None
+    self._topics_task: Optional[asyncio.Task] = None
+    self._logs_task: Optional[asyncio.Task] = None
+
+  def start(self,
+            state: ConversationState,
+            topic_manager=None,
+            log_manager=None) -> None:
+    """Start the embedding and the requested retrievals for the current query"""
+    text = state.embedding_text()
+    if text != self.text:
+      self.cancel()
+      self.text = text
+      self._embedding_task = asyncio.create_task(state.get_embedding(text))
+
+    if topic_manager is not None and self._topics_task is None:
+      self._topics_task = asyncio.create_task(
+          self._after_embedding(topic_manager.find_topics))
+    if log_manager is not None and self._logs_task is None:
+      self._logs_task = asyncio.create_task(
+          self._after_embedding(log_manager.find_logs))
+
+  async def _after_embedding(self, retrieve):
+    return await retrieve(await self.embedding())
+
+  async def embedding(self) -> List[float]:
+    # Shielded: cancelling one consumer must not cancel the shared embedding
+    return await asyncio.shield(self._embedding_task)
+
+  async def topics(self) -> List[TopicState]:
+    return await self._topics_task
+
+  async def logs(self) -> List[LogState]:
+    return await self._logs_task
+
+  def discard_topics(self) -> None:
+    self._cancel_task(self._topics_task)
+    self._topics_task = None
+
+  @staticmethod
+  def _cancel_task(task: Optional[asyncio.Task]) -> None:
+    if task is None:
+      return
+    if not task.done():
+      task.cancel()
+    elif not task.cancelled() and task.exception() is not None:
+      # Retrieve the exception so asyncio does not report it as unhandled
+      logger.warning(f"Turn prefetch failed: {task.exception()}")
+
+  def cancel(self) -> None:
+    """Drop all pending work, e.g. at the end of the turn"""
+    for task in (self._topics_task, self._logs_task, self._embedding_task):
+      self._cancel_task(task)
+    self.text = None
+    self._embedding_task = None
+    self._topics_task = None
+    self._logs_task = None
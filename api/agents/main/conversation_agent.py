@@ -6,7 +6,8 @@ from app.models import User, Chat_Session, Message
 from channels.db import database_sync_to_async
 from .moment_manager import MomentManager
 from api.agents.models.conversation_models import ConversationState
-from langchain.chat_models import init_chat_model
+from api.agents.handlers.chat_model import get_chat_model
+from api.dashboard import invalidate_dashboard
 
 
 class ConversationAgent:
@@ -27,11 +28,8 @@ class ConversationAgent:
   async def create(cls, user: User, chat_session: Chat_Session, ws_consumer):
     """Factory method to create and initialize a ConversationAgent instance."""
     instance = cls(user, chat_session, ws_consumer)
-    instance.ai_model = init_chat_model(model="xai:grok-3-mini-fast",
-                                        configurable_fields="any",
-                                        config_prefix="foo",
-                                        temperature=0.7,
-                                        reasoning_effort="high")
+    # Shared by every session of the process, see chat_model.get_chat_model
+    instance.ai_model = get_chat_model()
 
     instance.moment_manager = MomentManager(
         user,
@@ -45,10 +43,14 @@ class ConversationAgent:
     """Check if session has ended due to time"""
     return self.moment_manager.is_session_ended()
 
-  async def run_agent(self, query: str,
-                      agent_context: dict) -> ConversationState:
-    """Run the agent with the given query and yield response tokens."""
-    response = await self.moment_manager.run_agent(query, agent_context)
+  async def run_agent(self,
+                      query: str,
+                      agent_context: dict,
+                      on_token=None) -> ConversationState:
+    """Run the agent with the given query, streaming tokens to on_token."""
+    response = await self.moment_manager.run_agent(query,
+                                                   agent_context,
+                                                   on_token=on_token)
 
     # save
     await self.save_message("assistant", response.response)
@@ -88,19 +90,17 @@ class ConversationAgent:
   async def _handle_ending_soon(self, message: str) -> None:
     """Handle the ending soon event by sending tokens to websocket."""
     await self.save_message("assistant", message, show_in=False)
-    for token in message.split():
-      token_with_space = token + " "
-      await self.ws_consumer.send(text_data=json.dumps({
-          'type': 'message',
-          'text': token_with_space
-      }))
-      await asyncio.sleep(0.01)  # Small delay
+    batcher = self.ws_consumer.frame_batcher(message_type='message')
+    await batcher.add("".join(token + " " for token in message.split()))
+    await batcher.close()
 
   async def update_chat_session(self, state, remaining_time):
     # Use Django's update() for faster database operation
     @database_sync_to_async
     def update_time_left():
       Chat_Session.objects.filter(id=self.chat_session.id).update(time_left=remaining_time)
+      # update() sends no post_save, so drop the dashboard snapshot here
+      invalidate_dashboard(self.chat_session.user_id)
 
     # Update local instance and database
     self.chat_session.time_left = remaining_time
@@ -4,12 +4,31 @@ from api.agents.handlers.conversation_helper import ConversationHelper
 from api.agents.models.conversation_models import ConversationState, TopicState, MessageState
 from app.models import Chat_Session, Message, Profile, Topic
 from channels.db import database_sync_to_async
-from api.agents.graph.graph_conversation import ConversationGraphManager
+from django.conf import settings
+from api.agents.graph.graph_conversation import GraphDependencies, get_conversation_graph, graph_config
 from api.agents.handlers.time_manager import TimeManager
 from api.agents.handlers.topic_manager import TopicManager
 from api.agents.handlers.log_manager import LogManager
 from api.agents.handlers.session_manager import SessionManager
 from api.agents.handlers.pinecone_manager import PineconeManager
+from api.agents.handlers.turn_prefetch import TurnPrefetch
+from api.agents.handlers.session_end_queue import (enqueue_session_end,
+                                                   session_end_worker_alive)
+from api.agents.handlers.opening_manager import opening_context, opening_context_hash, previous_summary_for
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class SessionBootstrap:
+  """Database state a session needs before its first message"""
+  messages: List[MessageState]
+  has_message: bool
+  character: str
+  topics: List[TopicState]
+  previous_summary: str
+  # Context hash of the opening message, only set for sessions without messages
+  opening_hash: Optional[str] = None
 
 
 class MomentManager:
@@ -29,6 +48,8 @@ class MomentManager:
 
     self.pending_time_events = []  # ADD THIS LINE
     self.session_ended = False  # ADD THIS LINE
+    # Set when the summary is left to the session end worker
+    self.session_end_queued = False
     self.ws_consumer = ws_consumer  # ADD THIS LINE
 
     self.stream_message = stream_message
@@ -48,7 +69,13 @@ class MomentManager:
 
     self.session_manager.update_state(self.state)
 
-    self.graph: ConversationGraphManager = self._setup_graph()
+    # The compiled graph is shared by all sessions of the process
+    self.graph = get_conversation_graph()
+    self.graph_dependencies = GraphDependencies(
+        ai_model=self.ai_model,
+        topic_manager=self.topic_manager,
+        log_manager=self.log_manager,
+        conversation_helper=self.converstation_helper)
 
   def _initialize_state(self) -> ConversationState:
 
@@ -66,13 +93,6 @@ class MomentManager:
   def get_current_state(self) -> ConversationState:
     return self.state
 
-  def _setup_graph(self):
-    return ConversationGraphManager(
-        ai_model=self.ai_model,
-        topic_manager=self.topic_manager,
-        log_manager=self.log_manager,
-        conversation_helper=self.converstation_helper).graph
-
   async def test_ai_model(self):
     """
     Test AI model during initialization to verify it's working correctly.
@@ -102,7 +122,7 @@ class MomentManager:
 
       # Invoke the model and capture any errors
       try:
-        response = self.ai_model.invoke(test_prompt, config=test_config)
+        response = await self.ai_model.ainvoke(test_prompt, config=test_config)
         print(f"Response type: {type(response)}")
 
         # Handle different response formats
@@ -133,54 +153,78 @@ class MomentManager:
       traceback.print_exc()
       return False
 
-  async def load_messages(self):
-    """Load messages from the database and populate state.messages list"""
-
-    @database_sync_to_async
-    def get_first_message():
-      return Message.objects.filter(
-          chat_session=self.chat_session).order_by('date_created').first()
-
-    @database_sync_to_async
-    def get_messages():
-      return list(
-          Message.objects.filter(chat_session=self.chat_session,
-                                 show_in=True).order_by('date_created'))
-
-    db_messages = await get_messages()
-
-    one_message = await get_first_message()
-
-    self.has_message = one_message is not None
-
-    # Remove the first message if any (system message
-
-    # Clear existing messages
-    self.state.messages = []
-
-    # Convert database messages to state message format
-    for msg in db_messages:
-      role = 'Human' if msg.role == 'user' else 'Assistant'
-
-      message = MessageState(role=role,
-                             content=msg.content,
-                             show_in=msg.show_in)
-
-      self.state.messages.append(message)
-
-  async def load_character(self):
-
-    if self.chat_session.character:
-      self.state.character = self.chat_session.character
-    else:
-
-      def get_profile():
-        return Profile.objects.filter(user=self.user).first()
+  def _topic_ids(self) -> List[int]:
+    topic_ids_str = self.chat_session.topic_ids
+    if not topic_ids_str or not topic_ids_str.strip():
+      return []
 
-      profile = await database_sync_to_async(get_profile)()
+    try:
+      return [
+          int(id_str) for id_str in topic_ids_str.split(',') if id_str.strip()
+      ]
+    except (ValueError, AttributeError) as e:
+      # Handle conversion errors
+      print(f"Error loading topics: {e}")
+      return []
+
+  def _load_bootstrap(self) -> SessionBootstrap:
+    """Run every start-of-session query in a single database thread hop"""
+    # All messages in one ordered query; hidden ones only count for has_message
+    db_messages = list(
+        Message.objects.filter(chat_session=self.chat_session).only(
+            'role', 'content', 'show_in',
+            'date_created').order_by('date_created'))
+    messages = [
+        MessageState(role='Human' if msg.role == 'user' else 'Assistant',
+                     content=msg.content,
+                     show_in=msg.show_in) for msg in db_messages
+        if msg.show_in
+    ]
+
+    character = self.chat_session.character
+    if not character:
+      profile = Profile.objects.filter(user=self.user).only('character').first()
+      character = profile.character if profile else ""
+
+    topics = []
+    topic_ids = self._topic_ids()
+    if topic_ids:
+      topics = [
+          TopicState(topic_id=topic.id,
+                     topic_name=topic.name,
+                     text=topic.description,
+                     confidence=0.85)
+          for topic in Topic.objects.filter(id__in=topic_ids).only(
+              'id', 'name', 'description')
+      ]
 
-      # fix
-      self.state.character = profile.character
+    previous_summary = previous_summary_for(self.user)
+
+    opening_hash = None
+    if not db_messages:
+      opening_hash = opening_context_hash(
+          opening_context(self.chat_session,
+                          self.user.username,
+                          previous_summary=previous_summary))
+
+    return SessionBootstrap(messages=messages,
+                            has_message=bool(db_messages),
+                            character=character or "",
+                            topics=topics,
+                            previous_summary=previous_summary,
+                            opening_hash=opening_hash)
+
+  async def load_bootstrap(self) -> SessionBootstrap:
+    """Load messages, character, topics and the previous summary into state"""
+    bootstrap = await database_sync_to_async(self._load_bootstrap)()
+
+    self.has_message = bootstrap.has_message
+    self.state.set_messages(bootstrap.messages)
+    self.state.character = bootstrap.character
+    self.state.current_topics.extend(bootstrap.topics)
+    if bootstrap.previous_summary:
+      self.state.previous_summary = bootstrap.previous_summary
+    return bootstrap
 
   async def _on_time_update(self, elapsed_minutes: int):
     """Handle time updates with proper session state management"""
@@ -235,8 +279,14 @@ class MomentManager:
     """Check if session ended due to time"""
     return self.session_ended
 
-  async def run_agent(self, query: str,
-                      agent_context: dict) -> ConversationState:
+  async def run_agent(self,
+                      query: str,
+                      agent_context: dict,
+                      on_token=None) -> ConversationState:
+    """
+    Run the graph for one message. If on_token is given, the chat response
+    is streamed to it chunk by chunk while it is generated.
+    """
 
     self.state.add_context(agent_context)
 
@@ -245,7 +295,15 @@ class MomentManager:
     # Add logging before graph invocation
 
     # Run through the graph and get the updated state
-    result = await self.graph.ainvoke(self.state)
+    prefetch = TurnPrefetch()
+    try:
+      result = await self.graph.ainvoke(self.state,
+                                        config=graph_config(
+                                            self.graph_dependencies,
+                                            token_sink=on_token,
+                                            prefetch=prefetch))
+    finally:
+      prefetch.cancel()
     print(f"Graph execution completed, result type: {type(result)}")
 
     # Ensure we have a proper ConversationState object
@@ -292,64 +350,16 @@ class MomentManager:
 
 # initialize state and first message
 
-  async def load_current_topics(self):
-    topic_ids_str = self.chat_session.topic_ids
-    if not topic_ids_str or not topic_ids_str.strip():
-      # Handle empty case
-      return
-
-    try:
-      topic_ids = [
-          int(id_str) for id_str in topic_ids_str.split(',') if id_str.strip()
-      ]
-
-      if topic_ids:
-        # Define a separate function for clarity
-        @database_sync_to_async
-        def get_topics():
-          return list(Topic.objects.filter(id__in=topic_ids).values())
-
-        # Call the wrapped function
-        topics = await get_topics()
-
-        for topic in topics:
-          topic_state = TopicState(topic_id=topic['id'],
-                                   topic_name=topic['name'],
-                                   text=topic['description'],
-                                   confidence=0.85)
-          self.state.current_topics.append(topic_state)
-
-        print("current_topics", self.state.current_topics)
-    except (ValueError, AttributeError) as e:
-      # Handle conversion errors
-      print(f"Error loading topics: {e}")
-
-  async def load_previous_session(
-      self):  # Replace with your actual function name
-    # Define a separate named function for clarity
-    @database_sync_to_async
-    def get_last_chat_session():
-      return Chat_Session.objects.filter(user=self.user,
-                                         time_left=0).order_by('-id').first()
-
-    # Call the wrapped function
-    last_chat_session = await get_last_chat_session()
-
-    if last_chat_session:
-      self.state.previous_summary = last_chat_session.summary
-
   async def start_session(self) -> str:
     await self.time_manager.start_monitoring()
-    await self.load_messages()
-    await self.load_character()
-    await self.load_current_topics()
-    await self.load_previous_session()
+    bootstrap = await self.load_bootstrap()
 
     print("messages_loaded", self.state.messages)
 
     if not self.has_message:
       self.session_manager.update_state(self.state)
-      return await self.session_manager.handle_start()
+      return await self.session_manager.handle_start(
+          opening_hash=bootstrap.opening_hash)
     return ""
 
   async def get_remaining_time(self) -> int:
@@ -367,14 +377,33 @@ class MomentManager:
 
     self.session_manager.update_state(self.state)
 
-    # Run handle_state_end without timeout
-    try:
-      print("DEBUG: About to call handle_state_end")
-      await self.session_manager.handle_state_end()
-      print("DEBUG: handle_state_end completed successfully")
-    except Exception as e:
-      print(
-          f"ERROR: handle_state_end failed: {e} - continuing with end message")
+    if getattr(settings, 'SESSION_END_QUEUE', True):
+      try:
+        # Queue only while a worker is running, otherwise process inline
+        self.session_end_queued = await database_sync_to_async(
+            session_end_worker_alive)()
+      except Exception as e:
+        print(f"ERROR: Could not check the session end worker: {e}")
+
+    if self.session_end_queued:
+      # Topics, logs and summary are processed by the session end worker
+      try:
+        task = await database_sync_to_async(enqueue_session_end)(
+            self.chat_session.id)
+        print(f"DEBUG: Session end queued, status {task.status}")
+      except Exception as e:
+        print(f"ERROR: Could not queue session end: {e} - processing inline")
+        self.session_end_queued = False
+
+    if not self.session_end_queued:
+      # Run handle_state_end without timeout
+      try:
+        print("DEBUG: About to call handle_state_end")
+        await self.session_manager.handle_state_end()
+        print("DEBUG: handle_state_end completed successfully")
+      except Exception as e:
+        print(
+            f"ERROR: handle_state_end failed: {e} - continuing with end message")
 
     print("DEBUG: About to call handle_end")
     response = await self.session_manager.handle_end()
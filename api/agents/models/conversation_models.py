@@ -2,8 +2,11 @@
 from datetime import datetime
 from enum import Enum
 from django.core.validators import int_list_validator
+from collections import deque
+from functools import partial
+from itertools import chain
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Deque, Optional, List, Dict
 from django.conf import settings
 from typing import Union
 from pydantic import Field
@@ -13,6 +16,9 @@ from app.models import SessionTopic
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
+# Largest history window (in characters) a prompt can ask for
+HISTORY_WINDOW_CHARS = 10000
+
 
 class TopicJSON(BaseModel):
   name: str = Field(description="Topic name")
@@ -96,6 +102,14 @@ class ConversationState(BaseModel):
 
   messages: List[MessageState] = []
 
+  # Rolling prompt window kept in sync with messages (see _sync_window):
+  # formatted history lines, their total size, the trailing run of human
+  # messages that is not history yet and how many messages were folded in
+  history_window: Deque[str] = Field(default_factory=deque)
+  history_window_chars: int = 0
+  query_tail: List[MessageState] = []
+  window_message_count: int = 0
+
   topic_confirmation: int = 2
   topic_names: str = ""
   prompt_topics: str = ""
@@ -191,6 +205,7 @@ class ConversationState(BaseModel):
                                  show_in=self.saved_query == "")
 
     self.messages.append(message_state)
+    self._sync_window()
 
     # self.update_char_since_check(len(message))
 
@@ -200,6 +215,55 @@ class ConversationState(BaseModel):
                                  show_in=self.saved_query == "")
 
     self.messages.append(message_state)
+    self._sync_window()
+
+  def set_messages(self, messages: List[MessageState]):
+    """Replace the message list, e.g. when loading it from the database"""
+    self.messages = list(messages)
+    self._reset_window()
+    self._sync_window()
+
+  @staticmethod
+  def _format_message(message: MessageState) -> str:
+    return f"{message.role}: {message.content}"
+
+  def _reset_window(self):
+    self.history_window = deque()
+    self.history_window_chars = 0
+    self.query_tail = []
+    self.window_message_count = 0
+
+  def _push_history(self, message: MessageState):
+    if not message.show_in:
+      return
+
+    line = self._format_message(message)
+    self.history_window.append(line)
+    self.history_window_chars += len(line) + 1  # +1 for newline
+
+    # Lines that no longer fit in the largest window are never used again
+    while self.history_window_chars > HISTORY_WINDOW_CHARS and self.history_window:
+      self.history_window_chars -= len(self.history_window.popleft()) + 1
+
+  def _fold_message(self, message: MessageState):
+    if message.role == "Human":
+      self.query_tail.append(message)
+      return
+
+    # A response turns the pending human messages into history
+    for human_message in self.query_tail:
+      self._push_history(human_message)
+    self.query_tail = []
+    self._push_history(message)
+
+  def _sync_window(self):
+    """Fold messages appended since the last call into the window"""
+    if self.window_message_count > len(self.messages):
+      self._reset_window()
+
+    for message in self.messages[self.window_message_count:]:
+      self._fold_message(message)
+    self.window_message_count = len(self.messages)
 
   async def update_embedding(self) -> None:
     try:
@@ -208,7 +272,12 @@ class ConversationState(BaseModel):
       logging.error(f"Error updating embedding: {e}")
       raise
 
-  async def get_embedding(self) -> List[float]:
+  def embedding_text(self) -> str:
+    """Text the retrieval embedding of the current turn is computed from"""
+    return self.saved_query or self.prompt_query
+
+  async def get_embedding(self,
+                          embedding_text: Optional[str] = None) -> List[float]:
 
     # Use the globally configured embedding model from Settings
     from llama_index.core import Settings
@@ -219,11 +288,8 @@ class ConversationState(BaseModel):
 
     # The embedding model's interface might be different from what you expected
     # Most embedding models have either embed_query or get_text_embedding method
-    embedding_text = ""
-    if self.saved_query:
-      embedding_text = self.saved_query
-    else:
-      embedding_text = self.prompt_query
+    if embedding_text is None:
+      embedding_text = self.embedding_text()
 
     print("embedding_text:", embedding_text)
     print(f"🔧 DEBUG: embedding_text length: {len(embedding_text)}")
@@ -232,86 +298,68 @@ class ConversationState(BaseModel):
     embedding = []
     if embedding_text:
       print("🔧 DEBUG: About to call embedding model...")
-      if hasattr(embedding_model, 'embed_query'):
-        embedding = embedding_model.embed_query(embedding_text)
-        print(f"🔧 DEBUG: embed_query returned: {len(embedding) if embedding else 'None'} dimensions")
+      # Prefer the async methods so the request does not block the event loop
+      if hasattr(embedding_model, 'aget_text_embedding'):
+        compute = partial(embedding_model.aget_text_embedding, embedding_text)
+      elif hasattr(embedding_model, 'aembed_query'):
+        compute = partial(embedding_model.aembed_query, embedding_text)
+      elif hasattr(embedding_model, 'embed_query'):
+        compute = lambda: embedding_model.embed_query(embedding_text)
       elif hasattr(embedding_model, 'get_text_embedding'):
-        embedding = embedding_model.get_text_embedding(embedding_text)
-        print(f"🔧 DEBUG: get_text_embedding returned: {len(embedding) if embedding else 'None'} dimensions")
+        compute = lambda: embedding_model.get_text_embedding(embedding_text)
       else:
         raise ValueError("Embedding model has no recognized embedding method")
+
+      # Repeated queries (e.g. saved_query during topic exploration) are
+      # served from the shared embedding cache
+      from api.agents.handlers.embedding_cache import embedding_cache, model_name_of
+      embedding = await embedding_cache.aget_or_compute(
+          model_name_of(embedding_model), embedding_text, compute)
+      print(f"🔧 DEBUG: embedding returned: {len(embedding) if embedding else 'None'} dimensions")
     else:
       print("🔧 DEBUG: embedding_text is empty, returning empty embedding")
 
     print(f"🔧 DEBUG: Final embedding length: {len(embedding) if embedding else 'None'}")
     return embedding
 
-  def split_messages(self, window_size=10000):
+  def split_messages(self, window_size=HISTORY_WINDOW_CHARS):
     """
-    Simple implementation to extract prompt_query and prompt_conversation_history.
-    - Uses saved_query if available, otherwise collects all consecutive human messages from bottom
+    Extract prompt_query and prompt_conversation_history from the rolling window.
+    - Uses saved_query if available, otherwise joins the consecutive human messages at the bottom
     - Skips the human messages used in prompt_query when collecting history
-    - Starts history collection from closest assistant message
+    - History holds the newest messages that fit in window_size characters
+      (at most HISTORY_WINDOW_CHARS)
     """
-    # If saved_query exists, use it
+    self._sync_window()
+    tail = self.query_tail
 
-    print(self.messages)
-    if self.saved_query and self.saved_query != "":
+    if self.saved_query:
       self.prompt_query = self.saved_query
       # When using saved_query, exclude ALL recent human messages from history
       # because they're part of the topic exploration context
-      last_human_indices = []
-
-      # Start from the end and collect consecutive human messages
-      for i in range(len(self.messages) - 1, -1, -1):
-        if self.messages[i].role == "Human":
-          last_human_indices.append(i)
-        else:
-          # Stop when we hit a non-human message
-          break
+      pending_history = []
     else:
-      # Otherwise find all consecutive human messages from the bottom
-      human_messages = []
-      last_human_indices = []
-
-      # Start from the end and collect consecutive human messages
-      for i in range(len(self.messages) - 1, -1, -1):
-        if self.messages[i].role == "Human" and self.messages[i].show_in:
-          human_messages.insert(0, self.messages[i].content)
-          last_human_indices.append(i)
-        else:
-          # Stop when we hit a non-human message
-          break
-
-      # Join all collected human messages with a space
-      self.prompt_query = " ".join(human_messages)
-
-    # Collect messages that fit in the window, skipping the human messages used in prompt_query
+      # The query is the run of visible human messages at the very bottom
+      split = len(tail)
+      while split > 0 and tail[split - 1].show_in:
+        split -= 1
+      self.prompt_query = " ".join(message.content for message in tail[split:])
+      pending_history = [
+          self._format_message(message) for message in tail[:split]
+          if message.show_in
+      ]
+
+    # Take the newest lines that fit in the window
     conversation_history = []
     current_size = 0
-
-    # Start from the end and work backwards, skipping the indices in last_human_indices
-    for i in range(len(self.messages) - 1, -1, -1):
-      # Skip if this is one of the human messages we used in prompt_query
-      if i in last_human_indices:
-        continue
-
-      if self.messages[i].show_in:
-
-        msg = self.messages[i]
-        message_text = f"{msg.role}: {msg.content}"
-        message_size = len(message_text) + 1  # +1 for newline
-
-        if current_size + message_size <= window_size:
-          # Insert at beginning to maintain chronological order
-          conversation_history.insert(0, message_text)
-          current_size += message_size
-        else:
-          # Stop when we hit the window size limit
-          break
-
-    print("conversation_history", conversation_history)
-    print("prompt_query", self.prompt_query)
+    for message_text in chain(reversed(pending_history),
+                              reversed(self.history_window)):
+      message_size = len(message_text) + 1  # +1 for newline
+      if current_size + message_size > window_size:
+        break
+      conversation_history.append(message_text)
+      current_size += message_size
+    conversation_history.reverse()
 
     self.prompt_conversation_history = f"<history>{' '.join(conversation_history)}</history>" if conversation_history else ""
 
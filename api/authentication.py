@@ -1,10 +1,21 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from django.core.exceptions import ObjectDoesNotExist
+
+from api.security.principal_cache import principal_cache
 
 
 class CustomJWTAuthentication(JWTAuthentication):
+  """
+  JWT authentication sharing the principal resolved by
+  api.middleware.SecurityMiddleware, so a token is validated once per
+  request. Requests the middleware did not authenticate go through the
+  principal cache.
+  """
 
   def authenticate(self, request):
-    try:
+    principal = getattr(request._request, 'auth_principal', None)
+    if principal is None:
       header = self.get_header(request)
       if header is None:
         return None
@@ -13,15 +24,17 @@ class CustomJWTAuthentication(JWTAuthentication):
       if raw_token is None:
         return None
 
-      validated_token = self.get_validated_token(raw_token)
-      user = self.get_user(validated_token)
-
-      # Add additional security checks
-      if not user.is_active:
+      try:
+        principal = principal_cache.authenticate(raw_token.decode())
+      except (TokenError, ObjectDoesNotExist):
+        # Like before the cache: an unusable token leaves the request
+        # unauthenticated instead of failing it
         return None
 
-      # You could add rate limiting here
-
-      return (user, validated_token)
-    except Exception:
+    # Add additional security checks
+    if not principal.user.is_active:
       return None
+
+    # You could add rate limiting here
+
+    return (principal.user, principal.token)
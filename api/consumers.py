@@ -3,6 +3,8 @@ from api.agents.main.conversation_agent import ConversationAgent
 import json
 from app.models import User, Topic, Message, Chat_Session
 from channels.db import database_sync_to_async
+from api.utilities.frame_batcher import FrameBatcher
+from api.utilities.loop_monitor import install_loop_block_detector
 import asyncio
 
 
@@ -14,6 +16,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     self.is_connected = False
 
+    # Debug aid: report anything that blocks the shared event loop
+    install_loop_block_detector()
+
     # Get chat_session from URL params
     self.chat_session_id = self.scope['url_route']['kwargs'].get(
         'chat_session')
@@ -239,19 +244,44 @@ class ChatConsumer(AsyncWebsocketConsumer):
           # Get response from agent
           if self.agent is not None and not self.agent.moment_manager.is_session_ended(
           ):
-            response = await self.agent.run_agent(query, agent_context)
+            # Chat responses are forwarded while the model generates them.
+            # The graph only streams plain message turns (start ->
+            # process_message), so streamed frames are always "message"
+            streamed = []
+            current_topics = self.agent.moment_manager.get_current_state(
+            ).topic_names
+
+            batcher = self.frame_batcher(message_type="message",
+                                         topics=current_topics)
+
+            async def on_token(token):
+              streamed.append(token)
+              await batcher.add(token)
+
+            try:
+              response = await self.agent.run_agent(query,
+                                                    agent_context,
+                                                    on_token=on_token)
+            finally:
+              await batcher.close()
+
+            # Send whatever was not streamed yet and complete the stream
+            streamed_text = "".join(streamed)
+            remainder = response.response
+            if streamed_text and remainder.startswith(streamed_text):
+              remainder = remainder[len(streamed_text):]
 
             # Handle response
             if hasattr(response, 'response_type'):
               if response.response_type == "message":
                 topics = response.topic_names if isinstance(
                     response.topic_names, str) else ""
-                await self.stream_tokens(message=response.response,
+                await self.stream_tokens(message=remainder,
                                          topics=topics,
                                          message_type="message")
               elif response.response_type == "topic":
                 topics = response.topic_names if hasattr(response, 'topic_names') and response.topic_names else "No current topics"
-                await self.stream_tokens(message=response.response,
+                await self.stream_tokens(message=remainder,
                                          topics=topics,
                                          message_type="topic")
 
@@ -348,6 +378,16 @@ class ChatConsumer(AsyncWebsocketConsumer):
               skip_new_message=True
           )  # Skip new_message since we already sent processing_end
 
+        # A queued session is summarized after the socket closes, the client
+        # polls endStatus for its title and summary
+        moment_manager = getattr(self.agent, 'moment_manager', None)
+        if complete and self.is_connected and getattr(
+            moment_manager, 'session_end_queued', False):
+          await self.send(text_data=json.dumps({
+              'type': 'summary_pending',
+              'chatSessionId': moment_manager.chat_session.id
+          }))
+
         # Now save session state AFTER sending the final message (only for automatic timeout)
         if complete:
           print(f"DEBUG: Now saving session state after final message sent")
@@ -376,6 +416,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
     finally:
       self._closing = False
 
+  async def send_frame(self, text_data: str):
+    """Send an already encoded frame if the connection is still open"""
+    if self.is_connected:
+      await self.send(text_data=text_data)
+
+  def frame_batcher(self, message_type: str = "message", topics=None):
+    """Batcher that coalesces streamed text into frames on this socket"""
+    return FrameBatcher(self.send_frame,
+                        message_type=message_type,
+                        topics=topics)
+
   async def stream_tokens(self,
                           message: str,
                           topics: str = "",
@@ -398,19 +449,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'type': 'new_message',
             'text': ''
         }))
-        await asyncio.sleep(0.01)
 
-      # Stream message character by character
-      for char in message:
-        if not self.is_connected:  # ADD THIS CHECK
-          break
-
-        await self.send(text_data=json.dumps({
-            'topics': topics,
-            'type': message_type,
-            'text': char
-        }))
-        await asyncio.sleep(0.005)
+      # Send the message in coalesced frames
+      batcher = self.frame_batcher(message_type=message_type, topics=topics)
+      await batcher.add(message)
+      await batcher.close()
 
       # Send completion signal
       if self.is_connected:  # ADD THIS CHECK
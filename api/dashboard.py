@@ -0,0 +1,93 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from app.models import Chat_Session, Profile
+from .serializers.chat_session_serializer import Chat_SessionSerializer
+
+# Fields of the upcoming session shown on the dashboard
+SESSION_FIELDS = Chat_SessionSerializer.Meta.fields
+
+
+def _cache_key(user_id) -> str:
+  return f"dashboard:{user_id}"
+
+
+def invalidate_dashboard(user_id):
+  cache.delete(_cache_key(user_id))
+
+
+def _build_snapshot(user_id, today):
+  """Profile, upcoming session and session flags in one query"""
+  sessions = Chat_Session.objects.filter(user_id=OuterRef('user_id'))
+  upcoming = sessions.filter(time_left__gt=0).order_by('date')
+
+  annotations = {
+      f'next_{name}':
+      Subquery(upcoming.values(name)[:1],
+               output_field=Chat_Session._meta.get_field(name))
+      for name in SESSION_FIELDS
+  }
+  row = Profile.objects.filter(user_id=user_id).annotate(
+      is_already_session=Exists(sessions.filter(time_left=0, date=today)),
+      has_expired_session=Exists(sessions.filter(time_left=0)),
+      **annotations).values('tokens', 'subscription_date',
+                            'is_already_session', 'has_expired_session',
+                            *annotations).first()
+  if row is None:
+    return None
+
+  subscription_date = row['subscription_date']
+  subscription_day = subscription_date.day if subscription_date and subscription_date > today else None
+  next_month_number = (today.month % 12) + 1
+  next_date = f"{subscription_day}.{next_month_number}." if subscription_day else "Subscribe"
+
+  chat_session = {}
+  if row['next_id'] is not None:
+    chat_session = dict(
+        Chat_SessionSerializer(
+            Chat_Session(**{name: row[f'next_{name}']
+                            for name in SESSION_FIELDS})).data)
+
+  return {
+      'next_date': next_date,
+      'tokens': row['tokens'],
+      'chat_session': chat_session,
+      'is_already_session': row['is_already_session'],
+      'has_expired_session': row['has_expired_session']
+  }
+
+
+def dashboard_snapshot(user_id):
+  """
+    Dashboard data of the user and its ETag, served from the cache.
+
+    The snapshot is rebuilt when the day changes, after DASHBOARD_CACHE_TTL
+    seconds, or after any save or delete of the user's chat sessions or
+    profile (see api.signals). That invalidation only reaches the cache of
+    the saving process, so changes made by other instances or the session
+    end worker are served once the TTL has passed.
+    Returns (None, None) if the user has no profile.
+    """
+  today = timezone.now().date()
+  key = _cache_key(user_id)
+
+  snapshot = cache.get(key)
+  if snapshot is None or snapshot['date'] != today:
+    data = _build_snapshot(user_id, today)
+    if data is None:
+      return None, None
+
+    payload = json.dumps(data, sort_keys=True, default=str)
+    snapshot = {
+        'date': today,
+        'data': data,
+        'etag': '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+    }
+    cache.set(key, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 10))
+
+  return snapshot['data'], snapshot['etag']
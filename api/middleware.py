@@ -1,8 +1,11 @@
 from django.http import HttpResponseForbidden, JsonResponse
-from rest_framework_simplejwt.tokens import AccessToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 from django.utils.deprecation import MiddlewareMixin
-from app.models import Profile
-import json
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from api.security.principal_cache import principal_cache
+from api.security.exemptions import build_exempt_matcher
+from api.parsers import request_json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +13,18 @@ logger = logging.getLogger(__name__)
 
 class SecurityMiddleware(MiddlewareMixin):
 
+    # Paths below these prefixes skip authentication; views of the app are
+    # exempted with api.security.exemptions.auth_exempt instead
+    DEFAULT_EXEMPT_PREFIXES = (
+        '/api/token/refresh/',
+        '/api/token/verify/',
+        '/admin/',
+        '/media/',
+        '/static/',
+    )
+
+    _exempt_matcher = None
+
     def _get_request_data(self, request):
         """Safely get data from request regardless of method"""
         if request.method == 'GET':
@@ -17,35 +32,27 @@ class SecurityMiddleware(MiddlewareMixin):
         if request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
             try:
                 if request.content_type == 'application/json':
-                    return json.loads(request.body.decode('utf-8'))
+                    # Memoized, DRF's CachedJSONParser reuses it
+                    return request_json(request)
                 else:
                     return request.POST
-            except (json.JSONDecodeError, UnicodeDecodeError):
+            except ValueError:
                 return {}
         return {}
 
+    def _is_exempt(self, path):
+        # Compiled once, on the first request, when the URLconf is loaded
+        if self._exempt_matcher is None:
+            prefixes = getattr(settings, 'AUTH_EXEMPT_PREFIXES',
+                               self.DEFAULT_EXEMPT_PREFIXES)
+            SecurityMiddleware._exempt_matcher = build_exempt_matcher(prefixes)
+        return bool(self._exempt_matcher
+                    and self._exempt_matcher.match(path))
+
     def process_request(self, request):
-        # Skip security for token refresh and login endpoints
-        EXEMPT_PATHS = [
-            '/api/token/refresh/',
-            '/api/token/verify/',
-            '/api/send_activation_code',
-            '/api/activate_profile',
-            '/api/reset_password',
-            '/api/google-play-webhook/',
-            '/api/login',
-            '/api/model_test/',
-            '/api/test_mail',
-            '/api/cron_reminder',
-            '/api/register',
-            '/admin/',
-            '/media/',
-            '/static/',
-        ]
-
-        # More efficient path checking
+        # Skip security for token refresh, login and other exempt endpoints
         path = request.path
-        if any(path.startswith(exempt_path) for exempt_path in EXEMPT_PATHS):
+        if self._is_exempt(path):
             logger.debug(f"Skipping auth for exempt path: {path}")
             return None
 
@@ -77,46 +84,39 @@ class SecurityMiddleware(MiddlewareMixin):
             token = auth_header.split(' ')[1]
 
             try:
-                # Validate the access token
-                token_obj = AccessToken(token)
-                user_id = token_obj['user_id']
+                # Validate the access token; repeated requests with the same
+                # token are served from the principal cache without queries
+                principal = principal_cache.authenticate(token)
+                user_id = principal.user_id
 
                 # Check if token is about to expire (within 5 minutes)
                 from datetime import datetime, timedelta
-                exp_timestamp = token_obj['exp']
+                exp_timestamp = principal.token['exp']
                 exp_datetime = datetime.fromtimestamp(exp_timestamp)
                 time_until_expiry = exp_datetime - datetime.now()
 
                 if time_until_expiry < timedelta(minutes=5):
                     logger.info(f"Token expiring soon for user {user_id}")
 
-                # Get user and attach to request
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-
-                try:
-                    user = User.objects.select_related('profile').get(id=user_id)
-                    request.user = user
-                    request.user_id = user_id
+                # Attach user and profile to request; the DRF authentication
+                # class reuses the principal instead of validating again
+                request.auth_principal = principal
+                request.user = principal.user
+                request.user_id = user_id
+                request.profile = principal.profile
 
-                    # Attach profile if it exists
-                    if hasattr(user, 'profile'):
-                        request.profile = user.profile
-                    else:
-                        # Create profile if it doesn't exist
-                        profile = Profile.objects.create(user=user)
-                        request.profile = profile
-                        logger.warning(f"Created missing profile for user {user_id}")
+                if principal.profile_created:
+                    logger.warning(f"Created missing profile for user {user_id}")
 
-                    logger.debug(f"Authenticated user {user_id} for path: {path}")
+                logger.debug(f"Authenticated user {user_id} for path: {path}")
 
-                except User.DoesNotExist:
-                    logger.error(f"User {user_id} from token not found in database")
-                    return JsonResponse({
-                        'error': True,
-                        'message': 'User not found',
-                        'code': 'user_not_found'
-                    }, status=404)
+            except ObjectDoesNotExist:
+                logger.error("User from token not found in database")
+                return JsonResponse({
+                    'error': True,
+                    'message': 'User not found',
+                    'code': 'user_not_found'
+                }, status=404)
 
             except TokenError as e:
                 error_str = str(e)
@@ -0,0 +1,36 @@
+import base64
+import json
+from typing import Any, Callable, List, Optional
+
+
+def encode_cursor(*values) -> str:
+  """Opaque keyset cursor holding the sort key of the last row of a page"""
+  payload = json.dumps([str(value) for value in values])
+  return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str],
+                  *parsers: Callable[[str], Any]) -> Optional[List[Any]]:
+  """
+  Values of a cursor made by encode_cursor, each converted by its parser
+  (e.g. date.fromisoformat, int). Raises ValueError if the cursor or any
+  of its values is invalid.
+  """
+  if not cursor:
+    return None
+  try:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list) or len(values) != len(parsers):
+      raise ValueError
+    return [parse(value) for parse, value in zip(parsers, values)]
+  except Exception:
+    raise ValueError('Invalid cursor')
+
+
+def page_size(value, default: int, maximum: int) -> int:
+  try:
+    size = int(value) if value else default
+  except (TypeError, ValueError):
+    size = default
+  return max(1, min(size, maximum))
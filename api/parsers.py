@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+_UNPARSED = object()
+
+
+def request_json(request):
+  """
+    JSON body of a Django request, parsed once and memoized on the request.
+    Raises ValueError for a body that is not valid UTF-8 JSON.
+    """
+  data = getattr(request, '_json_body', _UNPARSED)
+  if data is _UNPARSED:
+    body = request.body
+    data = json.loads(body.decode(settings.DEFAULT_CHARSET)) if body else {}
+    request._json_body = data
+  return data
+
+
+class CachedJSONParser(JSONParser):
+  """JSONParser reusing a body the middleware already decoded"""
+
+  def parse(self, stream, media_type=None, parser_context=None):
+    request = (parser_context or {}).get('request')
+    django_request = getattr(request, '_request', None)
+    if django_request is None:
+      return super().parse(stream, media_type, parser_context)
+
+    try:
+      return request_json(django_request)
+    except ValueError as exc:
+      raise ParseError('JSON parse error - %s' % str(exc))
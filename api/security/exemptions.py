@@ -0,0 +1,123 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
+
+# Named groups would clash once several routes share one alternation
+_NAMED_GROUP = re.compile(r'\(\?P<[^>]+>')
+
+# Trie node markers: a prefix matches any remainder, an exact route none
+_PREFIX = 'prefix'
+_EXACT = 'exact'
+
+
+def auth_exempt(view):
+  """
+    Mark a view (function or APIView class) as reachable without an access
+    token. SecurityMiddleware collects the marked routes from the URLconf.
+    """
+  view.auth_exempt = True
+  return view
+
+
+def is_auth_exempt(callback) -> bool:
+  if getattr(callback, 'auth_exempt', False):
+    return True
+  # APIView.as_view() / View.as_view() keep the class on the function
+  view_class = getattr(callback, 'cls', None) or getattr(
+      callback, 'view_class', None)
+  return bool(getattr(view_class, 'auth_exempt', False))
+
+
+def _literal_route(pattern) -> str:
+  """Route string of a path() without converters, else None"""
+  if isinstance(pattern, RoutePattern) and not pattern.converters:
+    return str(pattern)
+  return None
+
+
+def _pattern_regex(pattern) -> str:
+  regex = pattern.regex.pattern
+  return _NAMED_GROUP.sub('(?:', regex[1:] if regex.startswith('^') else regex)
+
+
+def exempt_routes(patterns=None,
+                  literal_prefix: str = '',
+                  regex_prefix: str = '') -> List[Tuple[bool, str]]:
+  """
+    (is_literal, route) of every URLconf route whose view is auth_exempt.
+    Plain path() routes are returned as literal paths, routes with
+    converters or re_path() as regexes without anchors.
+    """
+  if patterns is None:
+    patterns = get_resolver().url_patterns
+
+  routes = []
+  for pattern in patterns:
+    literal = None
+    if literal_prefix is not None:
+      literal = _literal_route(pattern.pattern)
+      if literal is not None:
+        literal = literal_prefix + literal
+
+    if isinstance(pattern, URLResolver):
+      routes.extend(
+          exempt_routes(pattern.url_patterns, literal,
+                        regex_prefix + _pattern_regex(pattern.pattern)))
+    elif isinstance(pattern, URLPattern) and is_auth_exempt(pattern.callback):
+      if literal is not None:
+        routes.append((True, '/' + literal))
+      else:
+        routes.append((False, '/' + regex_prefix +
+                       _pattern_regex(pattern.pattern)))
+  return routes
+
+
+def _trie_regex(node: Dict) -> str:
+  if _PREFIX in node:
+    return ''
+
+  alternatives = [
+      re.escape(char) + _trie_regex(child)
+      for char, child in sorted(node.items())
+      if char != _EXACT
+  ]
+  if _EXACT in node:
+    alternatives.append(r'\Z')
+
+  if len(alternatives) == 1:
+    return alternatives[0]
+  return '(?:' + '|'.join(alternatives) + ')'
+
+
+def build_exempt_matcher(prefixes: Iterable[str], patterns=None) -> re.Pattern:
+  """
+    One compiled regex matching request paths that skip authentication:
+    everything below the given path prefixes plus the auth_exempt routes.
+
+    Literal prefixes and routes are merged into a character trie, so
+    matching costs one step per path character however many routes there
+    are; only routes with converters are tried one after another.
+    """
+  trie = {}
+
+  def add(path: str, marker: str):
+    node = trie
+    for char in path:
+      node = node.setdefault(char, {})
+    node[marker] = True
+
+  regexes = []
+  for prefix in prefixes:
+    add(prefix, _PREFIX)
+  for is_literal, route in exempt_routes(patterns):
+    if is_literal:
+      add(route, _EXACT)
+    else:
+      regexes.append(route)
+
+  alternatives = ([_trie_regex(trie)] if trie else []) + regexes
+  if not alternatives:
+    return re.compile(r'(?!)')
+  return re.compile('|'.join(f'(?:{a})' for a in alternatives))
@@ -0,0 +1,153 @@
+import copy
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+
+from app.models import Profile
+
+
+@dataclass
+class Principal:
+  """Authenticated user of a request, resolved from its access token"""
+  user_id: int
+  user: Any
+  profile: Any
+  token: AccessToken
+  profile_created: bool = False
+
+
+@dataclass
+class _Entry:
+  principal: Principal
+  expires: float
+
+
+class PrincipalCache:
+  """
+    Process-wide cache of validated access tokens.
+
+    Entries are keyed by the SHA-256 of the raw token, so a warm hit needs
+    neither the signature check nor a database query. An entry lives for
+    ttl seconds but never past the token's own expiry, and is dropped as soon
+    as the user or profile is saved or deleted (see api.signals). Every
+    hit hands out copies of the cached user and profile, so a view
+    changing them does not leak into other requests.
+
+    Invalidation is per process: saves in other web instances or in the
+    session end worker are only seen once the entry expires. The user and
+    profile are therefore up to ttl seconds old and must not be saved as a
+    whole; write paths reload the row or use update() (see
+    api.views.adjust_tokens).
+    """
+
+  def __init__(self, ttl: float = 60, max_entries: int = 10000):
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self._entries: Dict[str, _Entry] = {}
+    self._keys_by_user: Dict[int, Set[str]] = {}
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _key(raw_token: str) -> str:
+    return hashlib.sha256(raw_token.encode()).hexdigest()
+
+  @staticmethod
+  def _load(token: AccessToken) -> Principal:
+    """Raises User.DoesNotExist if the token's user is gone"""
+    user_id = int(token['user_id'])
+    user = get_user_model().objects.select_related('profile').get(id=user_id)
+
+    profile_created = False
+    if hasattr(user, 'profile'):
+      profile = user.profile
+    else:
+      # Create profile if it doesn't exist
+      profile = Profile.objects.create(user=user)
+      profile_created = True
+
+    return Principal(user_id=user_id,
+                     user=user,
+                     profile=profile,
+                     token=token,
+                     profile_created=profile_created)
+
+  @staticmethod
+  def _copy(principal: Principal) -> Principal:
+    user = copy.copy(principal.user)
+    profile = copy.copy(principal.profile)
+    # Point the copies' related object caches at each other
+    user._state.fields_cache = dict(user._state.fields_cache,
+                                    profile=profile)
+    profile._state.fields_cache = dict(profile._state.fields_cache, user=user)
+    return Principal(user_id=principal.user_id,
+                     user=user,
+                     profile=profile,
+                     token=principal.token)
+
+  def get(self, raw_token: str) -> Optional[Principal]:
+    """Cached principal of the token, or None"""
+    entry = self._entries.get(self._key(raw_token))
+    if entry is None or entry.expires <= time.time():
+      return None
+    return self._copy(entry.principal)
+
+  def authenticate(self, raw_token: str) -> Principal:
+    """
+      Principal of the token, validating it and loading the user on a miss.
+      Raises TokenError for an invalid or expired token.
+      """
+    principal = self.get(raw_token)
+    if principal is not None:
+      return principal
+
+    token = AccessToken(raw_token)
+    principal = self._load(token)
+    self._store(raw_token, principal)
+    return principal
+
+  def _store(self, raw_token: str, principal: Principal):
+    key = self._key(raw_token)
+    now = time.time()
+    expires = min(now + self.ttl, float(principal.token['exp']))
+
+    with self._lock:
+      if len(self._entries) >= self.max_entries:
+        self._evict_expired(now)
+      if len(self._entries) >= self.max_entries:
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+      self._entries[key] = _Entry(principal=self._copy(principal),
+                                  expires=expires)
+      self._keys_by_user.setdefault(principal.user_id, set()).add(key)
+
+  def _evict_expired(self, now: float):
+    for key in [k for k, e in self._entries.items() if e.expires <= now]:
+      entry = self._entries.pop(key)
+      keys = self._keys_by_user.get(entry.principal.user_id)
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del self._keys_by_user[entry.principal.user_id]
+
+  def invalidate_user(self, user_id):
+    """Drop every cached token of the user"""
+    with self._lock:
+      for key in self._keys_by_user.pop(int(user_id), ()):
+        self._entries.pop(key, None)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._keys_by_user.clear()
+
+
+principal_cache = PrincipalCache(
+    ttl=getattr(settings, 'AUTH_PRINCIPAL_CACHE_TTL', 60),
+    max_entries=getattr(settings, 'AUTH_PRINCIPAL_CACHE_SIZE', 10000))
@@ -10,3 +10,11 @@ class Chat_SessionSerializer(serializers.ModelSerializer):
 
   def get_date(self, obj):
     return obj.date.strftime('%Y-%m-%d')
+
+
+class Chat_SessionListSerializer(serializers.ModelSerializer):
+  """History list entry; summary and character are only sent for one chat"""
+
+  class Meta:
+    model = Chat_Session
+    fields = ('id', 'date', 'title')
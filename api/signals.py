@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.models import Chat_Session, Profile
+from api.dashboard import invalidate_dashboard
+from api.security.principal_cache import principal_cache
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_principal(sender, instance, **kwargs):
+  if instance.user_id is not None:
+    principal_cache.invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_user_principal(sender, instance, **kwargs):
+  if instance.pk is not None:
+    principal_cache.invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Chat_Session)
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_dashboard_snapshot(sender, instance, **kwargs):
+  if instance.user_id is not None:
+    invalidate_dashboard(instance.user_id)
@@ -0,0 +1,61 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pydantic import BaseModel
+
+from api.agents.handlers.chat_model import SharedChatModel, TIME_MESSAGE_CONFIG
+
+
+class Answer(BaseModel):
+  text: str
+
+
+def fake_init_chat_model(**params):
+  model = mock.MagicMock(name=f"model {params.get('temperature')}")
+  model.params = params
+  model.ainvoke = mock.AsyncMock(return_value=params)
+  model.with_structured_output.side_effect = lambda schema, **kwargs: (
+      mock.MagicMock(ainvoke=mock.AsyncMock(return_value=(params, schema))))
+  return model
+
+
+@mock.patch('api.agents.handlers.chat_model.init_chat_model',
+            side_effect=fake_init_chat_model)
+class SharedChatModelTests(SimpleTestCase):
+
+  def test_one_provider_model_per_settings(self, init_chat_model):
+    chat_model = SharedChatModel(temperature=0.7, reasoning_effort="high")
+
+    for _ in range(3):
+      asyncio.run(chat_model.ainvoke("hi"))
+      asyncio.run(chat_model.ainvoke("hi", config=TIME_MESSAGE_CONFIG))
+
+    self.assertEqual(init_chat_model.call_count, 2)
+    params = asyncio.run(chat_model.ainvoke("hi",
+                                            config=TIME_MESSAGE_CONFIG))
+    self.assertEqual(params["temperature"], 0.6)
+    self.assertEqual(params["reasoning_effort"], "low")
+
+  def test_models_share_the_http_clients(self, init_chat_model):
+    chat_model = SharedChatModel(temperature=0.7)
+    first = chat_model.model_for()
+    second = chat_model.model_for({"configurable": {"foo_temperature": 0}})
+
+    self.assertIsNot(first, second)
+    self.assertIs(first.params["http_async_client"],
+                  second.params["http_async_client"])
+
+  def test_structured_output_uses_the_model_of_the_call(self, init_chat_model):
+    chat_model = SharedChatModel(temperature=0.7)
+    structured = chat_model.with_structured_output(Answer, method="json_mode")
+    config = {"configurable": {"foo_temperature": 0}}
+
+    params, schema = asyncio.run(structured.ainvoke("hi", config=config))
+    asyncio.run(structured.ainvoke("hi", config=config))
+
+    self.assertEqual(params["temperature"], 0)
+    self.assertIs(schema, Answer)
+    model = chat_model.model_for(config)
+    model.with_structured_output.assert_called_once_with(Answer,
+                                                         method="json_mode")
@@ -0,0 +1,197 @@
+import json
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.pagination import encode_cursor
+from app.models import Chat_Session, Message, Profile
+
+URL = '/api/chat_sessions'
+
+
+class ChatSessionViewTestCase(TestCase):
+
+  @classmethod
+  def setUpTestData(cls):
+    cls.user = User.objects.create_user(username="history",
+                                        password="Unused-pass-42")
+    Profile.objects.create(user=cls.user)
+    other = User.objects.create_user(username="other",
+                                     password="Unused-pass-42")
+    Profile.objects.create(user=other)
+    cls.other_chat = Chat_Session.objects.create(user=other, time_left=0)
+
+  def get(self, **params):
+    token = AccessToken.for_user(self.user)
+    return self.client.get(URL, params, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+
+class ChatHistoryTests(ChatSessionViewTestCase):
+
+  @classmethod
+  def setUpTestData(cls):
+    super().setUpTestData()
+    today = date.today()
+    # Two chats per day, so pages also split within a date
+    cls.chats = [
+        Chat_Session.objects.create(user=cls.user,
+                                    time_left=0,
+                                    date=today - timedelta(days=i // 2),
+                                    title=f"chat {i}") for i in range(7)
+    ]
+    cls.live = Chat_Session.objects.create(user=cls.user,
+                                           time_left=30,
+                                           date=today - timedelta(days=1))
+
+  def ordered_ids(self):
+    return list(
+        Chat_Session.objects.filter(user=self.user, time_left=0).order_by(
+            'date', 'id').values_list('id', flat=True))
+
+  def test_cursor_pages_cover_every_chat_once(self):
+    seen, cursor, pages = [], None, 0
+    while True:
+      params = {'limit': 3}
+      if cursor:
+        params['cursor'] = cursor
+      content = self.get(**params).json()['content']
+      seen += [chat['id'] for chat in content['filter']]
+      cursor = content['nextCursor']
+      pages += 1
+      if not cursor:
+        break
+
+    self.assertEqual(pages, 3)
+    self.assertEqual(seen, self.ordered_ids()[::-1])
+
+  def test_invalid_cursor_is_rejected(self):
+    for cursor in ("zz", encode_cursor("not a date", 1),
+                   encode_cursor(date.today().isoformat(), "x"),
+                   encode_cursor(date.today().isoformat())):
+      response = self.get(cursor=cursor)
+      self.assertEqual(response.status_code, 400, cursor)
+      self.assertTrue(response.json()['error'])
+
+  def test_neighbours_of_a_completed_chat(self):
+    order = self.ordered_ids()
+    content = self.get(context='true', selectedId=order[3]).json()['content']
+
+    self.assertEqual(content['selected']['id'], order[3])
+    self.assertEqual(content['previousId'], order[2])
+    self.assertEqual(content['nextId'], order[4])
+
+  def test_latest_chat_without_selection(self):
+    order = self.ordered_ids()
+    content = self.get(context='true').json()['content']
+
+    self.assertEqual(content['selected']['id'], order[-1])
+    self.assertEqual(content['previousId'], order[-2])
+    self.assertIsNone(content['nextId'])
+
+  def test_neighbours_of_a_chat_in_progress(self):
+    # Placed among the completed chats by (date, id), without being one
+    order = list(
+        Chat_Session.objects.filter(user=self.user).order_by(
+            'date', 'id').values_list('id', flat=True))
+    position = order.index(self.live.id)
+
+    content = self.get(context='true',
+                       selectedId=self.live.id).json()['content']
+
+    self.assertEqual(content['selected']['id'], self.live.id)
+    self.assertEqual(content['previousId'], order[position - 1])
+    self.assertEqual(content['nextId'], order[position + 1])
+
+  def test_chat_of_another_user_is_not_selected(self):
+    content = self.get(context='true',
+                       selectedId=self.other_chat.id).json()['content']
+
+    self.assertIsNone(content['selected'])
+
+
+class TranscriptTests(ChatSessionViewTestCase):
+
+  @classmethod
+  def setUpTestData(cls):
+    super().setUpTestData()
+    cls.chat = Chat_Session.objects.create(user=cls.user, time_left=0)
+    start = timezone.now()
+    # Three messages share every timestamp, so the id breaks the ties
+    for i in range(11):
+      Message.objects.create(chat_session=cls.chat,
+                             content=f"message {i}",
+                             role='user' if i % 2 else 'assistant',
+                             date_created=start + timedelta(seconds=i // 3))
+    cls.message_ids = list(
+        Message.objects.filter(chat_session=cls.chat).order_by(
+            'date_created', 'id').values_list('id', flat=True))
+
+  def test_cursor_pages_cover_every_message_once(self):
+    seen, cursor, pages = [], None, 0
+    while True:
+      params = {'getMessage': 'true', 'chatSessionId': self.chat.id, 'limit': 4}
+      if cursor:
+        params['cursor'] = cursor
+      data = self.get(**params).json()['data']
+      seen += [message['id'] for message in data['messages']]
+      cursor = data['nextCursor']
+      pages += 1
+      if not cursor:
+        break
+
+    self.assertEqual(pages, 3)
+    self.assertEqual(seen, self.message_ids)
+
+  def test_context_returns_the_first_page_and_its_cursor(self):
+    with self.settings(TRANSCRIPT_PAGE_SIZE=4):
+      content = self.get(context='true',
+                         selectedId=self.chat.id).json()['content']
+
+    self.assertEqual([message['id'] for message in content['messages'][0]],
+                     self.message_ids[:4])
+    data = self.get(getMessage='true',
+                    chatSessionId=self.chat.id,
+                    cursor=content['messagesCursor']).json()['data']
+    self.assertEqual([message['id'] for message in data['messages']],
+                     self.message_ids[4:])
+
+  def test_invalid_cursor_is_rejected(self):
+    for cursor in ("zz", encode_cursor("not a time", 1),
+                   encode_cursor(timezone.now().isoformat(), "x")):
+      response = self.get(getMessage='true',
+                          chatSessionId=self.chat.id,
+                          cursor=cursor)
+      self.assertEqual(response.status_code, 400, cursor)
+
+  def test_chat_of_another_user_is_not_found(self):
+    response = self.get(getMessage='true', chatSessionId=self.other_chat.id)
+
+    self.assertEqual(response.status_code, 404)
+
+  @override_settings(TRANSCRIPT_CHUNK_SIZE=4)
+  def test_stream_returns_the_transcript_as_ndjson(self):
+    response = self.get(getMessage='true',
+                        chatSessionId=self.chat.id,
+                        stream='true')
+
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+    self.assertTrue(response.is_async)
+
+    async def consume():
+      return [part async for part in response.streaming_content]
+
+    # Under async_to_sync the database work stays on this thread and sees
+    # the test transaction
+    parts = async_to_sync(consume)()
+    lines = b''.join(parts).decode().splitlines()
+    messages = [json.loads(line) for line in lines]
+
+    self.assertEqual(len(parts), 3)
+    self.assertEqual([message['id'] for message in messages],
+                     self.message_ids)
+    self.assertEqual(messages[0]['content'], "message 0")
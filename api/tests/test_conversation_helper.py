@@ -0,0 +1,60 @@
+import asyncio
+import gc
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pydantic import BaseModel
+
+from api.agents.handlers import conversation_helper
+from api.agents.handlers.conversation_helper import ConversationHelper
+
+
+class Answer(BaseModel):
+  text: str
+
+
+class HedgedRunUntilJsonTests(SimpleTestCase):
+
+  def run_with_loop_errors(self, coro):
+    errors = []
+
+    async def main():
+      asyncio.get_running_loop().set_exception_handler(
+          lambda loop, context: errors.append(context))
+      result = await coro
+      gc.collect()
+      await asyncio.sleep(0)
+      return result
+
+    return asyncio.run(main()), errors
+
+  def test_losing_attempts_exceptions_are_retrieved(self):
+    helper = ConversationHelper(ai_model=None)
+    gate = asyncio.Event()
+    calls = []
+
+    async def attempt(prompt, response_type, method, config):
+      calls.append(method)
+      number = len(calls)
+      await gate.wait()
+      if number == 1:
+        return {"text": "ok"}
+      raise ValueError(f"attempt {number} failed")
+
+    async def run():
+      # Every attempt finishes in the same wait once the gate opens
+      asyncio.get_running_loop().call_later(0.05, gate.set)
+      return await helper.run_until_json("prompt",
+                                         Answer,
+                                         temperature=0.5,
+                                         hedge=True)
+
+    with mock.patch.object(helper, "_attempt", side_effect=attempt), \
+        mock.patch.object(conversation_helper, "hedge_delay",
+                          return_value=0.001):
+      with self.assertLogs(level="WARNING"):
+        result, errors = self.run_with_loop_errors(run())
+
+    self.assertEqual(result, {"text": "ok"})
+    self.assertEqual(len(calls), 4)
+    self.assertEqual(errors, [])
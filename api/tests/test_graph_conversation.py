@@ -0,0 +1,28 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.agents.graph.graph_conversation import (ConversationGraphManager,
+                                                 GraphDependencies,
+                                                 graph_config)
+
+
+class LeaveTopicStreamingTests(SimpleTestCase):
+
+  def test_topic_turns_do_not_stream_tokens(self):
+    manager = ConversationGraphManager()
+    config = graph_config(GraphDependencies(None, None, None, None),
+                          token_sink=mock.AsyncMock())
+    state = SimpleNamespace(prompt_asked_questions="question")
+
+    with mock.patch.object(manager, "_process_message",
+                           mock.AsyncMock(return_value=state)) as process:
+      asyncio.run(manager._leave_topic(state, config))
+
+    passed_config = process.await_args.args[1]
+    self.assertNotIn("token_sink", passed_config["configurable"])
+    self.assertIn("dependencies", passed_config["configurable"])
+    # The run config itself keeps the sink for plain message turns
+    self.assertIn("token_sink", config["configurable"])
@@ -0,0 +1,64 @@
+import tempfile
+
+from django.test import SimpleTestCase
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores import (FilterOperator, MetadataFilter,
+                                            MetadataFilters)
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+from api.agents.handlers.local_vector_store import LocalVectorStore
+
+
+def node(text, topic_id, user_id="1"):
+  return TextNode(text=text,
+                  metadata={
+                      "user_id": user_id,
+                      "topic_id": topic_id
+                  },
+                  embedding=[1.0, 0.0])
+
+
+def user_filter(user_id="1", **values):
+  return MetadataFilters(filters=[
+      MetadataFilter(key=key, value=value, operator=FilterOperator.EQ)
+      for key, value in dict(values, user_id=user_id).items()
+  ])
+
+
+class LocalVectorStoreTests(SimpleTestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def store(self):
+    return LocalVectorStore(namespace="topics",
+                            directory=self.directory.name)
+
+  def texts(self, store):
+    result = store.query(
+        VectorStoreQuery(query_embedding=[1.0, 0.0],
+                         similarity_top_k=10,
+                         filters=user_filter()))
+    return sorted(n.text for n in result.nodes)
+
+  def test_stores_sharing_a_directory_see_each_others_writes(self):
+    # Two stores stand for two processes, e.g. Daphne and the worker
+    web, worker = self.store(), self.store()
+    web.add([node("a", "1")])
+    self.assertEqual(self.texts(worker), ["a"])
+
+    worker.add([node("b", "2")])
+    web.add([node("c", "3")])
+
+    self.assertEqual(self.texts(web), ["a", "b", "c"])
+    self.assertEqual(self.texts(worker), ["a", "b", "c"])
+
+  def test_delete_nodes_by_filter_is_seen_by_other_store(self):
+    web, worker = self.store(), self.store()
+    web.add([node("a", "1"), node("b", "2")])
+    self.assertEqual(self.texts(worker), ["a", "b"])
+
+    worker.delete_nodes(filters=user_filter(topic_id="1"))
+
+    self.assertEqual(self.texts(web), ["b"])
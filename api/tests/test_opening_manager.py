@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from api.agents.handlers.opening_manager import (opening_context,
+                                                 opening_context_hash)
+from app.models import Chat_Session, Topic
+
+
+class OpeningContextTests(TestCase):
+
+  def setUp(self):
+    self.user = User.objects.create(username='opening')
+    Chat_Session.objects.create(user=self.user,
+                                time_left=0,
+                                date=timezone.now().date() -
+                                timedelta(days=7),
+                                summary='Last week')
+    self.chat_session = Chat_Session.objects.create(
+        user=self.user, time_left=60, date=timezone.now().date())
+
+  def test_topic_edits_keep_the_context(self):
+    topic = Topic.objects.create(user=self.user, name='Work', description='')
+    before = opening_context_hash(
+        opening_context(self.chat_session, 'opening'))
+
+    topic.description = 'New job'
+    topic.save()
+    Topic.objects.create(user=self.user, name='Sport', description='')
+
+    self.assertEqual(
+        opening_context_hash(opening_context(self.chat_session, 'opening')),
+        before)
+
+  def test_context_is_built_with_one_query(self):
+    with self.assertNumQueries(1):
+      context = opening_context(self.chat_session, 'opening')
+    self.assertEqual(context['previous_summary'], 'Last week')
@@ -0,0 +1,144 @@
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+from llama_index.core.schema import TextNode
+
+from api.agents.handlers.local_vector_store import LocalVectorStore
+from api.agents.handlers.pinecone_manager import PineconeManager
+from api.agents.models.conversation_models import TopicState
+
+
+class StubVectorStore:
+  """
+  Vector store with the delete signatures of PineconeVectorStore, keeping
+  the inserted nodes in a list.
+  """
+
+  def __init__(self):
+    self.nodes = []
+    self.failing_deletes = set()
+
+  def delete(self, ref_doc_id, **delete_kwargs):
+    self.nodes = [node for node in self.nodes if node.ref_doc_id != ref_doc_id]
+
+  def delete_nodes(self, node_ids=None, filters=None, **delete_kwargs):
+    values = {f.key: f.value for f in filters.filters}
+    if values.get("topic_id") in self.failing_deletes:
+      raise ConnectionError("delete failed")
+    self.nodes = [
+        node for node in self.nodes
+        if any(node.metadata.get(k) != v for k, v in values.items())
+    ]
+
+  def insert_nodes(self, nodes, **kwargs):
+    self.nodes.extend(nodes)
+
+
+def make_manager(user_id=1):
+  manager = PineconeManager.__new__(PineconeManager)
+  manager.user_id = user_id
+  manager.topic_store = manager.topic_index = StubVectorStore()
+  manager.log_store = manager.log_index = StubVectorStore()
+  manager.executor = ThreadPoolExecutor(max_workers=1)
+
+  async def embeddings(texts):
+    return [[1.0, 0.0] for _ in texts]
+
+  manager.get_text_embeddings = embeddings
+  return manager
+
+
+def topic(topic_id, text):
+  return TopicState(topic_id=topic_id,
+                    topic_name=f"topic {topic_id}",
+                    text=text,
+                    confidence=1.0)
+
+
+class UpsertTopicsBulkTests(SimpleTestCase):
+
+  def test_one_vector_per_topic_after_two_upserts(self):
+    manager = make_manager()
+    store = manager.topic_store
+
+    self.assertTrue(
+        asyncio.run(manager.upsert_topics_bulk([topic(1, "a"),
+                                                topic(2, "b")])))
+    self.assertTrue(
+        asyncio.run(
+            manager.upsert_topics_bulk([topic(1, "a again"),
+                                        topic(2, "b again")])))
+
+    topic_ids = sorted(node.metadata["topic_id"] for node in store.nodes)
+    self.assertEqual(topic_ids, ["1", "2"])
+    self.assertTrue(all("again" in node.text for node in store.nodes))
+
+  def test_topic_is_not_inserted_when_delete_fails(self):
+    manager = make_manager()
+    store = manager.topic_store
+    asyncio.run(manager.upsert_topics_bulk([topic(1, "a"), topic(2, "b")]))
+
+    store.failing_deletes.add("2")
+    with self.assertLogs("api.agents.handlers.pinecone_manager", "ERROR"):
+      result = asyncio.run(
+          manager.upsert_topics_bulk([topic(1, "new"),
+                                      topic(2, "new")]))
+
+    self.assertFalse(result)
+    texts = {node.metadata["topic_id"]: node.text for node in store.nodes}
+    self.assertEqual(len(store.nodes), 2)
+    self.assertEqual(texts["1"], "topic new")
+    self.assertEqual(texts["2"], "topic b")
+
+  def test_local_store_keeps_one_vector_per_topic(self):
+    manager = make_manager()
+    with tempfile.TemporaryDirectory() as directory:
+      store = LocalVectorStore(namespace="topics", directory=directory)
+      manager.topic_store = manager.topic_index = store
+
+      asyncio.run(manager.upsert_topics_bulk([topic(1, "a"), topic(2, "b")]))
+      asyncio.run(manager.upsert_topics_bulk([topic(1, "c")]))
+
+      segment = store._segment("1")
+      self.assertEqual(sorted(meta["topic_id"] for meta in segment.metadata),
+                       ["1", "2"])
+      self.assertIn("topic c", segment.texts)
+
+
+class DeleteSessionLogsTests(SimpleTestCase):
+
+  def test_only_logs_of_the_session_and_user_are_removed(self):
+    manager = make_manager()
+    store = manager.log_store
+    store.nodes = [
+        TextNode(text="kept",
+                 metadata={
+                     "chat_session_id": "7",
+                     "user_id": "2"
+                 }),
+        TextNode(text="kept",
+                 metadata={
+                     "chat_session_id": "8",
+                     "user_id": "1"
+                 }),
+        TextNode(text="removed",
+                 metadata={
+                     "chat_session_id": "7",
+                     "user_id": "1"
+                 }),
+    ]
+
+    self.assertTrue(asyncio.run(manager.delete_session_logs(7)))
+    self.assertEqual([node.text for node in store.nodes], ["kept", "kept"])
+
+  def test_failure_is_reported(self):
+    manager = make_manager()
+
+    def delete_nodes(**kwargs):
+      raise ConnectionError("delete failed")
+
+    manager.log_store.delete_nodes = delete_nodes
+    with self.assertLogs("api.agents.handlers.pinecone_manager", "ERROR"):
+      self.assertFalse(asyncio.run(manager.delete_session_logs(7)))
@@ -0,0 +1,133 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CustomJWTAuthentication
+from api.security.principal_cache import PrincipalCache, principal_cache
+from app.models import Profile
+
+
+class PrincipalCacheTests(TestCase):
+
+  def setUp(self):
+    self.user = User.objects.create_user(username="cached",
+                                         password="Unused-pass-42")
+    self.profile = Profile.objects.create(user=self.user, character="calm")
+    self.token = str(AccessToken.for_user(self.user))
+    self.cache = PrincipalCache(ttl=60)
+    principal_cache.clear()
+    self.addCleanup(principal_cache.clear)
+
+  def test_warm_hit_makes_no_queries(self):
+    principal = self.cache.authenticate(self.token)
+    self.assertEqual(principal.user_id, self.user.id)
+
+    with self.assertNumQueries(0):
+      principal = self.cache.authenticate(self.token)
+    self.assertEqual(principal.profile.character, "calm")
+
+  def test_profile_save_invalidates(self):
+    principal_cache.authenticate(self.token)
+
+    self.profile.character = "curious"
+    self.profile.save(update_fields=['character'])
+
+    self.assertIsNone(principal_cache.get(self.token))
+    self.assertEqual(
+        principal_cache.authenticate(self.token).profile.character,
+        "curious")
+
+  def test_user_save_invalidates(self):
+    principal_cache.authenticate(self.token)
+
+    self.user.first_name = "Renamed"
+    self.user.save()
+
+    self.assertIsNone(principal_cache.get(self.token))
+    self.assertEqual(
+        principal_cache.authenticate(self.token).user.first_name, "Renamed")
+
+  def test_entry_expires_with_the_token(self):
+    token = AccessToken.for_user(self.user)
+    token.set_exp(lifetime=timedelta(seconds=30))
+    raw_token = str(token)
+    cache = PrincipalCache(ttl=3600)
+    cache.authenticate(raw_token)
+
+    with mock.patch('api.security.principal_cache.time.time',
+                    return_value=token['exp'] - 1):
+      self.assertIsNotNone(cache.get(raw_token))
+    with mock.patch('api.security.principal_cache.time.time',
+                    return_value=token['exp']):
+      self.assertIsNone(cache.get(raw_token))
+
+  def test_entry_expires_after_ttl(self):
+    with mock.patch('api.security.principal_cache.time.time',
+                    return_value=1000.0):
+      self.cache.authenticate(self.token)
+    with mock.patch('api.security.principal_cache.time.time',
+                    return_value=1060.0):
+      self.assertIsNone(self.cache.get(self.token))
+
+  def test_mutations_do_not_leak_into_other_hits(self):
+    first = self.cache.authenticate(self.token)
+    first.profile.character = "changed on the miss"
+    first.user.first_name = "changed"
+
+    hit = self.cache.authenticate(self.token)
+    self.assertEqual(hit.profile.character, "calm")
+    self.assertEqual(hit.user.first_name, "")
+    hit.profile.tokens = 0
+
+    again = self.cache.authenticate(self.token)
+    self.assertEqual(again.profile.tokens, self.profile.tokens)
+    self.assertIs(again.user.profile, again.profile)
+    self.assertIs(again.profile.user, again.user)
+
+
+class CustomJWTAuthenticationTests(TestCase):
+
+  def setUp(self):
+    self.user = User.objects.create_user(username="jwt",
+                                         password="Unused-pass-42")
+    Profile.objects.create(user=self.user)
+    principal_cache.clear()
+    self.addCleanup(principal_cache.clear)
+
+  def request(self, token):
+    return Request(APIRequestFactory().get(
+        "/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+  def test_valid_token_authenticates(self):
+    token = str(AccessToken.for_user(self.user))
+
+    user, validated = CustomJWTAuthentication().authenticate(
+        self.request(token))
+
+    self.assertEqual(user.id, self.user.id)
+    self.assertEqual(validated['user_id'], str(self.user.id))
+
+  def test_invalid_token_leaves_request_unauthenticated(self):
+    self.assertIsNone(CustomJWTAuthentication().authenticate(
+        self.request("not-a-token")))
+
+  def test_token_of_deleted_user_leaves_request_unauthenticated(self):
+    token = str(AccessToken.for_user(self.user))
+    self.user.delete()
+
+    self.assertIsNone(CustomJWTAuthentication().authenticate(
+        self.request(token)))
+
+  def test_principal_of_the_middleware_is_reused(self):
+    token = str(AccessToken.for_user(self.user))
+    request = self.request(token)
+    request._request.auth_principal = principal_cache.authenticate(token)
+
+    with self.assertNumQueries(0):
+      user, _ = CustomJWTAuthentication().authenticate(request)
+    self.assertEqual(user.id, self.user.id)
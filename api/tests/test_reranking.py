@@ -0,0 +1,61 @@
+import random
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+
+from api.agents.handlers.reranking import (VECTORIZE_MIN_CANDIDATES,
+                                          TimeBoostCurve, _rerank_loop,
+                                          _rerank_vectorized, rerank)
+
+
+def candidates(count, now, seed=0):
+  rng = random.Random(seed)
+  similarities, dates = [], []
+  for i in range(count):
+    similarities.append(rng.uniform(0.2, 0.9))
+    date = now - timedelta(days=rng.randint(0, 200), hours=rng.randint(0, 23))
+    # Numeric timestamps, ISO strings and missing values all occur
+    dates.append([date.timestamp(), date.isoformat(), None][i % 3])
+  return similarities, dates
+
+
+class RerankTests(SimpleTestCase):
+
+  def test_loop_and_vectorized_paths_agree(self):
+    now = datetime(2026, 1, 1, 12)
+    curve = TimeBoostCurve()
+    for count in (0, 1, 10, 300):
+      similarities, dates = candidates(count, now, seed=count)
+      args = (similarities, dates, 0.4, 0.5, 5, curve, now.timestamp())
+
+      loop_indices, loop_scores = _rerank_loop(*args)
+      vector_indices, vector_scores = _rerank_vectorized(*args)
+
+      self.assertEqual(loop_indices, vector_indices)
+      for loop_score, vector_score in zip(loop_scores, vector_scores):
+        self.assertAlmostEqual(loop_score, vector_score)
+
+  def test_selects_best_boosted_scores_above_thresholds(self):
+    now = datetime(2026, 1, 1).timestamp()
+    day = 86400
+    indices, scores = rerank(
+        similarities=[0.3, 0.45, 0.45, 0.6],
+        dates=[now, now - 200 * day, now - day, now - 60 * day],
+        base_threshold=0.4,
+        final_threshold=0.5,
+        max_results=2,
+        now=now)
+
+    # 0.3 is below the base threshold, the old 0.45 gets no boost
+    self.assertEqual(indices, [2, 3])
+    self.assertAlmostEqual(scores[0], 0.45 * 1.5)
+    self.assertAlmostEqual(scores[1], 0.6 * 1.05)
+
+  def test_large_candidate_lists_use_the_same_selection(self):
+    now = datetime(2026, 1, 1)
+    similarities, dates = candidates(VECTORIZE_MIN_CANDIDATES, now)
+    args = (similarities, dates, 0.4, 0.5, 3)
+
+    self.assertEqual(
+        rerank(*args, now=now.timestamp())[0],
+        _rerank_loop(*args, TimeBoostCurve(), now.timestamp())[0])
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api.agents.handlers.session_end_queue import (record_worker_heartbeat,
+                                                   remove_worker_heartbeat,
+                                                   session_end_worker_alive)
+from api.agents.main.moment_manager import MomentManager
+from app.models import Chat_Session, SessionEndTask, SessionEndWorker
+
+
+def make_moment_manager(chat_session):
+  manager = MomentManager.__new__(MomentManager)
+  manager.chat_session = chat_session
+  manager.state = None
+  manager.session_ended = False
+  manager.session_end_queued = False
+  manager.time_manager = mock.Mock()
+  manager.session_manager = mock.Mock()
+  manager.session_manager.handle_state_end = mock.AsyncMock()
+  manager.session_manager.handle_end = mock.AsyncMock(return_value="Bye")
+  return manager
+
+
+# Transactional, so the database is visible to the sync_to_async threads
+class SessionEndQueueTests(TransactionTestCase):
+
+  def setUp(self):
+    user = User.objects.create_user(username="queue", password="x")
+    self.chat_session = Chat_Session.objects.create(user=user)
+
+  def test_worker_alive_only_with_a_recent_heartbeat(self):
+    self.assertFalse(session_end_worker_alive())
+
+    record_worker_heartbeat("host:1")
+    self.assertTrue(session_end_worker_alive())
+
+    SessionEndWorker.objects.update(last_seen=timezone.now() -
+                                    timedelta(seconds=120))
+    self.assertFalse(session_end_worker_alive())
+
+  @mock.patch('app.management.commands.process_session_end.precompute_openings')
+  def test_worker_removes_its_heartbeat_when_it_exits(self, precompute):
+    with mock.patch(
+        'app.management.commands.process_session_end.remove_worker_heartbeat',
+        wraps=remove_worker_heartbeat) as remove:
+      call_command('process_session_end',
+                   '--once',
+                   '--openings-every',
+                   '0',
+                   stdout=StringIO())
+
+    remove.assert_called_once()
+    self.assertFalse(SessionEndWorker.objects.exists())
+
+  @override_settings(SESSION_END_QUEUE=True)
+  def test_end_session_is_processed_inline_without_a_worker(self):
+    manager = make_moment_manager(self.chat_session)
+
+    self.assertEqual(asyncio.run(manager.end_session()), "Bye")
+
+    manager.session_manager.handle_state_end.assert_awaited_once()
+    self.assertFalse(manager.session_end_queued)
+    self.assertFalse(SessionEndTask.objects.exists())
+
+  @override_settings(SESSION_END_QUEUE=True)
+  def test_end_session_is_queued_while_a_worker_runs(self):
+    record_worker_heartbeat("host:1")
+    manager = make_moment_manager(self.chat_session)
+
+    asyncio.run(manager.end_session())
+
+    manager.session_manager.handle_state_end.assert_not_awaited()
+    self.assertTrue(manager.session_end_queued)
+    self.assertEqual(
+        SessionEndTask.objects.get(chat_session=self.chat_session).status,
+        SessionEndTask.PENDING)
@@ -0,0 +1,71 @@
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+
+from app.models import Message
+from .pagination import encode_cursor
+from .serializers.chat_serializer import MessageSerializer
+
+# Only the serialized columns are read (and only content is decrypted)
+MESSAGE_FIELDS = MessageSerializer.Meta.fields
+
+
+def transcript_queryset(chat_session_id, after=None):
+  """
+    Messages of a chat session in transcript order, optionally only those
+    after the (date_created, id) of a cursor.
+    """
+  messages = Message.objects.filter(chat_session_id=chat_session_id).only(
+      *MESSAGE_FIELDS).order_by('date_created', 'id')
+  if after:
+    messages = messages.filter(
+        Q(date_created__gt=after[0])
+        | Q(date_created=after[0], id__gt=after[1]))
+  return messages
+
+
+def transcript_page(chat_session_id, after, limit):
+  """One page of serialized messages and the cursor of the next page"""
+  messages = list(transcript_queryset(chat_session_id, after)[:limit + 1])
+
+  next_cursor = None
+  if len(messages) > limit:
+    messages = messages[:limit]
+    next_cursor = encode_cursor(messages[-1].date_created.isoformat(),
+                                messages[-1].id)
+  return MessageSerializer(messages, many=True).data, next_cursor
+
+
+def message_chunks(messages, chunk_size):
+  """
+    Serialized messages in lists of at most chunk_size. Rows are read through
+    a server-side cursor, so only one chunk is decrypted and held at a time.
+    """
+  rows = messages.iterator(chunk_size=chunk_size)
+  while True:
+    chunk = list(islice(rows, chunk_size))
+    if not chunk:
+      return
+    yield MessageSerializer(chunk, many=True).data
+
+
+async def ndjson_transcript(chat_session_id, chunk_size):
+  """
+    Whole transcript as NDJSON, one message per line, for a
+    StreamingHttpResponse. It is an async iterator so that Daphne sends
+    every chunk as soon as it is read instead of buffering the response;
+    the cursor itself is only touched from the database thread.
+    """
+  chunks = message_chunks(transcript_queryset(chat_session_id), chunk_size)
+  next_chunk = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+  try:
+    while True:
+      chunk = await next_chunk()
+      if chunk is None:
+        break
+      yield ''.join(json.dumps(message) + '\n' for message in chunk)
+  finally:
+    # Releases the server-side cursor, also when the client went away
+    await sync_to_async(chunks.close, thread_sensitive=True)()
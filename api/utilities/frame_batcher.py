@@ -0,0 +1,75 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, List, Optional
+
+
+class FrameBatcher:
+  """
+    Coalesces streamed text into websocket frames.
+
+    Text passed to add() is buffered and sent as one frame once the buffer
+    holds max_chars characters or the oldest buffered text is max_delay
+    seconds old, whichever comes first. The JSON envelope is encoded once,
+    so every frame only encodes its text. close() sends what is left.
+    """
+
+  def __init__(self,
+               send: Callable[[str], Awaitable[None]],
+               message_type: str = "message",
+               topics: Optional[str] = None,
+               max_chars: int = 64,
+               max_delay: float = 0.03):
+    self.send = send
+    self.max_chars = max_chars
+    self.max_delay = max_delay
+
+    # Same keys and order as the frames built with json.dumps before
+    envelope = {} if topics is None else {'topics': topics}
+    envelope['type'] = message_type
+    self._head = json.dumps(envelope)[:-1] + ', "text": '
+
+    self._buffer: List[str] = []
+    self._size = 0
+    self._timer: Optional[asyncio.Task] = None
+    self._lock = asyncio.Lock()
+    self.frames_sent = 0
+
+  def encode(self, text: str) -> str:
+    return self._head + json.dumps(text) + '}'
+
+  async def add(self, text: str) -> None:
+    if not text:
+      return
+
+    self._buffer.append(text)
+    self._size += len(text)
+
+    if self._size >= self.max_chars:
+      await self.flush()
+    elif self._timer is None:
+      self._timer = asyncio.create_task(self._flush_later())
+
+  async def _flush_later(self):
+    await asyncio.sleep(self.max_delay)
+    self._timer = None
+    await self.flush()
+
+  async def flush(self) -> None:
+    if self._timer is not None and self._timer is not asyncio.current_task():
+      self._timer.cancel()
+      self._timer = None
+
+    if not self._buffer:
+      return
+
+    # Take the buffer before awaiting so later text goes to the next frame
+    text = "".join(self._buffer)
+    self._buffer = []
+    self._size = 0
+
+    async with self._lock:
+      await self.send(self.encode(text))
+      self.frames_sent += 1
+
+  async def close(self) -> None:
+    await self.flush()
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_monitored_loops = weakref.WeakSet()
+
+
+def install_loop_block_detector(loop=None, threshold_ms=None) -> bool:
+  """
+    Log every callback that holds the event loop longer than threshold_ms.
+
+    Uses asyncio debug mode (slow_callback_duration), which reports the
+    offending handle through the 'asyncio' logger. Enabled with
+    settings.ASYNCIO_LOOP_BLOCK_DETECTOR; installed at most once per loop.
+    Returns True if the detector is active on the loop.
+    """
+  if not getattr(settings, 'ASYNCIO_LOOP_BLOCK_DETECTOR', False):
+    return False
+
+  loop = loop or asyncio.get_running_loop()
+  if loop in _monitored_loops:
+    return True
+
+  if threshold_ms is None:
+    threshold_ms = getattr(settings, 'ASYNCIO_SLOW_CALLBACK_MS', 50)
+
+  loop.set_debug(True)
+  loop.slow_callback_duration = threshold_ms / 1000
+
+  # asyncio reports slow callbacks as warnings on its own logger
+  asyncio_logger = logging.getLogger('asyncio')
+  if asyncio_logger.getEffectiveLevel() > logging.WARNING:
+    asyncio_logger.setLevel(logging.WARNING)
+
+  _monitored_loops.add(loop)
+  logger.warning(
+      f"Event loop block detector active (threshold {threshold_ms} ms)")
+  return True
@@ -1,4 +1,4 @@
-from app.models import Chat_Session, Profile, Topic, User, Message, GooglePlaySubscription, ProfileActivationToken
+from app.models import Chat_Session, Profile, Topic, User, Message, GooglePlaySubscription, ProfileActivationToken, SessionEndTask
 from smtplib import SMTPException
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
@@ -14,29 +14,37 @@ from django.conf import settings
 from .security.utils import TokenManager
 from .serializers.user_serializer import UserSerializer
 from .serializers.topic_serializer import TopicSerializer
-from .serializers.chat_session_serializer import Chat_SessionSerializer
-from django.http import HttpResponse
+from .serializers.chat_session_serializer import Chat_SessionSerializer, Chat_SessionListSerializer
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from datetime import timedelta, datetime
+from datetime import date, timedelta, datetime
 from django.core.cache import cache
 from .services import validate_password_strength, EmailService, validate_username, validate_email
+from api.agents.handlers.session_end_queue import session_end_status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import authenticate
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import CustomJWTAuthentication
+from .security.exemptions import auth_exempt
+from .security.principal_cache import principal_cache
+from .dashboard import dashboard_snapshot, invalidate_dashboard
+from .pagination import decode_cursor, encode_cursor, page_size
+from .transcript import ndjson_transcript, transcript_page
 from django.shortcuts import render
 import logging
 from .serializers.chat_serializer import MessageSerializer
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 import string
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F, Q
 
 logger = logging.getLogger(__name__)
 
 
+@auth_exempt
 class CronReminder(APIView):
   permission_classes = [AllowAny]
 
@@ -60,6 +68,7 @@ class CronReminder(APIView):
     return Response({"status": "success"})
 
 
+@auth_exempt
 def chats_view(request):
 
   # Check if Chat_Session for user 1 is created today
@@ -90,6 +99,7 @@ def chats_view(request):
   return render(request, 'stream.html', response_data)
 
 
+@auth_exempt
 class TestMail(APIView):
   permission_classes = [AllowAny]
 
@@ -106,7 +116,7 @@ class TestMail(APIView):
 
 class DeleteUser(APIView):
   permission_classes = [IsAuthenticated]
-  authentication_classes = [JWTAuthentication]
+  authentication_classes = [CustomJWTAuthentication]
 
   def post(self, request):
     user_id = request.user_id
@@ -162,6 +172,7 @@ class DeleteUser(APIView):
           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@auth_exempt
 class SendActivationCode(APIView):
   permission_classes = [AllowAny]
 
@@ -247,6 +258,7 @@ class SendActivationCode(APIView):
           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@auth_exempt
 class VerifyActivationCode(APIView):
   permission_classes = [AllowAny]
 
@@ -307,6 +319,7 @@ class VerifyActivationCode(APIView):
           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@auth_exempt
 class RegisterView(APIView):
   permission_classes = [AllowAny]
 
@@ -427,10 +440,11 @@ class UpdateProfile(APIView):
     email = request.data.get('email')
     reminder = request.data.get('reminder')
 
-    # Get current user and profile
+    # Get current user and profile; request.user and request.profile are
+    # cached copies, so saves below only write the fields changed here
     user = request.user
     try:
-      profile = request.profile
+      profile = Profile.objects.get(user_id=user.id)
     except Profile.DoesNotExist:
       return Response({
           'message': 'Profile not found',
@@ -438,6 +452,7 @@ class UpdateProfile(APIView):
       },
                       status=status.HTTP_404_NOT_FOUND)
 
+    user_fields, profile_fields = [], []
     try:
       with transaction.atomic():
         # Username update and validation
@@ -451,6 +466,7 @@ class UpdateProfile(APIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST)
           user.username = username
+          user_fields.append('username')
 
           # Password update and validation
 
@@ -471,6 +487,7 @@ class UpdateProfile(APIView):
             },
                             status=status.HTTP_400_BAD_REQUEST)
           user.set_password(password)
+          user_fields.append('password')
 
         # Email update and validation
         if email and email != profile.email:
@@ -482,6 +499,7 @@ class UpdateProfile(APIView):
                 },
                 status=status.HTTP_400_BAD_REQUEST)
           profile.email = email
+          profile_fields.append('email')
 
           is_valid, message = validate_email(email)
           if not is_valid:
@@ -494,10 +512,13 @@ class UpdateProfile(APIView):
         # Reminder update
         if reminder is not None:
           profile.reminder = reminder
+          profile_fields.append('reminder')
 
         # Save changes
-        user.save()
-        profile.save()
+        if user_fields:
+          user.save(update_fields=user_fields)
+        if profile_fields:
+          profile.save(update_fields=profile_fields)
 
         return Response({
             'message': 'Profile updated successfully',
@@ -518,6 +539,7 @@ class UpdateProfile(APIView):
                       status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@auth_exempt
 class ResetPassword(APIView):
   permission_classes = [AllowAny]
 
@@ -590,8 +612,63 @@ class ResetPassword(APIView):
           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def adjust_tokens(user_id, delta) -> bool:
+  """
+  Add delta to the user's tokens in one UPDATE, so concurrent requests on
+  other instances are not overwritten. Returns False, changing nothing, if
+  that would leave the tokens below zero.
+  """
+  profiles = Profile.objects.filter(user_id=user_id)
+  if delta < 0:
+    profiles = profiles.filter(tokens__gte=-delta)
+  if not profiles.update(tokens=F('tokens') + delta):
+    return False
+
+  # update() sends no post_save, see api.signals
+  principal_cache.invalidate_user(user_id)
+  invalidate_dashboard(user_id)
+  return True
+
+
 class ChatSessionView(APIView):
 
+  def get_end_status(self, request):
+    """Status of the end-of-session processing of a chat session"""
+    chat_session_id = request.GET.get('chatSessionId')
+
+    if not chat_session_id:
+      return Response({
+          'message': 'Chat session ID is required',
+          'error': True
+      },
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    chat_session = Chat_Session.objects.filter(
+        id=chat_session_id,
+        user_id=request.user_id).only('id', 'title', 'summary').first()
+    if chat_session is None:
+      return Response({
+          'message': 'Chat session not found',
+          'error': True
+      },
+                      status=status.HTTP_404_NOT_FOUND)
+
+    task = session_end_status(chat_session.id)
+    data = {
+        'chatSessionId': chat_session.id,
+        'status': task.status if task else None,
+        'attempts': task.attempts if task else 0,
+    }
+    if task and task.status == SessionEndTask.DONE:
+      data['title'] = chat_session.title
+      data['summary'] = chat_session.summary
+
+    return Response({
+        'message': 'Session status retrieved successfully',
+        'data': data,
+        'error': False
+    })
+
   def delete(self, request):
     """Delete a chat session"""
     chat_session_id = request.data.get('chatSessionId')
@@ -607,11 +684,7 @@ class ChatSessionView(APIView):
 
       chat_session.delete()
 
-      profile = request.profile
-
-      profile.tokens = profile.tokens + 1
-
-      profile.save()
+      adjust_tokens(request.user_id, 1)
 
       return Response(
           {
@@ -680,12 +753,8 @@ class ChatSessionView(APIView):
     try:
       user = request.user
 
-      profile = request.profile
-      if profile.tokens <= 0:
+      if not adjust_tokens(user_id, -1):
         return Response({'message': 'Insufficient tokens', 'error': True})
-      else:
-        profile.tokens = profile.tokens - 1
-        profile.save()
 
       # Check if this is the first chat session for the user by checking if there are any topics
       topic_count = Topic.objects.filter(user=user).count()
@@ -805,26 +874,47 @@ class ChatSessionView(APIView):
 
       return Chat_Session.objects.filter(
           user=user, time_left=0,
-          date__gte=thirteen_months_ago_date).order_by('-date')
-
-  def get_surrounding_chats(self, selected_chat):
-    """Get the chat sessions before and after the selected chat"""
-    if not selected_chat:
-
-      return None, None
-
-    before_chat = Chat_Session.objects.filter(
-        user=selected_chat.user, time_left=0,
-        date__lt=selected_chat.date).order_by('-date').first()
-
-    after_chat = Chat_Session.objects.filter(
-        user=selected_chat.user, time_left=0,
-        date__gt=selected_chat.date).order_by('date').first()
-
-    return before_chat, after_chat
+          date__gte=thirteen_months_ago_date).order_by('-date', '-id')
+
+  def get_chat_with_neighbours(self, user_id, selected_id=None):
+    """
+    The selected chat (latest completed one if None) together with the ids
+    of the completed chats before and after it, in (date, id) order. LAG
+    and LEAD run over the user's sessions in one query.
+    """
+    quote = connection.ops.quote_name
+    table = quote(Chat_Session._meta.db_table)
+    columns = ', '.join(
+        quote(Chat_Session._meta.get_field(name).column)
+        for name in ('id', 'user', 'date', 'time_left', 'title', 'summary',
+                     'character'))
+    order = f"{quote('date')}, {quote('id')}"
+
+    if selected_id:
+      where = f"{quote('time_left')} = 0 OR {quote('id')} = %s"
+      select = f"WHERE {quote('id')} = %s"
+      params = [user_id, selected_id, selected_id]
+    else:
+      where = f"{quote('time_left')} = 0"
+      select = f"ORDER BY {quote('date')} DESC, {quote('id')} DESC LIMIT 1"
+      params = [user_id]
+
+    chats = list(
+        Chat_Session.objects.raw(
+            f"""SELECT * FROM (
+                  SELECT {columns},
+                         LAG({quote('id')}) OVER (ORDER BY {order}) AS previous_id,
+                         LEAD({quote('id')}) OVER (ORDER BY {order}) AS next_id
+                  FROM {table}
+                  WHERE {quote('user_id')} = %s AND ({where})
+                ) AS chats {select}""", params))
+    return chats[0] if chats else None
 
   def get_all_chats(self, request):
-    """Get all chats and the selected chat"""
+    """
+    Completed chats of the last 13 months, newest first, one page at a
+    time. Pass the returned nextCursor as cursor to get the next page.
+    """
     user_id = request.user_id
     selected_id = request.GET.get('selectedId')
 
@@ -836,12 +926,35 @@ class ChatSessionView(APIView):
                       status=status.HTTP_400_BAD_REQUEST)
 
     try:
-      user = get_object_or_404(User, id=user_id)
-      all_chats = self.get_queryset(user)
+      after = decode_cursor(request.GET.get('cursor'), date.fromisoformat,
+                            int)
+    except ValueError as e:
+      return Response({
+          'message': str(e),
+          'error': True
+      },
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    limit = page_size(request.GET.get('limit'),
+                      getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 30),
+                      getattr(settings, 'CHAT_HISTORY_MAX_PAGE_SIZE', 100))
+
+    try:
+      chats = self.get_queryset(request.user_id).only('id', 'date', 'title')
+      if after:
+        chats = chats.filter(
+            Q(date__lt=after[0]) | Q(date=after[0], id__lt=after[1]))
+      chats = list(chats[:limit + 1])
+
+      next_cursor = None
+      if len(chats) > limit:
+        chats = chats[:limit]
+        next_cursor = encode_cursor(chats[-1].date.isoformat(), chats[-1].id)
 
       data = {
-          'filter': Chat_SessionSerializer(all_chats, many=True).data,
-          'selectedId': selected_id
+          'filter': Chat_SessionListSerializer(chats, many=True).data,
+          'selectedId': selected_id,
+          'nextCursor': next_cursor
       }
 
       response_data = {
@@ -873,34 +986,28 @@ class ChatSessionView(APIView):
                       status=status.HTTP_400_BAD_REQUEST)
 
     try:
-      user = get_object_or_404(User, id=user_id)
-
-      # Get selected chat
-      if selected_id:
-        selected_chat = self.get_queryset(
-            user, selected_chat_session_id=selected_id).first()
-      else:
-        selected_chat = Chat_Session.objects.filter(
-            user=user, time_left=0).order_by('-date').first()
+      # Selected chat (own chats only) and its neighbours in one query
+      selected_chat = self.get_chat_with_neighbours(user_id, selected_id)
 
-      messages = Message.objects.filter(
-          chat_session=selected_chat).order_by('date_created')
-
-      messages = MessageSerializer(messages, many=True).data,
-
-      # Get surrounding chats
-      before_chat, after_chat = self.get_surrounding_chats(selected_chat)
+      # First page of the transcript, the rest via getMessage=true
+      messages, messages_cursor = [], None
+      if selected_chat:
+        messages, messages_cursor = transcript_page(
+            selected_chat.id, None,
+            getattr(settings, 'TRANSCRIPT_PAGE_SIZE', 200))
 
       data = {
           'selected':
           Chat_SessionSerializer(selected_chat).data
           if selected_chat else None,
-          'messages':
-          messages,
+          # Clients read the messages from a one-element list
+          'messages': (messages, ),
+          'messagesCursor':
+          messages_cursor,
           'previousId':
-          before_chat.id if before_chat else None,
+          selected_chat.previous_id if selected_chat else None,
           'nextId':
-          after_chat.id if after_chat else None,
+          selected_chat.next_id if selected_chat else None,
       }
 
       response_data = {
@@ -920,7 +1027,11 @@ class ChatSessionView(APIView):
           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
   def get_chat_messages(self, request):
-    """Get all messages for a specific chat session"""
+    """
+    Messages of a chat session in order, one page at a time. Pass the
+    returned nextCursor as cursor to get the next page, or stream=true to
+    get the whole transcript as NDJSON, one message per line.
+    """
     chat_session_id = request.GET.get('chatSessionId')
 
     if not chat_session_id:
@@ -931,13 +1042,41 @@ class ChatSessionView(APIView):
                       status=status.HTTP_400_BAD_REQUEST)
 
     try:
-      chat_session = get_object_or_404(Chat_Session, id=chat_session_id)
-      messages = Message.objects.filter(
-          chat_session=chat_session_id).order_by('date')
+      after = decode_cursor(request.GET.get('cursor'), datetime.fromisoformat,
+                            int)
+    except ValueError as e:
+      return Response({
+          'message': str(e),
+          'error': True
+      },
+                      status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+      if not Chat_Session.objects.filter(id=chat_session_id,
+                                         user_id=request.user_id).exists():
+        return Response({
+            'message': 'Chat session not found',
+            'error': True
+        },
+                        status=status.HTTP_404_NOT_FOUND)
+
+      if request.GET.get('stream', 'false').lower() == 'true':
+        response = StreamingHttpResponse(
+            ndjson_transcript(chat_session_id,
+                              getattr(settings, 'TRANSCRIPT_CHUNK_SIZE', 200)),
+            content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-store'
+        return response
+
+      limit = page_size(request.GET.get('limit'),
+                        getattr(settings, 'TRANSCRIPT_PAGE_SIZE', 200),
+                        getattr(settings, 'TRANSCRIPT_MAX_PAGE_SIZE', 500))
+      messages, next_cursor = transcript_page(chat_session_id, after, limit)
 
       data = {
-          'messages': MessageSerializer(messages, many=True).data,
-          'chatSessionId': chat_session_id
+          'messages': messages,
+          'chatSessionId': chat_session_id,
+          'nextCursor': next_cursor
       }
 
       response_data = {
@@ -948,12 +1087,6 @@ class ChatSessionView(APIView):
 
       return Response(response_data)
 
-    except Chat_Session.DoesNotExist:
-      return Response({
-          'message': 'Chat session not found',
-          'error': True
-      },
-                      status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
       return Response(
           {
@@ -967,8 +1100,11 @@ class ChatSessionView(APIView):
     """Route to appropriate method based on query parameters"""
     context = request.GET.get('context', 'false').lower() == 'true'
     getMessage = request.GET.get('getMessage', 'false').lower() == 'true'
+    endStatus = request.GET.get('endStatus', 'false').lower() == 'true'
 
-    if getMessage:
+    if endStatus:
+      return self.get_end_status(request)
+    elif getMessage:
       return self.get_chat_messages(request)
     elif context:
       return self.get_chat_with_context(request)
@@ -978,7 +1114,7 @@ class ChatSessionView(APIView):
 
 class DashboardView(APIView):
   permission_classes = [IsAuthenticated]
-  authentication_classes = [JWTAuthentication]
+  authentication_classes = [CustomJWTAuthentication]
 
   def get(self, request):
 
@@ -996,44 +1132,30 @@ class DashboardView(APIView):
 
     if user:
 
-      profile = request.profile
-
-      subscription_day = profile.subscription_date.day if profile.subscription_date and profile.subscription_date > timezone.now(
-      ).date() else None
-      next_month_number = (timezone.now().month % 12) + 1
-      next_date = f"{subscription_day}.{next_month_number}." if subscription_day else "Subscribe"
-
-      today = timezone.now().date()
-
-      chat_session_queryset = Chat_Session.objects.filter(
-          user=user, time_left__gt=0).order_by('date')[:1]
-
-      is_already_session = Chat_Session.objects.filter(user=user,
-                                                       time_left=0,
-                                                       date=today).exists()
-
-      has_expired_session = Chat_Session.objects.filter(user=user,
-                                                        time_left=0).exists()
-
-      chat_session = (Chat_SessionSerializer(chat_session_queryset.first(),
-                                             many=False).data
-                      if chat_session_queryset.exists() else {})
+      # One query on a cold cache, none on repeat visits
+      data, etag = dashboard_snapshot(user_id)
+      if data is None:
+        return Response({
+            'message': 'Profile not found',
+            'error': True
+        },
+                        status=status.HTTP_404_NOT_FOUND)
 
-      data = {
-          'next_date': next_date,
-          'tokens': profile.tokens,
-          'chat_session': chat_session,
-          'is_already_session': is_already_session,
-          'has_expired_session': has_expired_session
-      }
+      if_none_match = request.headers.get('If-None-Match', '')
+      if etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+      else:
+        response = Response(
+            {
+                'content': data,
+                'message': "Topics loaded successfully",
+                'error': False
+            },
+            status=status.HTTP_200_OK)
 
-      return Response(
-          {
-              'content': data,
-              'message': "Topics loaded successfully",
-              'error': False
-          },
-          status=status.HTTP_200_OK)
+      response['ETag'] = etag
+      response['Cache-Control'] = 'private, no-cache'
+      return response
     else:
       return Response({
           'message': 'Invalid credentials',
@@ -1044,7 +1166,7 @@ class DashboardView(APIView):
 
 class TopicsView(APIView):
   permission_classes = [IsAuthenticated]
-  authentication_classes = [JWTAuthentication]
+  authentication_classes = [CustomJWTAuthentication]
 
   def get(self, request):
 
@@ -1075,7 +1197,8 @@ class TopicsView(APIView):
       topics_data = TopicSerializer(topics, many=True).data
       old_topics_data = TopicSerializer(old_topics, many=True).data
 
-      profile = request.profile
+      # Not request.profile: the session-end worker updates the character
+      profile = Profile.objects.only('character').get(user=user)
 
       data = {
           'topics': topics_data,
@@ -1098,6 +1221,7 @@ class TopicsView(APIView):
                       status=status.HTTP_401_UNAUTHORIZED)
 
 
+@auth_exempt
 class LoginAPIView(APIView):
   permission_classes = [AllowAny]
 
@@ -1226,6 +1350,7 @@ class LoginAPIView(APIView):
 # Remove the webhook functions from inside LoginAPIView class and put them at module level:
 
 
+@auth_exempt
 @csrf_exempt
 @require_POST
 def google_play_webhook(request):
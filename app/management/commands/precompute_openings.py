@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from api.agents.handlers.opening_manager import precompute_openings
+
+
+class Command(BaseCommand):
+  help = 'Generate opening messages for upcoming chat sessions'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--days',
+                        type=int,
+                        default=1,
+                        help='Sessions scheduled up to this many days ahead')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Regenerate even if the context is unchanged')
+
+  def handle(self, *args, **options):
+    counts = precompute_openings(days_ahead=options['days'],
+                                 force=options['force'])
+    self.stdout.write(
+        self.style.SUCCESS(
+            f"Generated {counts['generated']} openings, "
+            f"{counts['unchanged']} unchanged, {counts['failed']} failed"))
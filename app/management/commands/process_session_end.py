@@ -0,0 +1,107 @@
+import asyncio
+import os
+import socket
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.agents.handlers.opening_manager import precompute_openings
+from api.agents.handlers.session_end_queue import (claim_session_end_task,
+                                                   process_session_end_task,
+                                                   record_worker_heartbeat,
+                                                   remove_worker_heartbeat)
+
+
+class Command(BaseCommand):
+  help = ('Run the queued end-of-session processing of chat sessions and '
+          'periodically pre-generate the openings of upcoming sessions')
+
+  def add_arguments(self, parser):
+    parser.add_argument('--once',
+                        action='store_true',
+                        help='Exit once the queue is empty')
+    parser.add_argument('--sleep',
+                        type=float,
+                        default=2.0,
+                        help='Seconds to wait when there is nothing to do')
+    parser.add_argument(
+        '--openings-every',
+        type=float,
+        default=getattr(settings, 'OPENING_PRECOMPUTE_INTERVAL', 3600),
+        help='Seconds between precompute_openings runs, 0 to disable')
+
+  def handle(self, *args, **options):
+    asyncio.run(
+        self.work(options['once'], options['sleep'],
+                  options['openings_every']))
+
+  async def precompute_openings(self):
+    try:
+      counts = await database_sync_to_async(precompute_openings)()
+      self.stdout.write(f"Openings: {counts['generated']} generated, "
+                        f"{counts['unchanged']} unchanged, "
+                        f"{counts['failed']} failed")
+    except Exception as e:
+      self.stdout.write(
+          self.style.WARNING(f"Could not precompute openings: {e}"))
+
+  async def heartbeat(self, name: str, stopped: asyncio.Event):
+    """Tell web processes this worker is running, also while it is busy"""
+    # Not thread sensitive, so a long precompute_openings run does not
+    # hold it back
+    record = database_sync_to_async(record_worker_heartbeat,
+                                    thread_sensitive=False)
+    every = getattr(settings, 'SESSION_END_WORKER_TIMEOUT', 60) / 3
+    while not stopped.is_set():
+      try:
+        await record(name)
+      except Exception as e:
+        self.stdout.write(self.style.WARNING(f"Heartbeat failed: {e}"))
+      try:
+        await asyncio.wait_for(stopped.wait(), every)
+      except asyncio.TimeoutError:
+        pass
+
+  async def work(self, once: bool, sleep: float, openings_every: float = 0):
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    stopped = asyncio.Event()
+    heartbeat = asyncio.create_task(self.heartbeat(name, stopped))
+    try:
+      await self.drain(once, sleep, openings_every)
+    finally:
+      # Let a running write finish first, it would recreate the row
+      stopped.set()
+      await heartbeat
+      try:
+        await database_sync_to_async(remove_worker_heartbeat)(name)
+      except Exception as e:
+        self.stdout.write(
+            self.style.WARNING(f"Could not remove heartbeat: {e}"))
+
+  async def drain(self, once: bool, sleep: float, openings_every: float):
+    done = failed = 0
+    next_openings = time.monotonic()
+    while True:
+      if openings_every > 0 and time.monotonic() >= next_openings:
+        await self.precompute_openings()
+        next_openings = time.monotonic() + openings_every
+
+      task = await database_sync_to_async(claim_session_end_task)()
+      if task is None:
+        if once:
+          break
+        await asyncio.sleep(sleep)
+        continue
+
+      self.stdout.write(f"Processing chat session {task.chat_session_id} "
+                        f"(attempt {task.attempts}/{task.max_attempts})")
+      if await process_session_end_task(task):
+        done += 1
+      else:
+        failed += 1
+        self.stdout.write(
+            self.style.WARNING(f"Failed: {task.last_error or 'unknown error'}"))
+
+    self.stdout.write(
+        self.style.SUCCESS(f"Processed {done} sessions, {failed} failed"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from api.agents.handlers.prompt_registry import PROMPT_NAMES, prompt_registry
+
+
+class Command(BaseCommand):
+  help = 'Pull the LangSmith hub prompts and write the local prompt snapshot'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--path',
+                        help='Snapshot file (default: PROMPT_SNAPSHOT_PATH)')
+
+  def handle(self, *args, **options):
+    commits = prompt_registry.refresh(PROMPT_NAMES)
+    for name, commit_hash in commits.items():
+      self.stdout.write(f"{name}: {commit_hash or 'unknown commit'}")
+
+    path = prompt_registry.save_snapshot(options.get('path'))
+    if path:
+      self.stdout.write(
+          self.style.SUCCESS(f'Wrote {len(commits)} prompts to {path}'))
+    else:
+      self.stdout.write(
+          self.style.WARNING('No snapshot path configured, nothing written'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:39
+
+import app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0067_embeddingcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat_session',
+            name='opening_context_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='chat_session',
+            name='opening_message',
+            field=app.models.EncryptedTextField(blank=True, max_length=5000, null=True),
+        ),
+    ]
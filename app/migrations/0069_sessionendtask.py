@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0068_chat_session_opening_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionEndTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('chat_session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='end_task', to='app.chat_session')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='app_session_status_14cd46_idx')],
+            },
+        ),
+    ]
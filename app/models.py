@@ -11,30 +11,107 @@ import hashlib
 from functools import partial
 from datetime import date
 from datetime import timedelta
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
+from django.db.models.query_utils import DeferredAttribute
+from functools import lru_cache
 import base64
 from dateutil.relativedelta import relativedelta
 
 
-class EncryptedField(models.Field):
+@lru_cache(maxsize=8)
+def _build_cipher(keys: tuple) -> MultiFernet:
+  """Build the cipher once per key set instead of once per value"""
+  return MultiFernet([
+      Fernet(base64.urlsafe_b64encode(key.encode().ljust(32)[:32]))
+      for key in keys
+  ])
+
+
+def get_cipher() -> MultiFernet:
+  """
+  Cipher for encrypted fields. The first of settings.ENCRYPTION_KEYS is
+  used to encrypt, all of them are tried to decrypt, which allows rotating
+  keys (see rotate_encrypted_value). Defaults to settings.ENCRYPTION_KEY.
+  """
+  keys = getattr(settings, 'ENCRYPTION_KEYS', None) or [settings.ENCRYPTION_KEY]
+  return _build_cipher(tuple(keys))
+
+
+class EncryptedValue(str):
+  """Ciphertext loaded from the database that has not been decrypted yet"""
+
 
-  def __init__(self, *args, **kwargs):
+class LazyDecryptAttribute(DeferredAttribute):
+  """Model attribute that decrypts the stored ciphertext on first access"""
+
+  def __get__(self, instance, cls=None):
+    value = super().__get__(instance, cls)
+    if instance is not None and isinstance(value, EncryptedValue):
+      value = self.field.decrypt(value)
+      instance.__dict__[self.field.attname] = value
+    return value
+
+  def __set__(self, instance, value):
+    instance.__dict__[self.field.attname] = value
+
+
+class EncryptedField(models.Field):
+  """
+  Field stored Fernet-encrypted.
+
+  With lazy=True, values loaded from the database stay encrypted until the
+  attribute is read, so code paths that never touch the column skip the
+  decryption. Note that values()/values_list() bypass the attribute and
+  return EncryptedValue ciphertext for lazy fields; use decrypt_many().
+  """
+
+  def __init__(self, *args, lazy=False, **kwargs):
+    # lazy only changes attribute access, so it is left out of deconstruct()
+    self.lazy = lazy
     super().__init__(*args, **kwargs)
 
+  def contribute_to_class(self, cls, name, **kwargs):
+    super().contribute_to_class(cls, name, **kwargs)
+    if self.lazy:
+      setattr(cls, self.attname, LazyDecryptAttribute(self))
+
   def get_fernet(self):
-    key = settings.ENCRYPTION_KEY.encode()
-    key = base64.urlsafe_b64encode(key.ljust(32)[:32])
-    return Fernet(key)
+    return get_cipher()
+
+  def decrypt(self, value):
+    if value is None:
+      return value
+    return self.get_fernet().decrypt(value.encode()).decode()
+
+  @staticmethod
+  def decrypt_many(values):
+    """Decrypt a batch of stored values with a single cipher lookup"""
+    f = get_cipher()
+    return [
+        value if value is None else f.decrypt(value.encode()).decode()
+        for value in values
+    ]
+
+  def pre_save(self, model_instance, add):
+    # Do not trigger decryption just to encrypt the same value again
+    value = model_instance.__dict__.get(self.attname)
+    if isinstance(value, EncryptedValue):
+      return value
+    return super().pre_save(model_instance, add)
 
   def get_prep_value(self, value):
     if value is None:
       return value
+    if isinstance(value, EncryptedValue):
+      return str(value)
     f = self.get_fernet()
     return f.encrypt(str(value).encode()).decode()
 
   def from_db_value(self, value, expression, connection):
     if value is None:
       return value
+    if self.lazy:
+      return EncryptedValue(value)
     f = self.get_fernet()
     return f.decrypt(value.encode()).decode()
 
@@ -42,6 +119,25 @@ class EncryptedField(models.Field):
     return 'text'  # Store encrypted data as text
 
 
+def decrypt_lazy_fields(instances, *field_names):
+  """
+  Decrypt pending lazy fields of many instances in one pass, e.g. before
+  serializing a list that is known to need them.
+  """
+  f = get_cipher()
+  for instance in instances:
+    for field_name in field_names:
+      value = instance.__dict__.get(field_name)
+      if isinstance(value, EncryptedValue):
+        instance.__dict__[field_name] = f.decrypt(value.encode()).decode()
+  return instances
+
+
+def rotate_encrypted_value(value: str) -> str:
+  """Re-encrypt a stored value with the current primary key"""
+  return get_cipher().rotate(value.encode()).decode()
+
+
 class EncryptedTextField(EncryptedField):
 
   def db_type(self, connection):
@@ -62,14 +158,20 @@ class EncryptedEmailField(EncryptedField):
 
 class Profile(models.Model):
   user = models.OneToOneField(User, on_delete=models.CASCADE)
-  email = EncryptedEmailField(max_length=100, blank=True)
-  date_of_birth = EncryptedTextField(default='2000-01-01')
+  email = EncryptedEmailField(max_length=100, blank=True, lazy=True)
+  date_of_birth = EncryptedTextField(default='2000-01-01', lazy=True)
   tokens = models.IntegerField(default=4)
   reminder = models.BooleanField(choices=[(True, 'True'), (False, 'False')],
                                  default=True)
   subscription_date = models.DateField(null=True, blank=True)
-  activation_token = EncryptedCharField(max_length=100, blank=True, null=True)
-  character = EncryptedTextField(blank=True, null=True, max_length=2000)
+  activation_token = EncryptedCharField(max_length=100,
+                                        blank=True,
+                                        null=True,
+                                        lazy=True)
+  character = EncryptedTextField(blank=True,
+                                 null=True,
+                                 max_length=2000,
+                                 lazy=True)
   activated = models.BooleanField(default=False)
   subscribed = models.BooleanField(default=False)
   welcome_mail_sent = models.BooleanField(default=False)
@@ -167,15 +269,42 @@ class Chat_Session(models.Model):
   time_left = models.IntegerField(default=60)
   date = models.DateField(default=date.today)
   reminder_sent = models.BooleanField(default=False)
-  topic_ids = EncryptedTextField(blank=True, null=True, max_length=1000)
+  # Conversation-agent state is only read while a chat is open, so it is
+  # decrypted lazily
+  topic_ids = EncryptedTextField(blank=True,
+                                 null=True,
+                                 max_length=1000,
+                                 lazy=True)
   first = models.BooleanField(default=False)
-  asked_questions = EncryptedTextField(blank=True, null=True, max_length=5000)
-  topic_names = EncryptedTextField(blank=True, null=True, max_length=1000)
+  asked_questions = EncryptedTextField(blank=True,
+                                       null=True,
+                                       max_length=5000,
+                                       lazy=True)
+  topic_names = EncryptedTextField(blank=True,
+                                   null=True,
+                                   max_length=1000,
+                                   lazy=True)
   title = EncryptedCharField(max_length=100, blank=True, null=True)
-  potential_topic = EncryptedTextField(blank=True, null=True, max_length=5000)
-  character = EncryptedTextField(blank=True, null=True, max_length=2000)
-  summary = EncryptedTextField(blank=True, null=True, max_length=500)
-  saved_query = EncryptedTextField(blank=True, null=True, max_length=2000)
+  potential_topic = EncryptedTextField(blank=True,
+                                       null=True,
+                                       max_length=5000,
+                                       lazy=True)
+  character = EncryptedTextField(blank=True,
+                                 null=True,
+                                 max_length=2000,
+                                 lazy=True)
+  summary = EncryptedTextField(blank=True, null=True, max_length=500, lazy=True)
+  saved_query = EncryptedTextField(blank=True,
+                                   null=True,
+                                   max_length=2000,
+                                   lazy=True)
+  # Opening message generated ahead of time (precompute_openings) and the
+  # hash of the context it was generated from
+  opening_message = EncryptedTextField(blank=True,
+                                       null=True,
+                                       max_length=5000,
+                                       lazy=True)
+  opening_context_hash = models.CharField(max_length=64, blank=True, null=True)
   topics = models.ManyToManyField(Topic,
                                   through='SessionTopic',
                                   related_name='sessions')
@@ -297,6 +426,71 @@ class SessionLog(models.Model):
     return f"{self.session.id} - Log {self.log.id} ({self.get_status_display()})"
 
 
+class SessionEndTask(models.Model):
+  """
+  Queued end-of-session processing (topics, character, logs, summary).
+
+  One task per chat session, which doubles as the idempotency key; workers
+  claim tasks with SELECT ... FOR UPDATE SKIP LOCKED.
+  """
+  PENDING = 'pending'
+  RUNNING = 'running'
+  DONE = 'done'
+  FAILED = 'failed'
+  STATUS_CHOICES = [
+      (PENDING, 'Pending'),
+      (RUNNING, 'Running'),
+      (DONE, 'Done'),
+      (FAILED, 'Failed'),
+  ]
+
+  chat_session = models.OneToOneField(Chat_Session,
+                                      on_delete=models.CASCADE,
+                                      related_name='end_task')
+  status = models.CharField(max_length=10,
+                            choices=STATUS_CHOICES,
+                            default=PENDING)
+  attempts = models.IntegerField(default=0)
+  max_attempts = models.IntegerField(default=3)
+  run_after = models.DateTimeField(default=timezone.now)
+  locked_at = models.DateTimeField(blank=True, null=True)
+  last_error = models.TextField(blank=True, default='')
+  date_created = models.DateTimeField(auto_now_add=True)
+  date_updated = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    indexes = [
+        models.Index(fields=['status', 'run_after']),
+    ]
+
+  def __str__(self):
+    return f"{self.chat_session_id} - {self.status} ({self.attempts})"
+
+
+class SessionEndWorker(models.Model):
+  """
+  Heartbeat of a running process_session_end worker. Sessions are only
+  queued while a worker has been seen recently, otherwise they are
+  processed inline by the web process.
+  """
+  name = models.CharField(max_length=100, unique=True)
+  last_seen = models.DateTimeField(default=timezone.now)
+
+  def __str__(self):
+    return f"{self.name} - {self.last_seen}"
+
+
+class EmbeddingCacheEntry(models.Model):
+  """Persistent tier of the embedding cache, keyed by model and text hash"""
+  key = models.CharField(max_length=64, unique=True)
+  model = models.CharField(max_length=100)
+  vector = models.BinaryField()  # float32 array
+  date_created = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return f"{self.model} - {self.key[:12]}"
+
+
 class PastTopics(models.Model):
   id = models.AutoField(primary_key=True)
   topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
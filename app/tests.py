@@ -1,3 +1,39 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+
+class ProcessSessionEndCommandTests(TestCase):
+
+  def setUp(self):
+    # The heartbeat writes from another thread, which SQLite's shared
+    # in-memory test database cannot do inside the test transaction
+    patcher = mock.patch(
+        'app.management.commands.process_session_end.record_worker_heartbeat')
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  @mock.patch('app.management.commands.process_session_end.precompute_openings',
+              return_value={
+                  'generated': 2,
+                  'unchanged': 1,
+                  'failed': 0
+              })
+  def test_worker_precomputes_openings(self, precompute):
+    out = StringIO()
+    call_command('process_session_end', '--once', stdout=out)
+
+    precompute.assert_called_once_with()
+    self.assertIn('Openings: 2 generated', out.getvalue())
+
+  @mock.patch('app.management.commands.process_session_end.precompute_openings')
+  def test_openings_can_be_disabled(self, precompute):
+    call_command('process_session_end',
+                 '--once',
+                 '--openings-every',
+                 '0',
+                 stdout=StringIO())
+
+    precompute.assert_not_called()
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from datetime import timedelta
+import json
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -157,7 +158,7 @@ CHANNEL_LAYERS = {
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CustomJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.TokenAuthentication',
@@ -165,6 +166,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.CachedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle'
@@ -317,6 +323,10 @@ STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
+# Comma separated; the first key encrypts, older keys keep decrypting
+ENCRYPTION_KEYS = [
+    key for key in os.environ.get('ENCRYPTION_KEYS', '').split(',') if key
+] or [ENCRYPTION_KEY]
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.zoho.eu')
@@ -331,6 +341,88 @@ PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY', '')
 PINECONE_INDEX_NAME = os.environ.get('PINECONE_INDEX_NAME', '')
 PINECONE_ENVIRONMENT = os.environ.get('PINECONE_ENVIRONMENT', '')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
+# Vector backend for topics and logs: 'pinecone' or 'local' (NumPy index
+# stored under LOCAL_VECTOR_STORE_DIR, for offline runs and tests)
+VECTOR_BACKEND = os.environ.get('VECTOR_BACKEND', 'pinecone')
+LOCAL_VECTOR_STORE_DIR = os.environ.get('LOCAL_VECTOR_STORE_DIR',
+                                        os.path.join(BASE_DIR, 'vector_index'))
+# Time boost applied to retrieval scores, see api.agents.handlers.reranking
+RETRIEVAL_TIME_BOOST = {
+    'max_boost': 0.5,
+    'full_boost_days': 7,
+    'decline_until_days': 30,
+    'tail_until_days': 90,
+    'tail_factor': 0.1,
+}
+# Threads shared by all chat sessions for vector store and embedding calls
+PINECONE_EXECUTOR_WORKERS = int(os.environ.get('PINECONE_EXECUTOR_WORKERS', 8))
+# Embedding cache: in-memory LRU entries per process, optional DB tier
+EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', 2048))
+EMBEDDING_CACHE_PERSISTENT = os.environ.get('EMBEDDING_CACHE_PERSISTENT',
+                                            'false').lower() == 'true'
+# Log event loop callbacks that block for longer than the threshold
+ASYNCIO_LOOP_BLOCK_DETECTOR = os.environ.get(
+    'ASYNCIO_LOOP_BLOCK_DETECTOR', str(DEBUG)).lower() == 'true'
+ASYNCIO_SLOW_CALLBACK_MS = int(os.environ.get('ASYNCIO_SLOW_CALLBACK_MS', 50))
+# LangSmith hub prompts: seconds before a cached prompt is revalidated,
+# on-disk snapshot for cold start / offline runs and pinned commit hashes
+PROMPT_CACHE_TTL = int(os.environ.get('PROMPT_CACHE_TTL', 300))
+PROMPT_SNAPSHOT_PATH = os.environ.get(
+    'PROMPT_SNAPSHOT_PATH', os.path.join(BASE_DIR, 'prompt_snapshot.json'))
+PROMPT_VERSIONS = json.loads(os.environ.get('PROMPT_VERSIONS', '{}'))
+# Shared chat model HTTP pool (HTTP/2 is used when the h2 package is installed)
+CHAT_MODEL_HTTP2 = os.environ.get('CHAT_MODEL_HTTP2', 'true').lower() == 'true'
+CHAT_MODEL_MAX_CONNECTIONS = int(os.environ.get('CHAT_MODEL_MAX_CONNECTIONS', 100))
+CHAT_MODEL_MAX_KEEPALIVE = int(os.environ.get('CHAT_MODEL_MAX_KEEPALIVE', 20))
+CHAT_MODEL_KEEPALIVE_EXPIRY = int(
+    os.environ.get('CHAT_MODEL_KEEPALIVE_EXPIRY', 120))
+CHAT_MODEL_TIMEOUT = int(os.environ.get('CHAT_MODEL_TIMEOUT', 60))
+# Structured output calls: overall deadline, hedging after the p90 latency
+# (or HEDGE_AFTER seconds until enough calls were measured), result cache
+STRUCTURED_OUTPUT_DEADLINE = float(
+    os.environ.get('STRUCTURED_OUTPUT_DEADLINE', 60))
+STRUCTURED_OUTPUT_HEDGE = os.environ.get('STRUCTURED_OUTPUT_HEDGE',
+                                         'true').lower() == 'true'
+STRUCTURED_OUTPUT_HEDGE_AFTER = float(
+    os.environ.get('STRUCTURED_OUTPUT_HEDGE_AFTER', 10))
+STRUCTURED_OUTPUT_CACHE_SIZE = int(
+    os.environ.get('STRUCTURED_OUTPUT_CACHE_SIZE', 256))
+SESSION_END_EXTRACTION_DEADLINE = float(
+    os.environ.get('SESSION_END_EXTRACTION_DEADLINE', 45))
+SESSION_END_LOG_CONCURRENCY = int(
+    os.environ.get('SESSION_END_LOG_CONCURRENCY', 4))
+# End-of-session processing runs in the process_session_end worker (the
+# Procfile worker process); set to false to always process inline. Sessions
+# are also processed inline while no worker heartbeat is newer than
+# SESSION_END_WORKER_TIMEOUT seconds, e.g. when a backgrounded worker was
+# stopped with a scaled-down Cloud Run instance
+SESSION_END_QUEUE = os.environ.get('SESSION_END_QUEUE',
+                                   'true').lower() == 'true'
+SESSION_END_WORKER_TIMEOUT = int(
+    os.environ.get('SESSION_END_WORKER_TIMEOUT', 60))
+SESSION_END_MAX_ATTEMPTS = int(os.environ.get('SESSION_END_MAX_ATTEMPTS', 3))
+SESSION_END_RETRY_BACKOFF = int(os.environ.get('SESSION_END_RETRY_BACKOFF',
+                                               30))
+SESSION_END_TASK_TIMEOUT = int(os.environ.get('SESSION_END_TASK_TIMEOUT', 600))
+# Seconds between the worker's precompute_openings runs (0 disables)
+OPENING_PRECOMPUTE_INTERVAL = float(
+    os.environ.get('OPENING_PRECOMPUTE_INTERVAL', 3600))
+# Validated access tokens with their user and profile, per process
+AUTH_PRINCIPAL_CACHE_TTL = int(os.environ.get('AUTH_PRINCIPAL_CACHE_TTL', 60))
+AUTH_PRINCIPAL_CACHE_SIZE = int(
+    os.environ.get('AUTH_PRINCIPAL_CACHE_SIZE', 10000))
+# Seconds a dashboard snapshot may live. Saves invalidate it right away, but
+# only in their own process (the default cache is per process), so other
+# instances and the session end worker's writes show up after this TTL
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 10))
+# Chat history pages (cursor paginated)
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE', 30))
+CHAT_HISTORY_MAX_PAGE_SIZE = int(
+    os.environ.get('CHAT_HISTORY_MAX_PAGE_SIZE', 100))
+# Chat transcripts: cursor pages, and rows per chunk when streamed as NDJSON
+TRANSCRIPT_PAGE_SIZE = int(os.environ.get('TRANSCRIPT_PAGE_SIZE', 200))
+TRANSCRIPT_MAX_PAGE_SIZE = int(os.environ.get('TRANSCRIPT_MAX_PAGE_SIZE', 500))
+TRANSCRIPT_CHUNK_SIZE = int(os.environ.get('TRANSCRIPT_CHUNK_SIZE', 200))
 
 GOOGLE_SERVICE_ACCOUNT_FILE = os.environ.get('GOOGLE_SERVICE_ACCOUNT_FILE')
 GOOGLE_PLAY_PACKAGE_NAME = os.environ.get('GOOGLE_PLAY_PACKAGE_NAME')
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the conversation graph setup done on chat connect.
+
+Compares building and compiling the StateGraph per connection (previous
+MomentManager._setup_graph) with fetching the process-wide compiled
+graph plus the per-session GraphDependencies. Run from the repository
+root:
+
+  python scripts/bench_graph_setup.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+
+import django
+
+django.setup()
+
+from api.agents.graph.graph_conversation import (ConversationGraphManager,
+                                                 GraphDependencies,
+                                                 get_conversation_graph)
+
+
+def per_connection_setup():
+  return ConversationGraphManager().graph
+
+
+def shared_setup():
+  graph = get_conversation_graph()
+  dependencies = GraphDependencies(ai_model=None,
+                                   topic_manager=None,
+                                   log_manager=None,
+                                   conversation_helper=None)
+  return graph, dependencies
+
+
+def allocated_kib(fn, repeat=20):
+  tracemalloc.start()
+  keep = [fn() for _ in range(repeat)]
+  current, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del keep
+  return current / repeat / 1024
+
+
+def main():
+  get_conversation_graph()  # first connect of the process pays once
+
+  for name, fn in (("per connection", per_connection_setup),
+                   ("shared graph", shared_setup)):
+    number = 50
+    seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"{name:>15}: {seconds * 1e6:10.1f} us/connect "
+          f"{allocated_kib(fn):8.1f} KiB retained/connect")
+
+
+if __name__ == "__main__":
+  main()
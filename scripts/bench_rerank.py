@@ -0,0 +1,90 @@
+"""
+Micro-benchmark of the retrieval re-ranking stage.
+
+Compares the previous per-node Python loop (parse date, boost, sort)
+with both paths of rerank(), the plain loop and the NumPy pass (which
+includes parsing the dates), for growing candidate counts. rerank() picks
+the loop below VECTORIZE_MIN_CANDIDATES. Run from the repository root:
+
+  python scripts/bench_rerank.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.agents.handlers.reranking import (VECTORIZE_MIN_CANDIDATES,
+                                          TimeBoostCurve, _rerank_loop,
+                                          _rerank_vectorized)
+
+
+def scalar_time_boost(days_elapsed, max_boost=0.5):
+  # Previous PineconeManager.calculate_time_boost
+  if days_elapsed < 7:
+    return max_boost
+  elif days_elapsed < 30:
+    return max_boost * (1 - (days_elapsed - 7) / 23)
+  elif days_elapsed < 90:
+    return max_boost * 0.1
+  return 0.0
+
+
+def loop_rerank(similarities, dates, base_threshold, final_threshold,
+                max_results):
+  now = datetime.now()
+  boosted = []
+  for score, value in zip(similarities, dates):
+    if score < base_threshold:
+      continue
+    if isinstance(value, (int, float)):
+      date = datetime.fromtimestamp(value)
+    else:
+      date = datetime.fromisoformat(str(value))
+    days_elapsed = (now - date).days
+    boost = scalar_time_boost(days_elapsed)
+    boosted.append((score * (1 + boost), date))
+  boosted.sort(key=lambda x: x[0], reverse=True)
+  return [item for item in boosted if item[0] >= final_threshold][:max_results]
+
+
+def make_candidates(n, rng):
+  similarities = rng.uniform(0.2, 0.9, n).tolist()
+  now = datetime.now()
+  dates = []
+  for i, days in enumerate(rng.integers(0, 200, n)):
+    date = now - timedelta(days=int(days))
+    # Mix the two metadata formats found in the index
+    dates.append(date.timestamp() if i % 2 else date.isoformat())
+  return similarities, dates
+
+
+def main():
+  rng = np.random.default_rng(0)
+  curve = TimeBoostCurve()
+  print(f"rerank() uses the loop below {VECTORIZE_MIN_CANDIDATES} candidates")
+  print(f"{'top_k':>8} {'old (us)':>10} {'loop (us)':>10} {'numpy (us)':>11}")
+  for top_k in (10, 100, 250, 1000, 10000):
+    similarities, dates = make_candidates(top_k, rng)
+    number = max(10, 20000 // top_k)
+
+    loop_time = timeit.timeit(
+        lambda: loop_rerank(similarities, dates, 0.4, 0.5, 3),
+        number=number) / number
+    now = datetime.now().timestamp()
+    new_loop_time = timeit.timeit(lambda: _rerank_loop(
+        similarities, dates, 0.4, 0.5, 3, curve, now),
+                                  number=number) / number
+    numpy_time = timeit.timeit(lambda: _rerank_vectorized(
+        similarities, dates, 0.4, 0.5, 3, curve, now),
+                               number=number) / number
+
+    print(f"{top_k:>8} {loop_time * 1e6:>10.1f} {new_loop_time * 1e6:>10.1f} "
+          f"{numpy_time * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the SecurityMiddleware exemption check.
+
+Compares the previous per-request EXEMPT_PATHS list scanned with
+any(startswith) with the compiled trie matcher, for a growing number of
+exempt routes. The checked path is not exempt, which is the worst case for
+both and the common case in production. Run from the repository root:
+
+  python scripts/bench_security_middleware.py
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+
+import django
+
+django.setup()
+
+from django.test import RequestFactory
+from django.urls import path
+
+from api.middleware import SecurityMiddleware
+from api.security.exemptions import auth_exempt, build_exempt_matcher
+
+PATH = '/api/chat_sessions'
+
+
+@auth_exempt
+def exempt_view(request):
+  return None
+
+
+def routes(count):
+  return [f'/api/route_{i}' for i in range(count)]
+
+
+def url_patterns(count):
+  return [path(route[1:], exempt_view) for route in routes(count)]
+
+
+def main():
+  logging.disable(logging.CRITICAL)
+
+  for count in (15, 150, 1500):
+    exempt_paths = routes(count)
+
+    def list_scan():
+      paths = list(exempt_paths)  # rebuilt on every request before
+      return any(PATH.startswith(exempt_path) for exempt_path in paths)
+
+    matcher = build_exempt_matcher(SecurityMiddleware.DEFAULT_EXEMPT_PREFIXES,
+                                   url_patterns(count))
+
+    def compiled():
+      return matcher.match(PATH) is not None
+
+    number = 2000
+    for name, fn in (("list scan", list_scan), ("compiled", compiled)):
+      seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+      print(f"{count:5d} routes {name:>10}: {seconds * 1e6:8.2f} us/request")
+
+  # Whole middleware on an exempt route (no token handling)
+  middleware = SecurityMiddleware(lambda request: None)
+  request = RequestFactory().get('/api/login')
+  middleware.process_request(request)
+  number = 2000
+  seconds = min(
+      timeit.repeat(lambda: middleware.process_request(request),
+                    number=number,
+                    repeat=5)) / number
+  print(f"process_request on exempt path: {seconds * 1e6:.2f} us/request")
+
+
+if __name__ == "__main__":
+  main()